@@ -0,0 +1,296 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from src.live_predictor import LatencyPredictor, MonitorSession
+from src.simulate_latency import LatencyGenerator, run_simulation
+from src.train_bootstrap import train_model
+import src.log_writer as log_writer
+from src.history_store import HistoryStore
+from src.retrain_pool import get_retrain_pool
+
+BACKENDS = ['forest', 'river']
+
+class StubProbe:
+    """Deterministic latency source standing in for the network."""
+
+    def __init__(self, seed=0, burst_rate=0.01):
+        self.generator = LatencyGenerator(1, seed=seed, burst_rate=burst_rate)
+        self.buffer = []
+        self.clock = 1.75e9
+
+    def __call__(self):
+        if not self.buffer:
+            timestamps = self.clock + np.arange(1024, dtype=np.float64)
+            self.buffer = self.generator.block(timestamps)[:, 0].tolist()[::-1]
+            self.clock += 1024
+        return self.buffer.pop()
+
+def distribution(samples_ns):
+    """Summarize per-call timings (nanoseconds) in microseconds."""
+    us = np.asarray(samples_ns, dtype=np.float64) / 1000
+    return {
+        "mean_us": float(us.mean()),
+        "p50_us": float(np.percentile(us, 50)),
+        "p90_us": float(np.percentile(us, 90)),
+        "p99_us": float(np.percentile(us, 99)),
+        "max_us": float(us.max())
+    }
+
+def make_predictor(backend, max_history=100):
+    # No warm start and no periodic background refits, so timings are of this call only
+    return LatencyPredictor(max_history=max_history, backend=backend, warm_start=False,
+                            retrain_interval=10 ** 9)
+
+def feed(predictor, probe, count, start=None):
+    start = time.time() if start is None else start
+    for i in range(count):
+        predictor.update(probe(), pd.Timestamp(start + i, unit='s'))
+
+def bench_hot_path(history_sizes, calls):
+    results = {}
+    for backend in BACKENDS:
+        for size in history_sizes:
+            probe = StubProbe(seed=size)
+            predictor = make_predictor(backend, max_history=size)
+            feed(predictor, probe, size)
+            predictor.retrain()
+            update_ns, predict_ns = [], []
+            now = time.time() + size
+            for i in range(calls):
+                latency = probe()
+                timestamp = pd.Timestamp(now + i, unit='s')
+                started = time.perf_counter_ns()
+                predictor.update(latency, timestamp)
+                update_ns.append(time.perf_counter_ns() - started)
+                started = time.perf_counter_ns()
+                predictor.predict(latency)
+                predict_ns.append(time.perf_counter_ns() - started)
+            results[f"{backend}/history_{size}"] = {
+                "update": distribution(update_ns),
+                "predict": distribution(predict_ns)
+            }
+    return results
+
+def bench_prepare_features(history_sizes, repeats=20):
+    results = {}
+    for size in history_sizes:
+        probe = StubProbe(seed=size)
+        predictor = make_predictor('river', max_history=size)
+        feed(predictor, probe, size)
+        history = list(predictor.history)
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter_ns()
+            predictor.prepare_features(history)
+            timings.append(time.perf_counter_ns() - started)
+        results[f"history_{size}"] = distribution(timings)
+    return results
+
+def bench_retrain(train_sizes, repeats=3):
+    results = {}
+    for size in train_sizes:
+        predictor = LatencyPredictor(backend='forest', warm_start=False, retrain_interval=10 ** 9,
+                                     store_capacity=size, max_train_samples=size,
+                                     retention='reservoir')
+        feed(predictor, StubProbe(seed=size), size + 1)
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            predictor.retrain()
+            timings.append(time.perf_counter() - started)
+        results[f"samples_{size}"] = {"seconds": float(np.median(timings))}
+    return results
+
+def wait_for_retrains(timeout=60):
+    """Let background refits finish so they neither skew nor print into the next run."""
+    deadline = time.monotonic() + timeout
+    pool = get_retrain_pool()
+    while time.monotonic() < deadline:
+        stats = pool.stats()
+        if not stats["queue_depth"] and not stats["running"]:
+            return
+        time.sleep(0.05)
+
+def bench_end_to_end(sites, samples, tmp):
+    """MonitorSession.process with stubbed probes, logging into a temp dir."""
+    writer = log_writer.LogWriter(history=HistoryStore(os.path.join(tmp, 'history')))
+    previous, log_writer._writer = log_writer._writer, writer
+    try:
+        results = {}
+        for backend in BACKENDS:
+            sessions = []
+            for i in range(sites):
+                predictor = make_predictor(backend)
+                probe = StubProbe(seed=i)
+                feed(predictor, probe, 50)
+                predictor.retrain()  # Start from a fitted model, as a long-running site would
+                predictor.retrain_interval = 50  # Real refit cadence, on the background pool
+                sessions.append((probe, MonitorSession(
+                    f"site{i}.test", [f"site{i}.test"], os.path.join(tmp, f"{backend}_{i}.csv"),
+                    lambda *args: None, predictor, rank=lambda latency: [])))
+            started = time.perf_counter()
+            # MonitorSession prints every sample; keep that out of the terminal
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(samples):
+                    for probe, session in sessions:
+                        session.process(probe())
+                writer.flush()
+                elapsed = time.perf_counter() - started
+                wait_for_retrains()
+            results[backend] = {
+                "samples_per_sec_per_site": samples / elapsed,
+                "samples_per_sec": sites * samples / elapsed
+            }
+        return results
+    finally:
+        log_writer._writer = previous
+        writer.close()
+
+def bench_pipeline(rows_hours, tmp):
+    path = os.path.join(tmp, 'bootstrap.csv')
+    started = time.perf_counter()
+    rows = run_simulation(path, duration_hours=rows_hours, n_servers=50, interval=60, seed=1)
+    simulate = time.perf_counter() - started
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        train_model(path, model_path=os.path.join(tmp, 'model_state.pkl'))
+    train = time.perf_counter() - started
+    return {
+        "simulation": {"rows": rows, "rows_per_sec": rows / simulate},
+        "training": {"rows": rows, "rows_per_sec": rows / train}
+    }
+
+def bench_memory(count, samples):
+    results = {}
+    for backend in BACKENDS:
+        gc.collect()
+        tracemalloc.start()
+        predictors = [make_predictor(backend) for _ in range(count)]
+        probe = StubProbe()
+        for predictor in predictors:
+            feed(predictor, probe, samples)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[backend] = {"bytes_per_predictor": current / count}
+        del predictors
+    return results
+
+PROFILES = {
+    "quick": dict(history_sizes=(10, 100), calls=300, train_sizes=(200, 1000), sites=4,
+                  samples=200, pipeline_hours=24, memory_count=10, memory_samples=100),
+    "full": dict(history_sizes=(10, 100, 1000), calls=2000, train_sizes=(500, 2000, 5000), sites=16,
+                 samples=1000, pipeline_hours=24 * 30, memory_count=50, memory_samples=500),
+}
+
+def run(profile, only=None):
+    config = PROFILES[profile]
+    benches = {
+        "hot_path": lambda tmp: bench_hot_path(config["history_sizes"], config["calls"]),
+        "prepare_features": lambda tmp: bench_prepare_features(config["history_sizes"]),
+        "retrain": lambda tmp: bench_retrain(config["train_sizes"]),
+        "end_to_end": lambda tmp: bench_end_to_end(config["sites"], config["samples"], tmp),
+        "pipeline": lambda tmp: bench_pipeline(config["pipeline_hours"], tmp),
+        "memory": lambda tmp: bench_memory(config["memory_count"], config["memory_samples"]),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, bench in benches.items():
+            if only and name not in only:
+                continue
+            print(f"Running {name}...", file=sys.stderr)
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[name] = bench(tmp)
+    return results
+
+def metadata(profile):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "profile": profile,
+        "timestamp": time.time(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+def flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+def compare(current, baseline, tolerance):
+    """Compare flattened metrics; rates are better higher, everything else lower."""
+    report = []
+    current, baseline = flatten(current), flatten(baseline)
+    for name in sorted(current):
+        if name not in baseline or not baseline[name] or name.endswith('/rows'):
+            continue
+        ratio = current[name] / baseline[name]
+        higher_is_better = 'per_sec' in name
+        change = ratio - 1 if higher_is_better else 1 - ratio  # Positive means faster / smaller
+        status = "ok"
+        if change < -tolerance:
+            status = "REGRESSION"
+        elif change > tolerance:
+            status = "improved"
+        report.append({"metric": name, "baseline": baseline[name], "current": current[name],
+                       "change": change, "status": status})
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the prediction pipeline")
+    parser.add_argument("--profile", default="quick", choices=sorted(PROFILES))
+    parser.add_argument("--only", nargs="*", help="benchmark names to run")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative slowdown; the quick profile varies by about 10%% run to run")
+    args = parser.parse_args()
+
+    document = {"meta": metadata(args.profile), "results": run(args.profile, args.only)}
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report = compare(document["results"], baseline["results"], args.tolerance)
+        document["comparison"] = {"baseline_meta": baseline.get("meta"), "tolerance": args.tolerance,
+                                  "metrics": report}
+        for row in report:
+            if row["status"] != "ok":
+                print(f"{row['status']:>10}  {row['metric']}: {row['baseline']:.4g} -> "
+                      f"{row['current']:.4g} ({row['change']:+.1%})", file=sys.stderr)
+        if any(row["status"] == "REGRESSION" for row in report):
+            exit_code = 1
+
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,104 +1,133 @@
-from flask import Flask, jsonify, render_template, request
-import threading
-import time
+from flask import Flask, Response, jsonify, render_template, request
 import os
 import json
-import dns.resolver
-import random
-import requests
+import math
 from urllib.parse import urlparse
 import subprocess
 import re
+import time
 from datetime import datetime
 from flask_cors import CORS
 
 # Import the real latency predictor modules
-from src.live_predictor import run_live_monitoring, LatencyPredictor
-from src.ping_utils import ping_latency
-from src.reroute_selector import get_best_server
+from src.live_predictor import MonitorSession, LatencyPredictor, schedule_monitoring
+from src.scheduler import MonitorScheduler
+from src.dns_cache import get_dns_cache
+from src.log_writer import get_log_writer
+from src.reroute_candidates import get_candidate_table
+from src.retrain_pool import get_retrain_pool
+from src.history_query import get_history_query
+from src.status_stream import get_status_broadcaster
+from src.status_board import StatusBoard
+from src.metrics import REGISTRY
+from src.profiler import get_profiler
+from src.http_pool import get_session_manager
+from src.sharded_engine import ShardedEngine, merge_stats
+from src.predictor_snapshot import get_snapshot_store
+from src.predictor_backends import BACKENDS
 
 app = Flask(__name__)
 CORS(app)
 
+MONITOR_INTERVAL = 1.0  # Default seconds between probes of one website
+SIMULATION_INTERVAL = 2.0
+# Monitoring worker processes; 0 monitors every website in this process
+MONITOR_WORKERS = int(os.environ.get('MONITOR_WORKERS', '0'))
+
 # Global variables to store monitoring state
-monitoring_threads = {}  # Dictionary to store monitoring threads for each website
+scheduler = MonitorScheduler()  # Dispatches probes for every website from one loop
+site_intervals = {}  # Per-website probe interval overrides
 is_monitoring = False
-current_status = {}
+status_board = StatusBoard()  # Versioned per-website status, read without locking
 visited_websites = set()
-cookies_store = {}  # Store cookies for each domain
-predictors = {}  # Store LatencyPredictor instances for each website
+site_probes = {}  # Per-website probe type: 'icmp' (default, ICMP/TCP/UDP round trip) or 'http'
+site_backends = {}  # Per-website predictor backend overrides
+predictors = {}  # Store LatencyPredictor instances for each website (in-process monitoring only)
+engine = None  # ShardedEngine when MONITOR_WORKERS > 0, set up below
+
+# Scrape-time gauges; the per-sample metrics are recorded by the monitoring code
+REGISTRY.gauge('latency_monitored_sites', 'Websites registered with the scheduler',
+               lambda: len(engine.assignment) if engine is not None else len(scheduler))
+REGISTRY.gauge('latency_scheduler_skipped_ticks', 'Ticks skipped because the previous one was still running',
+               lambda: scheduler.skipped)
+REGISTRY.gauge('latency_retrain_queue_depth', 'Retrains waiting for a worker', lambda: get_retrain_pool().queue_depth())
+REGISTRY.gauge('latency_status_stream_clients', 'Connected status stream clients',
+               lambda: get_status_broadcaster().stats()["subscribers"])
+
+# Status fields of a website with no measurement yet
+IDLE_STATUS = {
+    "latency": None,
+    "predicted": None,
+    "is_spike": False,
+    "spike_severity": 0,
+    "last_update": None,
+    "sampled_at": None,  # Epoch seconds of the latest measurement
+    "suggested_server": None,
+    "improvement": None,
+    "connect_ms": None,  # HTTP probes only
+    "tls_ms": None,
+    "ttfb_ms": None
+}
 
-def reset_monitoring_state():
-    """Reset all monitoring state variables."""
-    global monitoring_threads, is_monitoring, current_status, predictors
+def reset_monitoring_state(forget_models=False):
+    """Reset all monitoring state variables.
+
+    With forget_models the predictors' snapshots are deleted too, so sites
+    added again start from scratch instead of being restored.
+    """
+    global is_monitoring, predictors
     print("Resetting monitoring state...")
     is_monitoring = False
-    monitoring_threads.clear()
-    current_status.clear()
+    scheduler.reset()
+    if engine is not None:
+        engine.stop(save=not forget_models)
+    if forget_models:
+        removed = get_snapshot_store().clear()
+        print(f"Deleted {removed} predictor snapshots")
+    else:
+        # Keep what the predictors learned; they are restored when the sites are added again
+        get_snapshot_store().save_all()
+    status_board.clear()
     predictors.clear()
+    get_candidate_table().clear()
+    get_status_broadcaster().reset(status_board.snapshot().status())
     print("Monitoring state reset complete")
 
-def ping_server(server):
-    """Ping a server and return the latency in milliseconds."""
-    return ping_latency(server)
-
-def get_best_server_for_domain(domain):
-    """Get the best server for a domain by checking latency."""
-    try:
-        # Get A records (IPv4 addresses)
-        answers = dns.resolver.resolve(domain, 'A')
-        servers = [str(rdata) for rdata in answers]
-        
-        if not servers:
-            return domain
-            
-        # Use the reroute_selector to find best server
-        best_server = get_best_server(servers)
-        return best_server if best_server else domain
-        
-    except Exception as e:
-        print(f"DNS resolution error for {domain}: {e}")
-        return domain
-
 def switch_to_server(domain, new_server):
     """Switch to a new server while maintaining cookies."""
-    try:
-        # Get current cookies
-        current_cookies = cookies_store.get(domain, {})
-        
-        # Make request to new server with existing cookies
-        response = requests.get(
-            f'http://{new_server}',
-            cookies=current_cookies,
-            allow_redirects=True,
-            timeout=5
-        )
-        
-        # Update cookies
-        cookies_store[domain] = response.cookies.get_dict()
-        
-        return True
-    except Exception as e:
-        print(f"Server switch error: {e}")
-        return False
+    # The domain's pooled session carries its cookies and keep-alive connections
+    return get_session_manager().switch(domain, new_server)
+
+def update_status_fields(website, fields):
+    """Merge extra measurements (e.g. HTTP connect/TLS/TTFB times) into a website's status."""
+    if not is_monitoring:
+        return
+    status = status_board.update(website, fields)
+    if status is not None:
+        get_status_broadcaster().publish(website, status)
+
+def site_options(website):
+    """How a website is monitored, as passed to the monitoring workers."""
+    return {
+        "interval": site_intervals.get(website, MONITOR_INTERVAL),
+        "probe": site_probes.get(website, 'icmp'),
+        "backend": site_backends.get(website)
+    }
 
 def real_monitoring(website):
-    """Real monitoring using the live predictor."""
+    """Register a website with the scheduler using the live predictor."""
     try:
         print(f"Starting real monitoring for {website}")
         
-        # Create log file path
-        log_file = f"logs/{website}_monitoring.csv"
-        
-        # Get available servers for this domain
-        try:
-            answers = dns.resolver.resolve(website, 'A')
-            servers = [str(rdata) for rdata in answers]
-        except:
-            servers = [website]  # Fallback to original domain
+        # Reuse the site's predictor rather than training a second one
+        if website not in predictors:
+            predictors[website] = LatencyPredictor(backend=site_backends.get(website), site=website)
         
-        # Start live monitoring
-        run_live_monitoring(website, servers, log_file, monitoring_callback)
+        if is_monitoring:
+            options = site_options(website)
+            schedule_monitoring(scheduler, website, monitoring_callback, predictors[website],
+                                interval=options["interval"], probe=options["probe"],
+                                on_fields=update_status_fields)
         
     except Exception as e:
         print(f"Error in real monitoring for {website}: {e}")
@@ -111,68 +140,52 @@ def simulate_monitoring(website):
     
     # Initialize predictor for this website if not exists
     if website not in predictors:
-        predictors[website] = LatencyPredictor()
+        predictors[website] = LatencyPredictor(site=website)
     
-    predictor = predictors[website]
-    
-    while is_monitoring and website in monitoring_threads:
-        try:
-            # Get real latency using ping
-            current_latency = ping_latency(website)
-            
-            if current_latency is None:
-                # If ping fails, use simulated data
-                base_latency = random.uniform(20, 100)
-                spike_factor = random.uniform(0.8, 2.5) if random.random() < 0.2 else 1.0
-                current_latency = base_latency * spike_factor
-            
-            # Update predictor with real data
-            timestamp = datetime.now()
-            predictor.update(current_latency, timestamp)
-            
-            # Get prediction
-            predicted_latency, is_spike, severity = predictor.predict(current_latency)
-            
-            # Get best server suggestion if there's a spike
-            suggested_server = None
-            improvement = None
-            if is_spike:
-                best_server = get_best_server_for_domain(website)
-                if best_server != website:
-                    suggested_server = best_server
-                    best_latency = ping_latency(best_server)
-                    if best_latency:
-                        improvement = current_latency - best_latency
-            
-            # Call monitoring callback
-            monitoring_callback(website, current_latency, predicted_latency, is_spike, severity, suggested_server, improvement)
-            
-            time.sleep(2)  # Update every 2 seconds
-            
-        except Exception as e:
-            print(f"Monitoring error for {website}: {e}")
-            break
+    # Pings are still real; failed ones are replaced with simulated data.
+    # Alternates come from the candidate table, which resolves the domain itself
+    session = MonitorSession(
+        website, [website], None, monitoring_callback, predictors[website],
+        simulate_on_failure=True
+    )
+    if is_monitoring:
+        scheduler.add(website, session.process, interval=SIMULATION_INTERVAL)
+
+def schedule_website(website):
+    """Set up monitoring for a website off the request thread."""
+    if engine is not None:
+        engine.add(website, site_options(website))
+    elif website not in scheduler:
+        print(f"Scheduling monitoring for {website}")
+        scheduler.submit(real_monitoring, website)
 
 def monitoring_callback(server, latency, predicted, is_spike, severity, suggested_server=None, improvement=None):
     """Callback function for monitoring updates."""
-    global current_status
+    # Late results from a tick that was in flight when monitoring stopped
+    if not is_monitoring:
+        return
     
-    if server in current_status:
-        # Update status with real prediction data
-        current_status[server].update({
-            "latency": round(latency, 2),
-            "predicted": round(predicted, 2),
-            "is_spike": is_spike,
-            "spike_severity": round(severity * 100, 2) if severity else 0,  # Convert to percentage
-            "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "suggested_server": suggested_server,
-            "improvement": round(improvement, 2) if improvement else None
-        })
-        print(f"Updated status for {server}: {current_status[server]}")
+    # Update status with real prediction data
+    status = status_board.update(server, {
+        "latency": round(latency, 2),
+        "predicted": round(predicted, 2),
+        "is_spike": is_spike,
+        "spike_severity": round(severity * 100, 2) if severity else 0,  # Convert to percentage
+        "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "sampled_at": round(time.time(), 3),
+        "suggested_server": suggested_server,
+        "improvement": round(improvement, 2) if improvement else None
+    })
+    if status is not None:
+        get_status_broadcaster().publish(server, status)
+        print(f"Updated status for {server}: {status}")
+
+if MONITOR_WORKERS > 0:
+    engine = ShardedEngine(MONITOR_WORKERS, callback=monitoring_callback, on_fields=update_status_fields)
 
 def start_monitoring():
     """Start monitoring for all visited websites."""
-    global is_monitoring, monitoring_threads, current_status
+    global is_monitoring
     
     if is_monitoring:
         print("Monitoring already running")
@@ -183,51 +196,36 @@ def start_monitoring():
     
     # Initialize status for all visited websites
     for website in visited_websites:
-        if website not in current_status:
-            current_status[website] = {
-                "server": website,
-                "latency": None,
-                "predicted": None,
-                "is_spike": False,
-                "spike_severity": 0,
-                "last_update": None,
-                "suggested_server": None,
-                "improvement": None
-            }
+        if status_board.add(website, {"server": website, **IDLE_STATUS}):
+            get_status_broadcaster().publish(website, status_board.get(website))
     
     # Start monitoring for each visited website
+    if engine is not None:
+        engine.start()
+    else:
+        scheduler.start()
     for website in visited_websites:
-        if website not in monitoring_threads:
-            print(f"Starting monitoring thread for {website}")
-            thread = threading.Thread(
-                target=real_monitoring,  # Use real monitoring instead of simulation
-                args=(website,),
-                daemon=True
-            )
-            monitoring_threads[website] = thread
-            thread.start()
+        schedule_website(website)
     
     print("Monitoring started successfully")
     return "Monitoring started"
 
 def stop_monitoring():
     """Stop monitoring for all websites."""
-    global is_monitoring, monitoring_threads, current_status
+    global is_monitoring
     print("Stopping monitoring...")
     is_monitoring = False
-    monitoring_threads.clear()
+    scheduler.reset()
+    if engine is not None:
+        # Workers flush their own logs and snapshots before exiting
+        engine.stop()
+    get_log_writer().flush()
+    get_snapshot_store().save_all()
     
     # Reset status for all websites
-    for website in current_status:
-        current_status[website].update({
-            "latency": None,
-            "predicted": None,
-            "is_spike": False,
-            "spike_severity": 0,
-            "last_update": None,
-            "suggested_server": None,
-            "improvement": None
-        })
+    status_board.update_all(IDLE_STATUS)
+    for website, status in status_board.snapshot().status().items():
+        get_status_broadcaster().publish(website, status)
     
     print("Monitoring stopped")
     return "Monitoring stopped"
@@ -238,9 +236,45 @@ def home():
 
 @app.route('/api/status')
 def get_status():
-    """Get current monitoring status for all websites."""
-    print(f"Current status: {current_status}")
-    return jsonify(current_status)
+    """Get current monitoring status for all websites.
+
+    Query args: `since` (a version from X-Status-Version; only sites changed
+    after it are returned, removed ones as null) and `sites` (comma-separated
+    filter). Responses carry the board version as their ETag, so
+    If-None-Match gets a 304 while nothing has changed.
+    """
+    try:
+        snapshot = status_board.snapshot()
+        etag = str(snapshot.version)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            since = request.args.get('since', type=int)
+            sites = request.args.get('sites')
+            sites = [site.strip() for site in sites.split(',') if site.strip()] if sites is not None else None
+            response = Response(snapshot.render(since, sites), mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['X-Status-Version'] = etag
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
+@app.route('/api/status/stream')
+def stream_status():
+    """Server-Sent Events: a full snapshot, then coalesced per-site deltas."""
+    broadcaster = get_status_broadcaster()
+    subscriber = broadcaster.subscribe()
+    if subscriber is None:
+        # Clients fall back to polling /api/status
+        return jsonify({"error": "Too many stream clients"}), 503
+    return Response(broadcaster.events(subscriber), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/stream_stats')
+def get_stream_stats():
+    """Get subscriber and event counters for the status stream."""
+    return jsonify(get_status_broadcaster().stats())
 
 @app.route('/api/start')
 def start():
@@ -258,8 +292,8 @@ def stop():
 
 @app.route('/api/reset')
 def reset():
-    """Reset the monitoring state."""
-    reset_monitoring_state()
+    """Reset the monitoring state, including what the predictors learned."""
+    reset_monitoring_state(forget_models=True)
     return jsonify({"message": "Monitoring state reset"})
 
 @app.route('/api/switch_server', methods=['POST'])
@@ -283,7 +317,7 @@ def switch_server():
 @app.route('/api/add_website', methods=['POST'])
 def add_website():
     """Add a new website to monitor."""
-    global visited_websites, current_status, monitoring_threads
+    global visited_websites
     
     try:
         data = request.get_json()
@@ -295,38 +329,45 @@ def add_website():
         # Clean up the website URL
         website = website.replace('http://', '').replace('https://', '').replace('www.', '')
         
+        # Validate everything before touching any shared state
+        probe = data.get('probe')
+        if probe and probe not in ('icmp', 'http'):
+            return jsonify({'success': False, 'error': f"Unknown probe type: {probe}"})
+        backend = data.get('backend')
+        if backend and backend not in BACKENDS:
+            return jsonify({'success': False, 'error': f"Unknown predictor backend: {backend}"})
+        interval = data.get('interval')
+        if interval is not None:
+            try:
+                interval = float(interval)
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': f"Invalid interval: {interval}"})
+            if not math.isfinite(interval) or interval <= 0:
+                return jsonify({'success': False, 'error': 'Interval must be a positive number of seconds'})
+        
+        # Initialize predictor for this website, optionally with its own backend;
+        # with monitoring workers it lives in the worker that owns the website
+        if engine is None and website not in predictors:
+            predictors[website] = LatencyPredictor(backend=backend, site=website)
+        
         print(f"Adding website: {website}")
         
         # Add to visited websites
         visited_websites.add(website)
-        
-        # Initialize predictor for this website
-        if website not in predictors:
-            predictors[website] = LatencyPredictor()
+        if interval is not None:
+            site_intervals[website] = interval
+        if probe:
+            site_probes[website] = probe
+        if backend:
+            site_backends[website] = backend
         
         # Initialize status for the new website
-        if website not in current_status:
-            current_status[website] = {
-                "server": website,
-                "latency": None,
-                "predicted": None,
-                "is_spike": False,
-                "spike_severity": 0,
-                "last_update": None,
-                "suggested_server": None,
-                "improvement": None
-            }
+        if status_board.add(website, {"server": website, **IDLE_STATUS}):
+            get_status_broadcaster().publish(website, status_board.get(website))
             
             # Start monitoring the new website if monitoring is active
-            if is_monitoring and website not in monitoring_threads:
-                print(f"Starting monitoring thread for new website: {website}")
-                thread = threading.Thread(
-                    target=real_monitoring,
-                    args=(website,),
-                    daemon=True
-                )
-                monitoring_threads[website] = thread
-                thread.start()
+            if is_monitoring:
+                schedule_website(website)
         
         return jsonify({'success': True})
     except Exception as e:
@@ -342,28 +383,169 @@ def get_websites():
 def get_predictor_stats(website):
     """Get statistics about the predictor for a specific website."""
     try:
+        if engine is not None:
+            stats = engine.call(website, 'stats')
+            return jsonify(stats) if stats is not None else jsonify({"error": "Website not found"})
         if website in predictors:
-            predictor = predictors[website]
-            stats = {
-                "is_trained": predictor.is_trained,
-                "history_length": len(predictor.history),
-                "training_samples": len(predictor.training_data),
-                "last_retrain": predictor.last_retrain,
-                "spike_threshold": predictor.spike_threshold
-            }
-            return jsonify(stats)
+            return jsonify(predictors[website].stats())
         else:
             return jsonify({"error": "Website not found"})
     except Exception as e:
         return jsonify({"error": str(e)})
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of the monitoring metrics.
+
+    With monitoring workers, their counters and histograms are added in.
+    """
+    extra = engine.call_all('metrics') if engine is not None else ()
+    return Response(REGISTRY.render(extra), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profile/start', methods=['GET', 'POST'])
+def start_profile():
+    """Start sampling every thread's stack for a bounded window.
+
+    Query args: `duration` (seconds, default 30, at most 300), `interval`
+    (seconds between samples, default 0.005) and `threads` (comma-separated
+    thread name prefixes, e.g. monitor,probe-engine,retrain; default all).
+    """
+    try:
+        if engine is not None:
+            return jsonify({"error": "Profiling samples this process only; with MONITOR_WORKERS "
+                                     "the monitoring threads run in worker processes"})
+        duration = min(request.args.get('duration', 30.0, type=float), 300.0)
+        interval = max(request.args.get('interval', 0.005, type=float), 0.001)
+        threads = request.args.get('threads')
+        threads = [name.strip() for name in threads.split(',') if name.strip()] if threads else None
+        profiler = get_profiler()
+        if not profiler.start(duration=duration, interval=interval, threads=threads):
+            return jsonify({"error": "Profiler already running", **profiler.stats()})
+        return jsonify(profiler.stats())
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
+@app.route('/api/profile/stop', methods=['GET', 'POST'])
+def stop_profile():
+    """Stop profiling and download the result.
+
+    `format=collapsed` (default) gives flamegraph.pl/speedscope collapsed
+    stacks; `format=chrome` gives a Chrome trace for chrome://tracing or
+    Perfetto. A run that already ended on its own is returned as is.
+    """
+    try:
+        profiler = get_profiler()
+        profiler.stop()
+        if request.args.get('format', 'collapsed') == 'chrome':
+            body, mimetype, filename = profiler.chrome_trace(), 'application/json', 'profile.trace.json'
+        else:
+            body, mimetype, filename = profiler.collapsed(), 'text/plain', 'profile.collapsed.txt'
+        return Response(body, mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
+@app.route('/api/candidates/<website>')
+def get_candidates(website):
+    """Get the reroute candidate scores kept for a website."""
+    if engine is not None:
+        candidates = engine.call(website, 'candidates')
+        if candidates is not None:
+            return jsonify(candidates)
+    return jsonify({**get_candidate_table().stats(), "candidates": get_candidate_table().snapshot(website)})
+
+@app.route('/api/http_stats')
+def get_http_stats():
+    """Get session and connection counters for the pooled HTTP sessions.
+
+    With monitoring workers the counters are summed over every process.
+    """
+    if engine is not None:
+        return jsonify(merge_stats([get_session_manager().stats()] + engine.call_all('http_stats')))
+    return jsonify(get_session_manager().stats())
+
+@app.route('/api/worker_stats')
+def get_worker_stats():
+    """Get placement and update counters for the monitoring worker processes."""
+    if engine is None:
+        return jsonify({"workers": 0, "running": False})
+    return jsonify(engine.stats())
+
+@app.route('/api/snapshot_stats')
+def get_snapshot_stats():
+    """Get save/restore counters for the predictor snapshots."""
+    return jsonify(get_snapshot_store().stats())
+
+@app.route('/api/dns_stats')
+def get_dns_stats():
+    """Get hit/miss counters for the shared DNS cache.
+
+    With monitoring workers the counters are summed over every process.
+    """
+    if engine is not None:
+        return jsonify(merge_stats([get_dns_cache().stats()] + engine.call_all('dns_stats')))
+    return jsonify(get_dns_cache().stats())
+
+def parse_time_arg(value):
+    """Parse a query-string time given as epoch seconds or an ISO datetime."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def parse_resolution_arg(value):
+    """Parse a resolution like '300', '5m', '1h' or '1d' into seconds."""
+    if value is None:
+        return None
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if value[-1:] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+@app.route('/api/history/<website>')
+def get_history(website):
+    """Get min/avg/max/p95 latency and spike counts per time bucket.
+
+    Query args: `from` and `to` (epoch seconds or ISO datetime, default the
+    last 24 hours) and `resolution` (seconds or 30s/5m/1h/1d, default picked
+    from the range).
+    """
+    try:
+        start = parse_time_arg(request.args.get('from'))
+        end = parse_time_arg(request.args.get('to'))
+        resolution = parse_resolution_arg(request.args.get('resolution'))
+        query = get_history_query()
+        start, end, resolution = query.resolve(start, end, resolution)
+        host = website
+        if query.store.last_timestamp(host) is None and query.store.last_timestamp('www.' + host) is not None:
+            host = 'www.' + host  # Older logs kept the www. prefix that add_website strips
+        columns, source = query.query(host, start, end, resolution)
+        buckets = {field: [round(float(value), 2) for value in values] for field, values in columns.items()}
+        buckets['t'] = [int(value) for value in columns['t']]
+        buckets['count'] = [int(value) for value in columns['count']]
+        buckets['spikes'] = [int(value) for value in columns['spikes']]
+        return jsonify({
+            "website": website,
+            "from": start,
+            "to": end,
+            "resolution": resolution,
+            "source": source,
+            "buckets": buckets
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
 @app.route('/api/retrain/<website>', methods=['POST'])
 def retrain_predictor(website):
     """Manually retrain the predictor for a specific website."""
     try:
+        if engine is not None and engine.call(website, 'retrain') is not None:
+            return jsonify({"success": True, "message": f"Retrain queued for {website}"})
         if website in predictors:
-            predictors[website].retrain()
-            return jsonify({"success": True, "message": f"Predictor for {website} retrained"})
+            predictors[website].request_retrain()
+            return jsonify({"success": True, "message": f"Retrain queued for {website}"})
         else:
             return jsonify({"success": False, "error": "Website not found"})
     except Exception as e:
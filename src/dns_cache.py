@@ -0,0 +1,178 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_TTL = 60
+
+def system_resolver(name):
+    """Resolve A records, returning (addresses, ttl_seconds).
+
+    Uses dnspython for real record TTLs and falls back to getaddrinfo,
+    which also sees /etc/hosts names such as localhost.
+    """
+    try:
+        import dns.resolver
+        answer = dns.resolver.resolve(name, 'A')
+        return [str(rdata) for rdata in answer], answer.rrset.ttl
+    except Exception:
+        infos = socket.getaddrinfo(name, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos)), DEFAULT_TTL
+
+class _Entry:
+    __slots__ = ('addresses', 'expires', 'refresh_at')
+
+    def __init__(self, addresses, expires, refresh_at):
+        self.addresses = addresses
+        self.expires = expires
+        self.refresh_at = refresh_at
+
+class _Lookup:
+    __slots__ = ('done', 'addresses')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.addresses = []
+
+class DNSCache:
+    """Process-wide A record cache shared by monitoring and rerouting.
+
+    Entries live for the record TTL clamped to [min_ttl, max_ttl]. Failed
+    lookups are cached as empty results for negative_ttl. Concurrent misses
+    for the same name share one resolver call, and a hit past `refresh_ahead`
+    of its lifetime triggers a background refresh so hot names rarely expire.
+    `resolver(name) -> (addresses, ttl)` can be swapped for a stub in tests.
+    """
+
+    def __init__(self, resolver=None, min_ttl=5, max_ttl=300, negative_ttl=30,
+                 refresh_ahead=0.8, clock=time.monotonic):
+        self.resolver = resolver or system_resolver
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_ahead = refresh_ahead
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.errors = 0
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dns-refresh")
+
+    def _store(self, name, addresses, ttl):
+        now = self.clock()
+        if addresses:
+            ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        else:
+            ttl = self.negative_ttl
+        self._entries[name] = _Entry(addresses, now + ttl, now + ttl * self.refresh_ahead)
+
+    def _query(self, name):
+        try:
+            addresses, ttl = self.resolver(name)
+            return list(addresses), ttl
+        except Exception as e:
+            self.errors += 1
+            print(f"DNS resolution error for {name}: {e}")
+            return [], 0
+
+    def lookup_cached(self, name):
+        """Return cached addresses without blocking, or None on a miss."""
+        entry = self._entries.get(name)
+        if entry is None or entry.expires <= self.clock():
+            return None
+        return self._hit(name, entry)
+
+    def _hit(self, name, entry):
+        self.hits += 1
+        if not entry.addresses:
+            self.negative_hits += 1
+        if entry.refresh_at <= self.clock():
+            self._schedule_refresh(name)
+        return entry.addresses
+
+    def resolve(self, name):
+        """Return the A records for name; an empty list means the lookup failed."""
+        cached = self.lookup_cached(name)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            lookup = self._inflight.get(name)
+            owner = lookup is None
+            if owner:
+                lookup = self._inflight[name] = _Lookup()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            lookup.done.wait()
+            return lookup.addresses
+
+        addresses, ttl = self._query(name)
+        with self._lock:
+            self._store(name, addresses, ttl)
+            lookup.addresses = addresses
+            del self._inflight[name]
+        lookup.done.set()
+        return addresses
+
+    def _schedule_refresh(self, name):
+        with self._lock:
+            if name in self._inflight:
+                return
+            lookup = self._inflight[name] = _Lookup()
+        self._refresher.submit(self._refresh, name, lookup)
+
+    def _refresh(self, name, lookup):
+        addresses, ttl = self._query(name)
+        with self._lock:
+            # Keep serving the old records if the refresh itself failed
+            entry = self._entries.get(name)
+            if addresses or entry is None or not entry.addresses:
+                self._store(name, addresses, ttl)
+            else:
+                entry.refresh_at = entry.expires
+            self.refreshes += 1
+            lookup.addresses = addresses or (entry.addresses if entry else [])
+            del self._inflight[name]
+        lookup.done.set()
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "errors": self.errors
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_dns_cache():
+    """Return the process-wide DNS cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DNSCache()
+    return _cache
+
+def resolve_a(name):
+    """Resolve A records for name through the shared cache."""
+    return get_dns_cache().resolve(name)
@@ -0,0 +1,162 @@
+import datetime
+import time
+import zlib
+import numpy as np
+
+# Column order produced by LatencyPredictor.prepare_features
+FEATURE_NAMES = [
+    'hour', 'minute', 'second', 'day_of_week', 'is_weekend',
+    'rolling_mean', 'rolling_std', 'latency_diff', 'latency_diff_abs',
+    'ma_5', 'ma_10', 'volatility'
+]
+
+def stable_server_id(server_id, buckets=10):
+    """Bucket a site/server name identically in every process.
+
+    The built-in hash() is salted per process, so it cannot be used for
+    features that a saved or shared model relies on.
+    """
+    return zlib.crc32(str(server_id).encode('utf-8')) % buckets
+
+class RollingWindow:
+    """Fixed-size ring buffer keeping a running sum and sum of squares."""
+
+    def __init__(self, size, resync_every=1024):
+        self.size = size
+        self.values = [0.0] * size
+        self.pos = 0
+        self.count = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.resync_every = resync_every
+        self._updates = 0
+
+    def push(self, value):
+        if self.count == self.size:
+            old = self.values[self.pos]
+            self.sum -= old
+            self.sumsq -= old * old
+        else:
+            self.count += 1
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        self.sum += value
+        self.sumsq += value * value
+
+        # Recompute from the ring now and then so rounding error cannot drift
+        self._updates += 1
+        if self._updates >= self.resync_every:
+            live = self.values if self.count == self.size else self.values[:self.count]
+            self.sum = sum(live)
+            self.sumsq = sum(v * v for v in live)
+            self._updates = 0
+
+    def mean(self):
+        return self.sum / self.count
+
+    def std(self, same_run):
+        """Sample standard deviation; exactly 0 when the window is constant."""
+        n = self.count
+        if n < 2:
+            return float('nan')
+        # Mirrors pandas, which reports 0 for a run of identical values
+        if same_run >= n:
+            return 0.0
+        var = (self.sumsq - self.sum * self.sum / n) / (n - 1)
+        return var ** 0.5 if var > 0 else 0.0
+
+class IncrementalFeatures:
+    """Constant-cost equivalent of the last row of prepare_features().
+
+    Each update pushes one sample into 5- and 10-sample ring buffers and
+    keeps the previous latency for the diff, so the newest feature vector
+    never needs the rest of the history.
+    """
+
+    def __init__(self, short_window=5, long_window=10):
+        self.short = RollingWindow(short_window)
+        self.long = RollingWindow(long_window)
+        self.count = 0
+        self.last_latency = None
+        self.latency_diff = float('nan')
+        self.same_run = 0  # Consecutive identical latencies ending at the newest sample
+        self._calendar = None
+        self._day = None
+        self._day_fields = None
+
+    def __len__(self):
+        return self.count
+
+    def _calendar_fields(self, timestamp):
+        if isinstance(timestamp, (int, float)):
+            timestamp = datetime.datetime.fromtimestamp(timestamp)
+        # Day-of-week only changes at midnight, so cache it per calendar day
+        day = (timestamp.year, timestamp.month, timestamp.day)
+        if day != self._day:
+            dow = timestamp.weekday()
+            self._day = day
+            self._day_fields = (dow, int(dow >= 5))
+        return (timestamp.hour, timestamp.minute, timestamp.second) + self._day_fields
+
+    def update(self, latency, timestamp):
+        latency = float(latency)
+        if self.last_latency is not None:
+            self.latency_diff = latency - self.last_latency
+        self.same_run = self.same_run + 1 if latency == self.last_latency else 1
+        self.last_latency = latency
+        self.short.push(latency)
+        self.long.push(latency)
+        self._calendar = self._calendar_fields(timestamp)
+        self.count += 1
+
+    def vector(self):
+        """Return the newest 12-column feature row, or None before 2 samples."""
+        if self.count < 2:
+            return None
+        hour, minute, second, dow, weekend = self._calendar
+        rolling_mean = self.short.mean()
+        rolling_std = self.short.std(self.same_run)
+        if rolling_std == 0:
+            rolling_std = 1.0
+        return np.array([
+            hour, minute, second, dow, weekend,
+            rolling_mean, rolling_std, self.latency_diff, abs(self.latency_diff),
+            rolling_mean, self.long.mean(), self.long.std(self.same_run)
+        ], dtype=float)
+
+def local_calendar(timestamps):
+    """Vectorized local (hour, minute, second, day_of_week) for epoch seconds.
+
+    UTC offsets only change on quarter-hour boundaries, so they are looked
+    up once per distinct quarter hour rather than once per sample.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    quarters, inverse = np.unique(np.floor_divide(timestamps, 900), return_inverse=True)
+    offsets = np.array([time.localtime(q * 900).tm_gmtoff for q in quarters], dtype=np.float64)
+    local = np.floor(timestamps + offsets[inverse.reshape(-1)]).astype(np.int64)
+    seconds_of_day = local % 86400
+    # 1970-01-01 was a Thursday (weekday 3)
+    day_of_week = (local // 86400 + 3) % 7
+    return seconds_of_day // 3600, seconds_of_day % 3600 // 60, seconds_of_day % 60, day_of_week
+
+def feature_matrix(timestamps, latencies, short_window=5, long_window=10):
+    """Vectorized FEATURE_NAMES rows for a whole series of epoch samples.
+
+    Row i matches what IncrementalFeatures.vector() returns after the
+    first i + 1 samples, so the first row (no diff yet) is dropped.
+    """
+    import pandas as pd
+    latency = pd.Series(np.asarray(latencies, dtype=np.float64))
+    if len(latency) < 2:
+        return np.zeros((0, len(FEATURE_NAMES)))
+    hour, minute, second, dow = local_calendar(timestamps)
+    short_mean = latency.rolling(short_window, min_periods=1).mean()
+    short_std = latency.rolling(short_window, min_periods=1).std().replace(0, 1)
+    diff = latency.diff()
+    columns = [
+        hour, minute, second, dow, (dow >= 5).astype(int),
+        short_mean, short_std, diff, diff.abs(),
+        short_mean, latency.rolling(long_window, min_periods=1).mean(),
+        latency.rolling(long_window, min_periods=1).std()
+    ]
+    return np.column_stack([np.asarray(column, dtype=float) for column in columns])[1:]
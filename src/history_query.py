@@ -0,0 +1,179 @@
+import threading
+import time
+import numpy as np
+from src.history_store import get_history_store, normalize_host
+
+# Resolutions (seconds) kept as precomputed rollups
+ROLLUP_RESOLUTIONS = (60, 300, 3600)
+AGGREGATE_FIELDS = ('t', 'count', 'min', 'avg', 'max', 'p95', 'spikes')
+MAX_BUCKETS = 5000
+
+def aggregate(timestamps, latencies, spikes, resolution):
+    """Bucket sorted samples into epoch-aligned intervals of `resolution` seconds.
+
+    Returns a dict of equal-length arrays keyed by AGGREGATE_FIELDS. Empty
+    buckets are left out. p95 uses linear interpolation like np.percentile.
+    """
+    timestamps = np.asarray(timestamps)
+    latencies = np.asarray(latencies)
+    valid = np.isfinite(latencies)
+    if not valid.all():
+        timestamps, latencies, spikes = timestamps[valid], latencies[valid], np.asarray(spikes)[valid]
+    if len(timestamps) == 0:
+        return {field: np.zeros(0) for field in AGGREGATE_FIELDS}
+
+    buckets = np.floor_divide(timestamps, resolution).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(buckets)])
+
+    # Sort latencies within each bucket; buckets are already in order
+    ordered = latencies[np.lexsort((latencies, buckets))]
+    position = starts + 0.95 * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, starts + counts - 1)
+    fraction = position - lower
+    p95 = ordered[lower] * (1 - fraction) + ordered[upper] * fraction
+
+    return {
+        't': buckets[starts] * resolution,
+        'count': counts,
+        'min': ordered[starts],
+        'avg': np.add.reduceat(latencies, starts) / counts,
+        'max': ordered[starts + counts - 1],
+        'p95': p95,
+        'spikes': np.add.reduceat(np.asarray(spikes, dtype=np.int64), starts)
+    }
+
+def _empty():
+    return {field: np.zeros(0) for field in AGGREGATE_FIELDS}
+
+class _Rollup:
+    """Completed buckets for one host at one resolution, plus the open tail."""
+
+    def __init__(self, resolution, max_buckets):
+        self.resolution = resolution
+        self.max_buckets = max_buckets
+        self.columns = _empty()
+        self.position = None  # Store row where the open bucket starts; earlier rows are folded in
+        self.seen = 0  # Store rows aggregated so far, tail included
+        self.covered_from = None  # Queries starting here or later can use the rollup
+        self.tail = _empty()
+
+    def advance(self, store, host):
+        """Fold rows appended since the last call into the rollup."""
+        if self.position is None:
+            first = store.first_timestamp(host)
+            last = store.last_timestamp(host)
+            if first is None:
+                self.position, self.covered_from = 0, -np.inf
+                return
+            # Older history than the rollup keeps is answered from raw rows
+            oldest = max(first, last - self.max_buckets * self.resolution)
+            start = oldest // self.resolution * self.resolution
+            self.position = store.position(host, start)
+            self.covered_from = -np.inf if oldest == first else start
+        elif store.count(host) == self.seen:
+            return
+        data = store.read_rows(host, self.position)
+        self.seen = self.position + len(data['timestamp'])
+        fresh = aggregate(data['timestamp'], data['latency'], data['is_spike'], self.resolution)
+        if len(fresh['t']) == 0:
+            self.tail = fresh
+            return
+        # The newest bucket may still receive samples, so its rows are aggregated again next time
+        done = {field: values[:-1] for field, values in fresh.items()}
+        self.tail = {field: values[-1:] for field, values in fresh.items()}
+        if len(done['t']):
+            self.columns = {field: np.concatenate([self.columns[field], done[field]])
+                            for field in AGGREGATE_FIELDS}
+            if len(self.columns['t']) > self.max_buckets:
+                self.columns = {field: values[-self.max_buckets:] for field, values in self.columns.items()}
+                self.covered_from = float(self.columns['t'][0])
+            self.position += int(np.searchsorted(data['timestamp'], self.tail['t'][0], side='left'))
+
+    def select(self, start, end):
+        columns = {field: np.concatenate([self.columns[field], self.tail[field]]) for field in AGGREGATE_FIELDS}
+        t = columns['t']
+        i0 = np.searchsorted(t, start // self.resolution * self.resolution, side='left')
+        i1 = np.searchsorted(t, end, side='right')
+        return {field: values[i0:i1] for field, values in columns.items()}
+
+class HistoryQuery:
+    """Answers downsampled history queries over a HistoryStore.
+
+    Resolutions listed in ROLLUP_RESOLUTIONS are served from per-host
+    rollups. A host's rollups are built on its first query; after that each
+    append to the store in this process folds the new rows in as they are
+    written, and a query only catches up on rows written by other processes
+    (monitoring workers). Other resolutions, and ranges older than a rollup
+    retains, are aggregated from the raw memory-mapped rows.
+    """
+
+    def __init__(self, store=None, resolutions=ROLLUP_RESOLUTIONS, max_rollup_buckets=20000):
+        self.store = store or get_history_store()
+        self.resolutions = tuple(resolutions)
+        self.max_rollup_buckets = max_rollup_buckets
+        self._rollups = {}  # (host, resolution) -> _Rollup
+        self._lock = threading.Lock()
+        self.store.add_listener(self._on_append)
+
+    def _on_append(self, host):
+        with self._lock:
+            for resolution in self.resolutions:
+                rollup = self._rollups.get((host, resolution))
+                if rollup is not None:
+                    rollup.advance(self.store, host)
+
+    def auto_resolution(self, start, end, target_buckets=300):
+        """Smallest rollup resolution that keeps the chart to about target_buckets points."""
+        for resolution in self.resolutions:
+            if (end - start) / resolution <= target_buckets:
+                return resolution
+        return self.resolutions[-1]
+
+    def resolve(self, start=None, end=None, resolution=None):
+        """Fill in defaults (the last 24 hours, auto resolution) and validate."""
+        end = time.time() if end is None else end
+        start = end - 24 * 3600 if start is None else start
+        if start > end:
+            raise ValueError("from must not be after to")
+        if resolution is None:
+            resolution = self.auto_resolution(start, end)
+        if resolution <= 0:
+            raise ValueError("resolution must be positive")
+        if (end - start) / resolution > MAX_BUCKETS:
+            raise ValueError(f"Too many buckets; use a resolution of at least {(end - start) / MAX_BUCKETS:.0f}s")
+        return start, end, resolution
+
+    def query(self, host, start=None, end=None, resolution=None):
+        """Aggregate host history over [start, end] into resolution-second buckets.
+
+        Returns (columns, source) where source is 'rollup' or 'raw'.
+        """
+        host = normalize_host(host)
+        start, end, resolution = self.resolve(start, end, resolution)
+
+        if resolution in self.resolutions:
+            with self._lock:
+                rollup = self._rollups.get((host, resolution))
+                if rollup is None:
+                    rollup = self._rollups[(host, resolution)] = _Rollup(resolution, self.max_rollup_buckets)
+                rollup.advance(self.store, host)
+                if rollup.covered_from is not None and start >= rollup.covered_from:
+                    return rollup.select(start, end), 'rollup'
+
+        data = self.store.read(host, start // resolution * resolution, end)
+        columns = aggregate(data['timestamp'], data['latency'], data['is_spike'], resolution)
+        return columns, 'raw'
+
+_query = None
+_query_lock = threading.Lock()
+
+def get_history_query():
+    """Return the process-wide history query helper, creating it on first use."""
+    global _query
+    if _query is None:
+        with _query_lock:
+            if _query is None:
+                _query = HistoryQuery()
+    return _query
@@ -0,0 +1,487 @@
+import glob
+import io
+import os
+import re
+import threading
+from urllib.parse import quote, unquote
+import numpy as np
+
+SEGMENT_MAGIC = b'LATSEG01'
+SEGMENT_VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'), ('version', '<u4'), ('stride', '<u4'),
+    ('capacity', '<u8'), ('count', '<u8'), ('reserved', 'V32')
+])
+DEFAULT_SEGMENT_ROWS = 65536
+DEFAULT_INDEX_STRIDE = 256
+
+def normalize_host(name):
+    """Map the different spellings of a host to one key.
+
+    Older logs were written with dots replaced by underscores
+    (latency_log_www_youtube_com.csv), newer ones kept the dots.
+    """
+    return name.strip().lower().replace('_', '.').replace(os.sep, '.')
+
+def host_filename(host):
+    """File-name-safe form of a host name; `:` (host:port, IPv6) and the like are %-encoded."""
+    return quote(host, safe='.-_')
+
+def _align(size):
+    return (size + 7) // 8 * 8
+
+class Segment:
+    """One fixed-capacity, append-only file of columnar samples.
+
+    Layout after a 64 byte header: float64 timestamp, latency and predicted
+    columns, a little-endian spike bitmap, then a time index holding the
+    first timestamp of every `stride` rows. All columns are preallocated at
+    `capacity`, so appends never move data and readers can memory-map the
+    file once. The committed row count in the header is written last, which
+    keeps readers from seeing half-written rows.
+    """
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.writable = writable
+        mode = 'r+' if writable else 'r'
+        self.header = np.memmap(path, dtype=HEADER_DTYPE, mode=mode, shape=(1,))
+        if self.header['magic'][0] != SEGMENT_MAGIC:
+            raise ValueError(f"Not a latency segment: {path}")
+        if self.header['version'][0] != SEGMENT_VERSION:
+            raise ValueError(f"Unsupported segment version {self.header['version'][0]}: {path}")
+        self.capacity = int(self.header['capacity'][0])
+        self.stride = int(self.header['stride'][0])
+        offset = HEADER_SIZE
+        columns = {}
+        for name in ('timestamp', 'latency', 'predicted'):
+            columns[name] = np.memmap(path, dtype='<f8', mode=mode, offset=offset, shape=(self.capacity,))
+            offset += self.capacity * 8
+        bitmap_size = _align((self.capacity + 7) // 8)
+        self.bitmap = np.memmap(path, dtype=np.uint8, mode=mode, offset=offset, shape=(bitmap_size,))
+        offset += bitmap_size
+        self.index = np.memmap(path, dtype='<f8', mode=mode, offset=offset,
+                               shape=(-(-self.capacity // self.stride),))
+        self.timestamp_column = columns['timestamp']
+        self.latency_column = columns['latency']
+        self.predicted_column = columns['predicted']
+
+    @classmethod
+    def create(cls, path, capacity=DEFAULT_SEGMENT_ROWS, stride=DEFAULT_INDEX_STRIDE):
+        blocks = -(-capacity // stride)
+        size = HEADER_SIZE + 3 * capacity * 8 + _align((capacity + 7) // 8) + blocks * 8
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = SEGMENT_MAGIC
+        header['version'] = SEGMENT_VERSION
+        header['stride'] = stride
+        header['capacity'] = capacity
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(header.tobytes())
+            f.truncate(size)
+        os.replace(tmp_path, path)
+        return cls(path, writable=True)
+
+    @property
+    def count(self):
+        return int(self.header['count'][0])
+
+    @property
+    def free(self):
+        return self.capacity - self.count
+
+    @property
+    def first_timestamp(self):
+        return float(self.timestamp_column[0]) if self.count else None
+
+    @property
+    def last_timestamp(self):
+        count = self.count
+        return float(self.timestamp_column[count - 1]) if count else None
+
+    def append(self, timestamps, latencies, predicted, spikes, sync=True):
+        """Write as many rows as fit and return how many were written."""
+        start = self.count
+        n = min(len(timestamps), self.capacity - start)
+        if n <= 0:
+            return 0
+        end = start + n
+        self.timestamp_column[start:end] = timestamps[:n]
+        self.latency_column[start:end] = latencies[:n]
+        self.predicted_column[start:end] = predicted[:n]
+
+        # Rewrite the bytes covering the new bits, keeping bits already set
+        first_byte, last_byte = start // 8, (end + 7) // 8
+        bits = np.unpackbits(self.bitmap[first_byte:last_byte], bitorder='little')
+        bits[start - first_byte * 8:end - first_byte * 8] = spikes[:n]
+        self.bitmap[first_byte:last_byte] = np.packbits(bits, bitorder='little')
+
+        first_block, last_block = -(-start // self.stride), (end - 1) // self.stride
+        if first_block <= last_block:
+            self.index[first_block:last_block + 1] = \
+                self.timestamp_column[first_block * self.stride:last_block * self.stride + 1:self.stride]
+
+        if sync:
+            self._flush_columns()
+        self.header['count'] = end
+        if sync:
+            self.header.flush()
+        return n
+
+    def _flush_columns(self):
+        self.timestamp_column.flush()
+        self.latency_column.flush()
+        self.predicted_column.flush()
+        self.bitmap.flush()
+        self.index.flush()
+
+    def flush(self):
+        """msync rows appended with sync=False, columns before the row count."""
+        if self.writable:
+            self._flush_columns()
+            self.header.flush()
+
+    def _search(self, value, side, count):
+        # Searching the index with the same side picks the last block that
+        # starts before the answer, so runs of equal timestamps straddling a
+        # block boundary are found from their first (or past their last) row;
+        # if the answer is not inside that block it is the next block's start
+        blocks = -(-count // self.stride)
+        block = max(int(np.searchsorted(self.index[:blocks], value, side=side)) - 1, 0)
+        lo = block * self.stride
+        hi = min(lo + self.stride, count)
+        return lo + int(np.searchsorted(self.timestamp_column[lo:hi], value, side=side))
+
+    def locate(self, start=None, end=None):
+        """Return the row range [i0, i1) with start <= timestamp <= end."""
+        count = self.count
+        i0 = 0 if start is None else self._search(start, 'left', count)
+        i1 = count if end is None else self._search(end, 'right', count)
+        return i0, max(i0, i1)
+
+    def spikes(self, i0, i1):
+        if i1 <= i0:
+            return np.zeros(0, dtype=bool)
+        first_byte = i0 // 8
+        bits = np.unpackbits(self.bitmap[first_byte:(i1 + 7) // 8], bitorder='little')
+        return bits[i0 - first_byte * 8:i1 - first_byte * 8].astype(bool)
+
+    def slice(self, start=None, end=None):
+        """Columns for a time range; numeric columns are views into the map."""
+        return self.rows(*self.locate(start, end))
+
+    def rows(self, i0, i1):
+        """Columns for the row range [i0, i1)."""
+        return {
+            'timestamp': self.timestamp_column[i0:i1],
+            'latency': self.latency_column[i0:i1],
+            'predicted': self.predicted_column[i0:i1],
+            'is_spike': self.spikes(i0, i1)
+        }
+
+def _concat(parts):
+    """Join per-segment column dicts into one."""
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        return {
+            'timestamp': np.zeros(0), 'latency': np.zeros(0),
+            'predicted': np.zeros(0), 'is_spike': np.zeros(0, dtype=bool)
+        }
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+class HistoryStore:
+    """Per-host latency history kept as a series of memory-mapped segments.
+
+    Each host gets a directory of `seg-NNNNNN.lat` files under `root`. Rows
+    are appended to the newest segment and a new one is started when it is
+    full. Timestamps within a host never go backwards, so a time range is
+    found with the segment index and a binary search rather than a scan.
+    With `sync=False` appends are not msync'ed; other readers still see them
+    through the page cache, but a crash may lose rows appended since the
+    last flush(). A full segment is always flushed before the next starts.
+    """
+
+    def __init__(self, root=os.path.join('data', 'history'), segment_rows=DEFAULT_SEGMENT_ROWS,
+                 index_stride=DEFAULT_INDEX_STRIDE, sync=True):
+        self.root = root
+        self.sync = sync
+        self.segment_rows = segment_rows
+        self.index_stride = index_stride
+        self._segments = {}  # host -> [Segment], oldest first
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Call callback(host) after every append to host in this process."""
+        self._listeners.append(callback)
+
+    def _host_dir(self, host):
+        return os.path.join(self.root, host_filename(normalize_host(host)))
+
+    def hosts(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(unquote(name) for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)))
+
+    def segments(self, host):
+        """Open (once) and return the segments for host, oldest first."""
+        host = normalize_host(host)
+        with self._lock:
+            return list(self._load(host))
+
+    def _load(self, host):
+        segments = self._segments.get(host)
+        directory = self._host_dir(host)
+        paths = sorted(glob.glob(os.path.join(directory, 'seg-*.lat')))
+        if segments is None or len(segments) != len(paths):
+            # Only the newest segment is ever written to
+            segments = [Segment(path, writable=(i == len(paths) - 1)) for i, path in enumerate(paths)]
+            self._segments[host] = segments
+        return segments
+
+    def first_timestamp(self, host):
+        segments = self.segments(host)
+        return segments[0].first_timestamp if segments else None
+
+    def last_timestamp(self, host):
+        segments = self.segments(host)
+        return segments[-1].last_timestamp if segments else None
+
+    def count(self, host):
+        return sum(segment.count for segment in self.segments(host))
+
+    def append(self, host, timestamps, latencies, predicted=None, spikes=None):
+        """Append rows for host and return how many were stored.
+
+        Timestamps earlier than what is already stored are clamped forward so
+        the column stays sorted; a clock step back should not break range reads.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        n = len(timestamps)
+        if n == 0:
+            return 0
+        latencies = np.asarray(latencies, dtype=np.float64)
+        predicted = np.full(n, np.nan) if predicted is None else np.asarray(predicted, dtype=np.float64)
+        spikes = np.zeros(n, dtype=np.uint8) if spikes is None else np.asarray(spikes, dtype=bool).astype(np.uint8)
+
+        host = normalize_host(host)
+        with self._lock:
+            segments = self._load(host)
+            last = segments[-1].last_timestamp if segments else None
+            if last is not None:
+                timestamps = np.maximum(timestamps, last)
+            timestamps = np.maximum.accumulate(timestamps)
+
+            written = 0
+            while written < n:
+                if not segments or segments[-1].free == 0:
+                    segments = self._new_segment(host, segments)
+                written += segments[-1].append(timestamps[written:], latencies[written:],
+                                               predicted[written:], spikes[written:], self.sync)
+        for callback in self._listeners:
+            try:
+                callback(host)
+            except Exception as e:
+                print(f"Error notifying history listener for {host}: {str(e)}")
+        return written
+
+    def _new_segment(self, host, segments):
+        directory = self._host_dir(host)
+        os.makedirs(directory, exist_ok=True)
+        if segments:
+            segments[-1].flush()
+            segments[-1] = Segment(segments[-1].path)  # Reopen read-only
+        path = os.path.join(directory, f"seg-{len(segments):06d}.lat")
+        segments.append(Segment.create(path, self.segment_rows, self.index_stride))
+        return segments
+
+    def flush(self):
+        """msync the newest segment of every open host."""
+        with self._lock:
+            segments = [host_segments[-1] for host_segments in self._segments.values() if host_segments]
+            for segment in segments:
+                segment.flush()
+
+    def append_records(self, records):
+        """Append log records (tuples in LOG_HEADER order), grouped by host."""
+        by_host = {}
+        for record in records:
+            by_host.setdefault(record[1], []).append(record)
+        for host, rows in by_host.items():
+            try:
+                self.append(host,
+                            [row[0] for row in rows],
+                            [row[2] for row in rows],
+                            [np.nan if row[3] is None else row[3] for row in rows],
+                            [bool(row[4]) for row in rows])
+            except Exception as e:
+                print(f"Error appending history for {host}: {str(e)}")
+
+    def iter_range(self, host, start=None, end=None):
+        """Yield one dict of column views per segment overlapping [start, end]."""
+        for segment in self.segments(host):
+            first, last = segment.first_timestamp, segment.last_timestamp
+            if first is None or (end is not None and first > end) or (start is not None and last < start):
+                continue
+            columns = segment.slice(start, end)
+            if len(columns['timestamp']):
+                yield columns
+
+    def position(self, host, timestamp):
+        """Index, counted across all of host's segments, of the first row at or after timestamp."""
+        offset = 0
+        for segment in self.segments(host):
+            last = segment.last_timestamp
+            if last is not None and last >= timestamp:
+                return offset + segment.locate(timestamp)[0]
+            offset += segment.count
+        return offset
+
+    def read_rows(self, host, position=0):
+        """Return the columns of host's rows from index `position` (see position()) onward."""
+        parts, offset = [], 0
+        for segment in self.segments(host):
+            count = segment.count
+            if offset + count > position:
+                parts.append(segment.rows(max(position - offset, 0), count))
+            offset += count
+        return _concat(parts)
+
+    def read(self, host, start=None, end=None):
+        """Return the columns for [start, end] as contiguous arrays."""
+        return _concat(list(self.iter_range(host, start, end)))
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_history_store():
+    """Return the process-wide history store, creating it on first use.
+
+    Appends are not msync'ed one by one; the log writer, its only writer,
+    flushes the store on a timer, on rotation and on close.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HistoryStore(os.environ.get('LATENCY_HISTORY_DIR', os.path.join('data', 'history')),
+                                      sync=False)
+    return _store
+
+# latency_log_<host>.csv, rotated copies latency_log_<host>.<stamp>.csv, and the
+# latency_log_<host>.csv.<stamp> names older writers rotated to
+_LOG_NAME = re.compile(r'^latency_log(?:_(?P<host>.+?))?(?:\.\d{8}-\d{6}(?:-\d+)?)?\.csv(?:\.\d{8}-\d{6}(?:-\d+)?)?$')
+LOG_GLOB = 'latency_log*.csv*'
+# Anything outside this range is a line mangled by interleaved writes
+_PLAUSIBLE_EPOCHS = (946684800.0, 4102444800.0)  # 2000-01-01 .. 2100-01-01
+
+def log_file_path(host, logs_dir='logs'):
+    """Where the monitor logs host: logs/latency_log_<host>.csv."""
+    return os.path.join(logs_dir, f"latency_log_{host_filename(host)}.csv")
+
+def is_log_file(path):
+    return _LOG_NAME.match(os.path.basename(path)) is not None
+
+def log_file_host(path):
+    """Host encoded in a (possibly rotated) latency_log_<host>.csv name, or None for latency_log.csv."""
+    match = _LOG_NAME.match(os.path.basename(path))
+    return unquote(match.group('host')) if match and match.group('host') else None
+
+def _tail_lines(path, tail_bytes):
+    """The whole lines within the last tail_bytes of path, as text."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(size - tail_bytes, 0))
+        data = f.read()
+    if size > tail_bytes:
+        data = data[data.find(b'\n') + 1:]  # Drop the partial first line
+    return io.StringIO(data.decode('utf-8', errors='replace'))
+
+def read_log_csv(path, default_host=None, tail_bytes=None):
+    """Parse a latency log in either historical format into column arrays.
+
+    Current rows are `epoch,server,latency,predicted,is_spike,...` (with a
+    header); older headerless rows are `datetime,latency,predicted,is_spike,...`
+    with a naive local time and no server, which then comes from default_host.
+    With `tail_bytes` only the end of the file is read.
+    Returns a dict of arrays: host, timestamp, latency, predicted, is_spike.
+    """
+    import pandas as pd
+    from dateutil import tz
+    source = path if tail_bytes is None else _tail_lines(path, tail_bytes)
+    frame = pd.read_csv(source, header=None, names=range(8), dtype=str, on_bad_lines='skip',
+                        keep_default_na=False, encoding_errors='replace')
+    first = frame[0]
+    epoch = pd.to_numeric(first, errors='coerce')
+    is_epoch = epoch.notna().to_numpy()
+    dated = pd.to_datetime(first.where(~is_epoch), errors='coerce', format='ISO8601')
+    dated = dated.dt.tz_localize(tz.tzlocal(), ambiguous='NaT', nonexistent='NaT')
+    dated_epoch = (dated - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+
+    timestamp = np.where(is_epoch, epoch.to_numpy(dtype=np.float64, na_value=np.nan),
+                         dated_epoch.to_numpy(dtype=np.float64, na_value=np.nan))
+    host = np.where(is_epoch, frame[1].to_numpy(), default_host or '')
+    latency = pd.to_numeric(pd.Series(np.where(is_epoch, frame[2], frame[1])), errors='coerce').to_numpy()
+    predicted = pd.to_numeric(pd.Series(np.where(is_epoch, frame[3], frame[2])), errors='coerce').to_numpy()
+    spike = np.where(is_epoch, frame[4], frame[3])
+
+    valid = ((timestamp >= _PLAUSIBLE_EPOCHS[0]) & (timestamp < _PLAUSIBLE_EPOCHS[1])
+             & np.isfinite(latency) & ((spike == 'True') | (spike == 'False')) & (host != ''))
+    return {
+        'host': host[valid],
+        'timestamp': timestamp[valid],
+        'latency': latency[valid],
+        'predicted': predicted[valid],
+        'is_spike': spike[valid] == 'True'
+    }
+
+def import_csv_logs(logs_dir='logs', store=None):
+    """Merge every logs/latency_log*.csv into the history store.
+
+    Files for the same host under different names are combined, rows are
+    sorted and de-duplicated by timestamp, and only rows newer than what the
+    store already holds are appended, so the import can be re-run safely.
+    Returns {host: rows_imported}.
+    """
+    store = store or get_history_store()
+    parts = {}
+    total = 0
+    for path in sorted(glob.glob(os.path.join(logs_dir, LOG_GLOB))):
+        if not is_log_file(path):
+            continue
+        columns = read_log_csv(path, log_file_host(path))
+        total += len(columns['timestamp'])
+        names, codes = np.unique(columns['host'], return_inverse=True)
+        for code, name in enumerate(names):
+            rows = codes == code
+            parts.setdefault(normalize_host(str(name)), []).append(
+                {column: values[rows] for column, values in columns.items()})
+
+    imported = {}
+    for host, host_parts in sorted(parts.items()):
+        merged = {name: np.concatenate([part[name] for part in host_parts]) for name in host_parts[0]}
+        order = np.argsort(merged['timestamp'], kind='stable')
+        merged = {name: values[order] for name, values in merged.items()}
+        timestamps = merged['timestamp']
+        keep = np.ones(len(timestamps), dtype=bool)
+        keep[1:] = np.diff(timestamps) > 0
+        last = store.last_timestamp(host)
+        if last is not None:
+            keep &= timestamps > last
+        imported[host] = store.append(host, timestamps[keep], merged['latency'][keep],
+                                      merged['predicted'][keep], merged['is_spike'][keep]) if keep.any() else 0
+    print(f"Imported {sum(imported.values())} of {total} parsed rows for {len(imported)} hosts")
+    return imported
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Import latency CSV logs into the history store")
+    parser.add_argument('--logs', default='logs', help="directory containing latency_log*.csv")
+    parser.add_argument('--store', default=os.path.join('data', 'history'), help="history store root")
+    args = parser.parse_args()
+    for host, count in import_csv_logs(args.logs, HistoryStore(args.store)).items():
+        print(f"{host}: {count} rows")
@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+class _TimedConnectionMixin:
+    """Records how long a new connection's TCP connect and TLS handshake took."""
+    connect_ms = None
+    tls_ms = None
+    fresh = False  # Set on connect, cleared once a probe has read the timings
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        self.connect_ms = (time.perf_counter() - started) * 1000
+        return sock
+
+    def connect(self):
+        started = time.perf_counter()
+        self.connect_ms = None
+        super().connect()
+        total = (time.perf_counter() - started) * 1000
+        self.tls_ms = total - (self.connect_ms or 0.0) if isinstance(self, HTTPSConnection) else None
+        self.fresh = True
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections carry their connect/TLS timings."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool
+        }
+
+class SessionManager:
+    """One keep-alive requests.Session per domain, shared by switching and probing.
+
+    Each session holds the domain's cookies and a bounded connection pool
+    (`pool_maxsize` connections per host), so repeated switches and probes
+    reuse warm TCP/TLS connections. At most `max_sessions` domains are kept;
+    the least recently used session is closed to make room.
+    """
+
+    def __init__(self, max_sessions=64, pool_maxsize=4, timeout=5.0, scheme="https", switch_scheme="http",
+                 max_drain=256 * 1024, verify=True):
+        self.max_sessions = max_sessions
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.scheme = scheme  # For probes of the domain itself
+        self.switch_scheme = switch_scheme  # For requests to an alternate server's address
+        self.max_drain = max_drain
+        self.verify = verify  # False or a CA bundle path for local stand-in servers
+        self.created = 0
+        self.evicted = 0
+        self.probes = 0
+        self.new_connections = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = TimedAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def session(self, domain):
+        """Return the domain's session, creating it (and evicting the oldest) if needed."""
+        evicted = None
+        with self._lock:
+            session = self._sessions.get(domain)
+            if session is not None:
+                self._sessions.move_to_end(domain)
+                return session
+            session = self._sessions[domain] = self._new_session()
+            self.created += 1
+            if len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self.evicted += 1
+        if evicted is not None:
+            evicted.close()
+        return session
+
+    def cookies(self, domain):
+        with self._lock:
+            session = self._sessions.get(domain)
+        return session.cookies.get_dict() if session is not None else {}
+
+    def switch(self, domain, new_server):
+        """Make a request to new_server with the domain's cookies and connection pool."""
+        try:
+            session = self.session(domain)
+            # Jar cookies are scoped to the host that set them and would not be sent to
+            # another address, so pass them explicitly; the response's cookies join the jar
+            response = session.get(f'{self.switch_scheme}://{new_server}', cookies=session.cookies.get_dict(),
+                                   allow_redirects=True, timeout=self.timeout, verify=self.verify)
+            response.close()
+            return True
+        except Exception as e:
+            print(f"Server switch error: {e}")
+            return False
+
+    def probe(self, domain, url=None, timeout=None):
+        """Time one GET, returning {connect_ms, tls_ms, ttfb_ms, total_ms, status, reused} or None.
+
+        connect_ms and tls_ms are only measured when the request needed a new
+        connection; on a reused keep-alive connection they are None. ttfb_ms
+        is from sending the request to the response headers, excluding any
+        connection setup.
+        """
+        url = url or f"{self.scheme}://{domain}/"
+        try:
+            started = time.perf_counter()
+            response = self.session(domain).get(url, stream=True, allow_redirects=False,
+                                                timeout=timeout or self.timeout, verify=self.verify)
+            headers_at = time.perf_counter()
+            connection = getattr(response.raw, "connection", None) or getattr(response.raw, "_connection", None)
+            connect_ms = tls_ms = None
+            reused = not getattr(connection, "fresh", False)
+            if not reused:
+                connect_ms, tls_ms = connection.connect_ms, connection.tls_ms
+                connection.fresh = False
+                self.new_connections += 1
+            total_ms = (headers_at - started) * 1000
+            ttfb_ms = total_ms - (connect_ms or 0.0) - (tls_ms or 0.0)
+            # Read small bodies so the connection goes back to the pool; drop big ones
+            length = response.headers.get("Content-Length")
+            if length is not None and length.isdigit() and int(length) <= self.max_drain:
+                response.content
+            else:
+                response.close()
+            self.probes += 1
+            return {
+                "connect_ms": connect_ms,
+                "tls_ms": tls_ms,
+                "ttfb_ms": ttfb_ms,
+                "total_ms": total_ms,
+                "status": response.status_code,
+                "reused": reused
+            }
+        except Exception as e:
+            print(f"HTTP probe error for {url}: {str(e)}")
+            return None
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "created": self.created,
+                "evicted": self.evicted,
+                "probes": self.probes,
+                "new_connections": self.new_connections
+            }
+
+def timing_fields(result):
+    """Status fields for one probe result, in ms rounded to 0.01.
+
+    A reused keep-alive connection keeps showing the last handshake's timings.
+    """
+    fields = ("ttfb_ms",) if result["reused"] else ("connect_ms", "tls_ms", "ttfb_ms")
+    return {key: round(result[key], 2) if result[key] is not None else None for key in fields}
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_session_manager(**settings):
+    """Return the process-wide HTTP session manager, creating it on first use.
+
+    Keyword settings (scheme, switch_scheme, verify, timeout) are applied
+    to the manager, whether it is new or already running.
+    """
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = SessionManager(**settings)
+                return _manager
+    for name, value in settings.items():
+        if name not in ("scheme", "switch_scheme", "verify", "timeout"):
+            raise TypeError(f"Unknown session manager setting: {name}")
+        setattr(_manager, name, value)
+    return _manager
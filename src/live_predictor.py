@@ -1,19 +1,24 @@
-from river import linear_model, preprocessing
 import datetime
 import time
-import pickle
-import os
-import csv
-import json
 from src.ping_utils import ping_latency
-from src.reroute_selector import get_best_server
-import pandas as pd
+from src.reroute_candidates import get_candidate_table
+from src.dns_cache import get_dns_cache
+from src.http_pool import get_session_manager, timing_fields
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-import joblib
 import threading
+import random
 import warnings
+from collections import deque
+from src.feature_engine import IncrementalFeatures, FEATURE_NAMES, stable_server_id, feature_matrix
+from src.retrain_pool import get_retrain_pool
+from src.training_store import TrainingStore, to_epoch
+from src.predictor_backends import make_backend
+from src.log_writer import get_log_writer
+from src.warm_start import recent_history, get_base_model, is_preloaded, preload_in_background
+from src.history_store import log_file_path
+from src.predictor_snapshot import get_snapshot_store
+from src.metrics import (PROBE_RTT, PROBE_SECONDS, PROBE_FAILURES, SPIKES, PREDICT_SECONDS,
+                         RETRAIN_SECONDS, REROUTE_SECONDS)
 warnings.filterwarnings('ignore')
 
 def extract_features(timestamp, server_id):
@@ -24,7 +29,7 @@ def extract_features(timestamp, server_id):
         "day_of_week": dt.weekday(),
         "is_weekend": int(dt.weekday() >= 5),
         "is_business_hours": int(9 <= dt.hour <= 17),
-        "server_id": hash(server_id) % 10,
+        "server_id": stable_server_id(server_id),
         "time_of_day": dt.hour + dt.minute/60,  # Continuous time feature
         "is_night": int(22 <= dt.hour or dt.hour <= 6),  # Night hours
         "is_morning": int(6 < dt.hour <= 12),  # Morning hours
@@ -52,22 +57,58 @@ def detect_spike(actual, predicted, threshold_ms=15, min_latency_ms=100):
     return False, 0
 
 class LatencyPredictor:
-    def __init__(self, max_history=100, spike_threshold=2.0, min_samples=5, retrain_interval=20):
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.scaler = StandardScaler()
+    def __init__(self, max_history=100, spike_threshold=2.0, min_samples=5, retrain_interval=20,
+                 retention='window', store_capacity=5000, max_train_samples=2000, backend=None, site=None,
+                 warm_start=True, warm_start_samples=2000, warm_start_budget=0.25, use_base_model=True,
+                 synchronous_retrain=False, snapshots=True):
+        self.site = site
+        self.backend = make_backend(backend, site)  # 'forest', 'river', 'shared' or a backend instance
         self.max_history = max_history
         self.spike_threshold = spike_threshold
         self.min_samples = min_samples
         self.retrain_interval = retrain_interval
-        self.history = []
+        self.history = deque(maxlen=max_history)
+        self.features = IncrementalFeatures()  # Per-tick features without rebuilding a DataFrame
         self.last_retrain = 0
-        self.is_trained = False
-        self.training_data = []  # Store all historical data for training
+        self.max_train_samples = max_train_samples
+        # Bounded columnar store of (timestamp, latency, features) for batch training;
+        # online backends learn as they go and keep no per-site copy
+        if self.backend.online:
+            store_capacity = 0
+        self.training_data = TrainingStore(len(FEATURE_NAMES), policy=retention, capacity=store_capacity)
+        self.samples_seen = 0
+        self.last_fit_duration = None
+        self.abs_error_sum = 0.0
+        self.predictions = 0
+        self._pending_sample = None  # Online backends learn a sample after predicting it
+        self._retrain_lock = threading.Lock()
+        # Held while update() changes history, features and the model, so a
+        # snapshot taken from another thread never sees them half-updated
+        self._state_lock = threading.Lock()
+        self.synchronous_retrain = synchronous_retrain  # Replays refit inline, deterministically
+        # Seeded from the site's recorded history on the first update, not here
+        self.warm_start_samples = warm_start_samples
+        self.warm_start_budget = warm_start_budget
+        self.warm_samples = 0
+        self.use_base_model = use_base_model
+        self.base_model = None
+        self.base_scale = None  # Site latency / base model output, set on first fallback use
+        self._warm_pending = warm_start and site is not None
+        # A saved snapshot, if any, is restored on the first update instead of warm-starting
+        self._restore_pending = snapshots and site is not None
+        if self._restore_pending:
+            get_snapshot_store().register(self)
+        
+    @property
+    def is_trained(self):
+        return self.backend.is_ready
         
     def prepare_features(self, history):
+        """Batch feature matrix for a list of samples; the live path uses self.features."""
         if len(history) < 2:
             return None
             
+        import pandas as pd
         df = pd.DataFrame(history)
         df['timestamp'] = pd.to_datetime(df['timestamp'])
         
@@ -100,30 +141,30 @@ class LatencyPredictor:
         if len(df) == 0:
             return None
             
-        features = [
-            'hour', 'minute', 'second', 'day_of_week', 'is_weekend',
-            'rolling_mean', 'rolling_std', 'latency_diff', 'latency_diff_abs',
-            'ma_5', 'ma_10', 'volatility'
-        ]
-        return df[features].values
+        return df[FEATURE_NAMES].values
         
     def predict(self, current_latency):
         try:
             if len(self.history) < self.min_samples:
                 return current_latency, False, 0
                 
-            features = self.prepare_features(self.history)
+            features = self.features.vector()
             if features is None:
                 return current_latency, False, 0
                 
-            if not self.is_trained or len(self.history) % self.retrain_interval == 0:
-                self.retrain()
-                
-            # Scale features
-            features_scaled = self.scaler.transform(features[-1:])
-            
             # Make prediction
-            predicted = self.model.predict(features_scaled)[0]
+            predicted = self.backend.predict_one(features)
+            if predicted is None:
+                if not self.backend.online:
+                    self.request_retrain()
+                # Until the site's own model is ready, fall back to the pretrained one
+                if self.base_model is not None:
+                    predicted = self.base_prediction(time.time())
+                if predicted is None:
+                    return current_latency, False, 0
+            
+            self.abs_error_sum += abs(current_latency - predicted)
+            self.predictions += 1
             
             # Calculate spike severity
             if current_latency > predicted * self.spike_threshold:
@@ -136,111 +177,364 @@ class LatencyPredictor:
             print(f"Error in prediction: {str(e)}")
             return current_latency, False, 0
             
-    def update(self, latency, timestamp):
+    def base_prediction(self, timestamp):
+        """The base model's prediction rescaled to this site's latency level.
+
+        The base model was fit on other servers and can be off by an order of
+        magnitude for a given site, which would hide every spike. The scale is
+        the ratio of medians over the samples in history when it is first used.
+        """
+        if self.base_scale is None:
+            samples = list(self.history)
+            if not samples:
+                return None
+            base = np.median([self.base_model.predict_one(extract_features(to_epoch(s['timestamp']), self.site))
+                              for s in samples])
+            if not base > 0:
+                return None
+            self.base_scale = float(np.median([s['latency'] for s in samples]) / base)
+        return self.base_model.predict_one(extract_features(timestamp, self.site)) * self.base_scale
+
+    def warm_start(self):
+        """Seed history, features and the backend from the site's recorded history.
+
+        Runs once, from update(), and stops after `warm_start_budget` seconds
+        so many sites starting together stay cheap. The libraries and base
+        model it needs load on a background thread first; until they are
+        ready it is retried on later ticks instead of spending the budget on
+        imports. Batch backends get the rows in their training store and a
+        background fit.
+        """
+        if not is_preloaded():
+            preload_in_background()
+            return
+        self._warm_pending = False
+        started = time.perf_counter()
+        deadline = started + self.warm_start_budget
         try:
-            # Add to history
-            self.history.append({
-                'timestamp': timestamp,
-                'latency': latency
-            })
-            
-            # Add to training data
-            self.training_data.append({
-                'timestamp': timestamp,
-                'latency': latency
-            })
-            
-            # Keep history size limited
-            if len(self.history) > self.max_history:
-                self.history.pop(0)
-                
-            # Retrain periodically
-            if len(self.history) >= self.retrain_interval and len(self.history) % self.retrain_interval == 0:
-                self.retrain()
-                
+            if self.use_base_model:
+                self.base_model = get_base_model()
+            timestamps, latencies = recent_history(self.site, self.warm_start_samples)
+            # Ticks seen while the preload ran are newer than anything recorded
+            live = list(self.history)
+            if live:
+                keep = timestamps < to_epoch(live[0]['timestamp'])
+                timestamps, latencies = timestamps[keep], latencies[keep]
+            if len(latencies) < 2 or time.perf_counter() > deadline:
+                return
+
+            seeded = [{'timestamp': datetime.datetime.fromtimestamp(ts), 'latency': float(latency)}
+                      for ts, latency in zip(timestamps[-self.max_history:], latencies[-self.max_history:])]
+            self.history = deque((seeded + live)[-self.max_history:], maxlen=self.max_history)
+            self.features = IncrementalFeatures()
+            recent = [(float(ts), float(latency)) for ts, latency in zip(timestamps, latencies)]
+            recent += [(to_epoch(item['timestamp']), item['latency']) for item in live]
+            for ts, latency in recent[-self.features.long.size:]:
+                self.features.update(latency, ts)
+
+            features = feature_matrix(timestamps, latencies)
+            targets = latencies[1:]
+            learned = 0
+            for i in range(len(targets)):
+                if i % 256 == 0 and time.perf_counter() > deadline:
+                    break
+                if self.backend.online:
+                    self.backend.learn_one(features[i], targets[i])
+                else:
+                    self.training_data.append(timestamps[i + 1], targets[i], features[i])
+                learned += 1
+            if not self.backend.online and learned >= self.min_samples:
+                self.request_retrain()
+            self.warm_samples = learned
+            print(f"Warm-started {self.site} from {learned} samples in {time.perf_counter() - started:.2f}s")
+
         except Exception as e:
-            print(f"Error updating history: {str(e)}")
-            
-    def retrain(self):
+            print(f"Error warm-starting predictor: {str(e)}")
+
+    def snapshot_state(self):
+        """Everything needed to resume this predictor: history, training window, model.
+
+        Taken under the state lock, so the caller can serialize it while
+        monitoring carries on. Backends return model state that later
+        updates do not touch: the forest's fitted pair is swapped rather
+        than modified, so it is shared; the river pipeline is copied.
+        """
+        with self._state_lock:
+            history = list(self.history)
+            return {
+                'site': self.site,
+                'backend': self.backend.name,
+                'n_features': len(FEATURE_NAMES),
+                'saved_at': time.time(),
+                'history': np.array([(to_epoch(item['timestamp']), item['latency']) for item in history],
+                                    dtype=np.float64).reshape(-1, 2),
+                'training_data': self.training_data.state() if self.training_data.capacity else None,
+                'model': self.backend.state(),
+                'samples_seen': self.samples_seen,
+                'last_retrain': self.last_retrain,
+                'last_fit_duration': self.last_fit_duration,
+                'abs_error_sum': self.abs_error_sum,
+                'predictions': self.predictions,
+                'warm_samples': self.warm_samples
+            }
+
+    def restore(self):
+        """Load the site's snapshot, if one matches this predictor; returns True if restored."""
+        self._restore_pending = False
+        started = time.perf_counter()
+        state = get_snapshot_store().load(self.site)
+        if state is None:
+            return False
         try:
-            if len(self.training_data) < self.min_samples:
-                return
-                
-            # Prepare features from all training data
-            features = self.prepare_features(self.training_data)
-            if features is None:
-                return
+            if state['backend'] != self.backend.name or state['n_features'] != len(FEATURE_NAMES):
+                print(f"Ignoring snapshot for {self.site}: saved with a different backend or features")
+                return False
+            self.backend.load_state(state['model'])
+            training_data = state['training_data']
+            # A different retention policy only loses the training window, not the model
+            if training_data is not None and training_data['policy'] == self.training_data.policy:
+                self.training_data.load_state(training_data)
+            for ts, latency in state['history'][-self.max_history:]:
+                self.history.append({
+                    'timestamp': datetime.datetime.fromtimestamp(ts),
+                    'latency': float(latency)
+                })
+            for ts, latency in state['history'][-self.features.long.size:]:
+                self.features.update(latency, float(ts))
+            self.samples_seen = state['samples_seen']
+            self.last_retrain = state['last_retrain']
+            self.last_fit_duration = state['last_fit_duration']
+            self.abs_error_sum = state['abs_error_sum']
+            self.predictions = state['predictions']
+            self.warm_samples = state['warm_samples']
+            print(f"Restored {self.site} from its snapshot ({len(self.training_data)} training samples) "
+                  f"in {time.perf_counter() - started:.2f}s")
+            return True
+        except Exception as e:
+            print(f"Error restoring predictor snapshot: {str(e)}")
+            return False
+
+    def update(self, latency, timestamp):
+        with self._state_lock:
+            try:
+                if self._restore_pending and self.restore():
+                    self._warm_pending = False
+                if self._warm_pending:
+                    self.warm_start()
                 
-            # Get targets
-            targets = [d['latency'] for d in self.training_data[-len(features):]]
+                # Add to history
+                self.history.append({
+                    'timestamp': timestamp,
+                    'latency': latency
+                })
             
-            # Scale features
-            self.scaler.fit(features)
-            features_scaled = self.scaler.transform(features)
+                self.features.update(latency, timestamp)
             
-            # Train model
-            self.model.fit(features_scaled, targets)
-            self.is_trained = True
-            self.last_retrain = len(self.history)
+                # Add to training data along with the features seen at this moment
+                features = self.features.vector()
+                if features is not None and not self.backend.online:
+                    self.training_data.append(timestamp, latency, features)
+                self.samples_seen += 1
             
-            print(f"Model retrained with {len(self.training_data)} samples")
+                if self.backend.online:
+                    # Learn the previous sample, so predict() never sees its own target
+                    if self._pending_sample is not None:
+                        self.backend.learn_one(*self._pending_sample)
+                    self._pending_sample = (features, latency) if features is not None else None
+                elif self.samples_seen % self.retrain_interval == 0:
+                    # Retrain periodically, in the background
+                    self.request_retrain()
+                
+            except Exception as e:
+                print(f"Error updating history: {str(e)}")
             
-        except Exception as e:
-            print(f"Error retraining model: {str(e)}")
-
-def run_live_monitoring(server, servers, log_file, callback):
-    """Run live monitoring for a server."""
-    try:
-        print(f"Starting live monitoring for {server}")
-        predictor = LatencyPredictor()
-        
-        # Create log directory if it doesn't exist
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
-        
-        while True:
+    def request_retrain(self):
+        """Queue a retrain on the shared background pool."""
+        if self.synchronous_retrain:
+            self.retrain()
+            return True
+        return get_retrain_pool().submit(self)
+            
+    def retrain(self):
+        """Refit a batch backend on the training store; online backends skip this."""
+        if self.backend.online:
+            return
+        # One fit per predictor at a time, even for direct calls
+        with self._retrain_lock:
             try:
-                # Get actual latency using ping
-                latency = ping_latency(server)
-                if latency is None:
-                    print(f"Failed to get latency for {server}")
-                    time.sleep(1)
-                    continue
+                if len(self.training_data) < self.min_samples:
+                    return
                     
-                timestamp = pd.Timestamp.now()
-                
-                # Update predictor
-                predictor.update(latency, timestamp)
+                started = time.perf_counter()
                 
-                # Get prediction
-                predicted, is_spike, severity = predictor.predict(latency)
+                # Train on a capped sample of the retained data
+                features, targets = self.training_data.sample(self.max_train_samples)
                 
-                print(f"Server: {server}, Latency: {latency:.2f}ms, Predicted: {predicted:.2f}ms, Spike: {is_spike}")
+                # The backend keeps serving its old model until the new one is swapped in
+                self.backend.fit(features, targets)
+                self.last_retrain = self.samples_seen
+                self.last_fit_duration = time.perf_counter() - started
+                RETRAIN_SECONDS.observe(self.last_fit_duration)
                 
-                # Get best alternate server if there's a spike
-                suggested_server = None
-                improvement = None
-                if is_spike:
-                    best_server = get_best_server(server)
-                    if best_server != server:
-                        suggested_server = best_server
-                        # Test latency to best server
-                        best_latency = ping_latency(best_server)
-                        if best_latency:
-                            improvement = latency - best_latency
+                print(f"Model retrained with {len(targets)} samples in {self.last_fit_duration:.2f}s")
                 
-                # Call callback with results
-                callback(server, latency, predicted, is_spike, severity, suggested_server, improvement)
+            except Exception as e:
+                print(f"Error retraining model: {str(e)}")
+
+    def stats(self):
+        return {
+            "is_trained": self.is_trained,
+            "backend": self.backend.name,
+            "mae": self.abs_error_sum / self.predictions if self.predictions else None,
+            "history_length": len(self.history),
+            "warm_start_samples": self.warm_samples,
+            "training_samples": len(self.training_data),
+            "training_store_bytes": self.training_data.nbytes,
+            "retention": self.training_data.policy,
+            "last_retrain": self.last_retrain,
+            "spike_threshold": self.spike_threshold,
+            "last_fit_duration": self.last_fit_duration,
+            "retrain_pending": get_retrain_pool().is_busy(self),
+            "retrain_queue_depth": get_retrain_pool().queue_depth()
+        }
+
+class MonitorSession:
+    """Per-server monitoring state; process() handles one latency sample.
+
+    The scheduler does the probing and calls process() with the result, so
+    the same session serves the central scheduler and run_live_monitoring.
+    """
+
+    def __init__(self, server, servers, log_file, callback, predictor=None,
+                 rank=None, simulate_on_failure=False, baseline=None):
+        self.server = server
+        self.servers = servers
+        self.log_file = log_file
+        self.callback = callback
+        self.predictor = predictor if predictor is not None else LatencyPredictor(site=server)
+        # rank(latency) -> [(server, latency)] best first. By default a lookup in the
+        # candidate table, which this session's own samples help keep fresh
+        self.candidates = None
+        if rank is None:
+            self.candidates = get_candidate_table()
+            self.candidates.track(server, servers)
+            rank = lambda latency: self.candidates.rank(self.server, latency)
+        self.rank = rank
+        # baseline() -> the current server's latency on the ranked scale, when samples
+        # are measured differently from the candidates (None skips the suggestion)
+        self.baseline = baseline
+        self.simulate_on_failure = simulate_on_failure
+        # Per-site metric children, looked up once instead of per sample
+        self._failures = PROBE_FAILURES.labels(server)
+        self._spikes = SPIKES.labels(server)
+
+    def process(self, latency):
+        try:
+            if self.candidates is not None:
+                self.candidates.observe_primary(self.server, latency)
+            if latency is not None:
+                PROBE_RTT.observe(latency)
+            else:
+                self._failures.inc()
+                if not self.simulate_on_failure:
+                    print(f"Failed to get latency for {self.server}")
+                    return
+                # If ping fails, use simulated data
+                base_latency = random.uniform(20, 100)
+                spike_factor = random.uniform(0.8, 2.5) if random.random() < 0.2 else 1.0
+                latency = base_latency * spike_factor
                 
-                # Log data
-                with open(log_file, 'a') as f:
-                    f.write(f"{timestamp},{latency},{predicted},{is_spike},{severity},{suggested_server},{improvement}\n")
+            epoch = time.time()
+            # Same local wall time as pd.Timestamp.now(), at a fraction of the cost
+            timestamp = datetime.datetime.fromtimestamp(epoch)
+            
+            # Update predictor
+            started = time.perf_counter()
+            self.predictor.update(latency, timestamp)
+            
+            # Get prediction
+            predicted, is_spike, severity = self.predictor.predict(latency)
+            PREDICT_SECONDS.observe(time.perf_counter() - started)
+            
+            print(f"Server: {self.server}, Latency: {latency:.2f}ms, Predicted: {predicted:.2f}ms, Spike: {is_spike}")
+            
+            # Get best alternate server if there's a spike
+            suggested_server = None
+            improvement = None
+            if is_spike:
+                self._spikes.inc()
+                started = time.perf_counter()
+                current = self.baseline() if self.baseline is not None else latency
+                ranked = self.rank(current) if current is not None else []
+                REROUTE_SECONDS.observe(time.perf_counter() - started)
+                if ranked and ranked[0][0] != self.server:
+                    # Ranking already measured the winner, no need to ping it again
+                    suggested_server, best_latency = ranked[0]
+                    improvement = current - best_latency
+            
+            # Call callback with results
+            self.callback(self.server, latency, predicted, is_spike, severity, suggested_server, improvement)
+            
+            # Log data; the writer thread batches and flushes it
+            if self.log_file:
+                get_log_writer().write(self.log_file, (
+                    epoch, self.server, latency, predicted, is_spike, severity, suggested_server, improvement
+                ))
                     
-                # Wait before next measurement
-                time.sleep(1)
-                
-            except Exception as e:
-                print(f"Error in monitoring loop: {str(e)}")
-                time.sleep(1)
+        except Exception as e:
+            print(f"Error in monitoring loop: {str(e)}")
+
+def run_live_monitoring(server, servers, log_file, callback, predictor=None, interval=1.0, stop_event=None):
+    """Run live monitoring for a server until stop_event is set."""
+    try:
+        print(f"Starting live monitoring for {server}")
+        session = MonitorSession(server, servers, log_file, callback, predictor)
+        stop_event = stop_event or threading.Event()
+        
+        while not stop_event.is_set():
+            # Get actual latency using ping
+            started = time.perf_counter()
+            latency = ping_latency(server)
+            PROBE_SECONDS.observe(time.perf_counter() - started)
+            session.process(latency)
+            
+            # Wait before next measurement
+            stop_event.wait(interval)
                 
     except Exception as e:
         print(f"Fatal error in live monitoring: {str(e)}")
+
+def schedule_monitoring(scheduler, website, callback, predictor, interval=1.0, probe='icmp', on_fields=None):
+    """Create a website's MonitorSession and register it with scheduler.
+
+    With probe='http' the latency sample is the HTTP time to first byte,
+    and the connect/TLS/TTFB timings are passed to on_fields(website, fields).
+    """
+    log_file = log_file_path(website)
+    # Warm starts wait for these imports; load them off the monitoring ticks
+    preload_in_background()
+    
+    # Get available servers for this domain
+    servers = get_dns_cache().resolve(website) or [website]  # Fallback to original domain
+    
+    probe_fn = None
+    rank = None
+    baseline = None
+    if probe == 'http':
+        def probe_fn():
+            result = get_session_manager().probe(website)
+            if result is None:
+                return None
+            if on_fields is not None:
+                on_fields(website, timing_fields(result))
+            return result["ttfb_ms"]
+        # TTFB is not comparable with the candidates' round trips, so alternates are
+        # compared with (and their improvement measured against) the primary's round trip
+        table = get_candidate_table()
+        table.track(website, servers, probe_primary=True)
+        rank = lambda current: table.rank(website, current)
+        baseline = lambda: table.primary_latency(website)
+    
+    session = MonitorSession(website, servers, log_file, callback, predictor, rank=rank, baseline=baseline)
+    scheduler.add(website, session.process, interval=interval, probe=probe_fn)
+    return session
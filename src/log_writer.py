@@ -0,0 +1,228 @@
+import atexit
+import datetime
+import os
+import queue
+import threading
+import time
+from src.history_store import get_history_store
+from src.metrics import LOG_FLUSH_SECONDS
+
+# Same columns as logs/latency_log.csv
+LOG_HEADER = "timestamp,server,latency,predicted,is_spike,spike_severity,suggested_server,improvement"
+
+def format_record(record):
+    """Render one record tuple as a CSV line; None becomes an empty field."""
+    return ",".join("" if value is None else str(value) for value in record) + "\n"
+
+class _OpenLog:
+    __slots__ = ('handle', 'size', 'day')
+
+    def __init__(self, handle, size, day):
+        self.handle = handle
+        self.size = size
+        self.day = day
+
+class LogWriter:
+    """Background writer that batches monitoring records into per-site CSVs.
+
+    Monitoring threads only put records on a queue. A single writer thread
+    groups them by file and writes each batch with one call once
+    `flush_records` are pending or `flush_interval` seconds have passed.
+    Files are rotated to `<name>.<stamp>.csv` when they would exceed
+    `max_bytes` or when the day changes. Every file starts with LOG_HEADER;
+    an existing file with a different first line, such as a headerless log
+    in the older row format, is rotated away rather than appended to.
+    Each flushed batch is also appended to `history` (a HistoryStore) when set;
+    the store is msync'ed every `sync_interval` seconds, on rotation and on close.
+    """
+
+    def __init__(self, flush_records=512, flush_interval=1.0, max_bytes=50 * 1024 * 1024,
+                 rotate_daily=True, max_open_files=256, header=LOG_HEADER, history=None,
+                 sync_interval=30.0):
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.max_open_files = max_open_files
+        self.header = header + "\n"
+        self.history = history
+        self.sync_interval = sync_interval
+        self.history_syncs = 0
+        self._synced_at = time.monotonic()
+        self._unsynced = False
+        self.records_written = 0
+        self.flushes = 0
+        self.rotations = 0
+        self.last_flush_duration = None
+        self._queue = queue.SimpleQueue()
+        self._files = {}  # path -> _OpenLog, oldest first
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path, record):
+        """Queue one record (a tuple in LOG_HEADER order) for path."""
+        if not self._closed:
+            self._queue.put((path, record))
+
+    def flush(self, timeout=5):
+        """Block until everything queued so far has been written."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        """Flush pending records, close every file and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        pending = {}
+        count = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = False
+            if item is None or isinstance(item, threading.Event):
+                self._flush(pending)
+                pending, count = {}, 0
+                if item is None:
+                    self._close_files()
+                    self._sync_history()
+                    return
+                item.set()
+                continue
+            if item:
+                path, record = item
+                pending.setdefault(path, []).append(record)
+                count += 1
+            if count >= self.flush_records or time.monotonic() >= deadline:
+                self._flush(pending)
+                pending, count = {}, 0
+                deadline = time.monotonic() + self.flush_interval
+                if self._unsynced and time.monotonic() - self._synced_at >= self.sync_interval:
+                    self._sync_history()
+
+    def _flush(self, pending):
+        if not pending:
+            return
+        started = time.perf_counter()
+        for path, records in pending.items():
+            try:
+                data = "".join(format_record(record) for record in records)
+                log = self._open(path)
+                if self._needs_rotation(log, len(data)):
+                    log = self._rotate(path)
+                log.handle.write(data)
+                log.handle.flush()
+                log.size += len(data)
+                self.records_written += len(records)
+            except Exception as e:
+                print(f"Error writing log {path}: {str(e)}")
+        if self.history is not None:
+            self.history.append_records([record for records in pending.values() for record in records])
+            self._unsynced = True
+        self.flushes += 1
+        self.last_flush_duration = time.perf_counter() - started
+        LOG_FLUSH_SECONDS.observe(self.last_flush_duration)
+
+    def _open(self, path):
+        log = self._files.pop(path, None)
+        if log is None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                with open(path) as f:
+                    first_line = f.readline()
+                if first_line != self.header:
+                    # Older headerless or differently shaped logs are kept, not mixed
+                    self._archive(path)
+            log = self._open_new(path)
+            while len(self._files) >= self.max_open_files:
+                oldest = next(iter(self._files))
+                self._files.pop(oldest).handle.close()
+        self._files[path] = log  # Re-insert as most recently used
+        return log
+
+    def _open_new(self, path):
+        handle = open(path, 'a')
+        size = handle.tell()
+        if size == 0:
+            handle.write(self.header)
+            size = len(self.header)
+            day = datetime.date.today()
+        else:
+            # A file left over from an earlier day is rotated on its first write
+            day = datetime.date.fromtimestamp(os.path.getmtime(path))
+        return _OpenLog(handle, size, day)
+
+    def _needs_rotation(self, log, incoming):
+        if self.max_bytes and log.size > len(self.header) and log.size + incoming > self.max_bytes:
+            return True
+        return self.rotate_daily and log.day != datetime.date.today()
+
+    def _archive(self, path):
+        # latency_log_<host>.<stamp>.csv, so the log globs and readers still find it
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        root, ext = os.path.splitext(path)
+        target = f"{root}.{stamp}{ext}"
+        suffix = 1
+        while os.path.exists(target):
+            target = f"{root}.{stamp}-{suffix}{ext}"
+            suffix += 1
+        os.replace(path, target)
+        self.rotations += 1
+
+    def _sync_history(self):
+        if self.history is None or not self._unsynced:
+            return
+        try:
+            self.history.flush()
+            self.history_syncs += 1
+        except Exception as e:
+            print(f"Error syncing history: {str(e)}")
+        self._synced_at = time.monotonic()
+        self._unsynced = False
+
+    def _rotate(self, path):
+        self._files.pop(path).handle.close()
+        self._archive(path)
+        self._sync_history()
+        log = self._open_new(path)
+        self._files[path] = log
+        return log
+
+    def _close_files(self):
+        for log in self._files.values():
+            log.handle.close()
+        self._files.clear()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "open_files": len(self._files),
+            "records_written": self.records_written,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "history_syncs": self.history_syncs,
+            "last_flush_duration": self.last_flush_duration
+        }
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_log_writer():
+    """Return the process-wide log writer, flushed automatically at exit."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = LogWriter(history=get_history_store())
+                atexit.register(_writer.close)
+    return _writer
@@ -0,0 +1,243 @@
+import bisect
+import threading
+
+# Seconds, from 100us hot-path calls up to multi-second probes and refits
+DURATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Milliseconds, for measured round trip times
+RTT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 300, 500, 1000)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Child metric for one label combination (cached, so cheap to call per sample)."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def export(self):
+        """Raw totals per label combination, for another process to merge into its render."""
+        with self._lock:
+            children = list(self._children.items())
+        return {values: child.totals() for values, child in children}
+
+    def _samples(self, extra=()):
+        totals = self.export()
+        for exported in extra:
+            for values, column in exported.items():
+                own = totals.get(values)
+                totals[values] = list(column) if own is None else [a + b for a, b in zip(own, column)]
+        if not self.labelnames and () not in totals:
+            totals[()] = self._new_child().totals()
+        lines = []
+        for values, column in sorted(totals.items()):
+            lines += self._lines(values, column)
+        return lines
+
+    def render(self, extra=()):
+        """Exposition lines; `extra` holds export() results from other processes to add in."""
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}'] + self._samples(extra)
+
+class _Shards:
+    """Per-thread value lists, so recording takes no lock.
+
+    Each thread that records gets its own list the first time; renders sum
+    all of them. Threads only ever add to their own list, so nothing is lost
+    to races, and the number of lists is bounded by the monitoring threads.
+    """
+    __slots__ = ('size', 'shards', '_local', '_lock')
+
+    def __init__(self, size):
+        self.size = size
+        self.shards = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def get(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = [0] * self.size
+            with self._lock:
+                self.shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def total(self):
+        with self._lock:
+            shards = list(self.shards)
+        return [sum(column) for column in zip(*shards)] if shards else [0] * self.size
+
+class _CounterChild:
+    __slots__ = ('_shards',)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1):
+        self._shards.get()[0] += amount
+
+    @property
+    def value(self):
+        return self._shards.total()[0]
+
+    def totals(self):
+        return self._shards.total()
+
+class Counter(_Metric):
+    kind = 'counter'
+    _new_child = _CounterChild
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        if not self.labelnames:
+            self.inc = self.labels().inc
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _lines(self, values, totals):
+        return [f'{self.name}_total{_labels(self.labelnames, values)} {_number(totals[0])}']
+
+class _HistogramChild:
+    __slots__ = ('buckets', '_shards')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket, then +Inf, then the running sum
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value):
+        shard = self._shards.get()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def totals(self):
+        return self._shards.total()
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(float(bound) for bound in buckets)
+        if not self.labelnames:
+            self.observe = self.labels().observe  # Skip the label lookup on the hot path
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _lines(self, values, totals):
+        name, labelnames = self.name, self.labelnames
+        counts, total = totals[:-1], totals[-1]
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(labelnames, values, [("le", _number(bound))])} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labelnames, values)} {_number(float(total))}')
+        lines.append(f'{name}_count{_labels(labelnames, values)} {cumulative}')
+        return lines
+
+class Gauge:
+    """Value read from a callback at scrape time, so it costs nothing between scrapes."""
+
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def export(self):
+        return None  # Read from this process only
+
+    def render(self, extra=()):
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"Error reading gauge {self.name}: {str(e)}")
+            return []
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge', f'{self.name} {_number(value)}']
+
+class MetricsRegistry:
+    """Metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DURATION_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, fn):
+        return self.register(Gauge(name, help, fn))
+
+    def export(self):
+        """Counter and histogram totals by metric name, picklable for another process."""
+        with self._lock:
+            metrics = list(self.metrics.values())
+        exported = {metric.name: metric.export() for metric in metrics}
+        return {name: totals for name, totals in exported.items() if totals is not None}
+
+    def render(self, extra=()):
+        """Render every metric, adding in the export() results of other processes."""
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render([exported[metric.name] for exported in extra if metric.name in exported])
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+PROBE_RTT = REGISTRY.histogram(
+    'latency_probe_rtt_milliseconds', 'Measured round trip time of successful probes', buckets=RTT_BUCKETS)
+PROBE_SECONDS = REGISTRY.histogram(
+    'latency_probe_duration_seconds', 'Wall time of one scheduled probe, including timeouts')
+PROBE_FAILURES = REGISTRY.counter(
+    'latency_probe_failures', 'Probes that returned no latency', ['site'])
+SPIKES = REGISTRY.counter(
+    'latency_spikes', 'Samples flagged as spikes', ['site'])
+PREDICT_SECONDS = REGISTRY.histogram(
+    'latency_predict_duration_seconds', 'LatencyPredictor update plus predict for one sample')
+RETRAIN_SECONDS = REGISTRY.histogram(
+    'latency_retrain_duration_seconds', 'Time to refit a batch backend')
+REROUTE_SECONDS = REGISTRY.histogram(
+    'latency_reroute_duration_seconds', 'Time to choose an alternate server after a spike')
+LOG_FLUSH_SECONDS = REGISTRY.histogram(
+    'latency_log_flush_duration_seconds', 'Time to write one batch of log records')
+SCHEDULER_LAG = REGISTRY.histogram(
+    'latency_scheduler_lag_seconds', 'Delay between a tick being due and starting')
@@ -1,32 +1,283 @@
-import subprocess
-import re
-import platform
+import asyncio
+import ipaddress
+import itertools
+import os
+import socket
+import struct
+import threading
+import time
+from src.dns_cache import get_dns_cache
 
-def ping_latency(host):
-    """Ping a host and return the latency in milliseconds."""
-    try:
-        # Use different ping commands based on OS
-        if platform.system().lower() == "windows":
-            # Windows ping command
-            result = subprocess.run(['ping', '-n', '1', '-w', '1000', host], 
-                                  capture_output=True, text=True)
-            # Extract latency using regex for Windows output
-            match = re.search(r'Average = (\d+)ms', result.stdout)
-        else:
-            # Unix/Linux ping command
-            result = subprocess.run(['ping', '-c', '1', '-W', '1', host], 
-                                  capture_output=True, text=True)
-            # Extract latency using regex for Unix output
-            match = re.search(r'time=(\d+\.?\d*) ms', result.stdout)
-
-        if match:
-            latency = float(match.group(1))
-            print(f"Ping to {host}: {latency}ms")  # Debug print
-            return latency
-        else:
-            print(f"No latency found in ping output for {host}")  # Debug print
-            print(f"Ping output: {result.stdout}")  # Debug print
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+UDP_PROBE_PORT = 33434  # Traceroute base port, almost never listened on
+
+
+def _checksum(data):
+    """Internet checksum used by ICMP."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _echo_packet(ident, seq):
+    """Build an ICMP echo request with an empty payload."""
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, _checksum(header), ident, seq)
+
+
+class _UdpProbeProtocol(asyncio.DatagramProtocol):
+    """Resolves once the target answers with ICMP port unreachable."""
+
+    def __init__(self, waiter):
+        self.waiter = waiter
+
+    def error_received(self, exc):
+        if not self.waiter.done():
+            self.waiter.set_result(isinstance(exc, ConnectionRefusedError))
+
+    def connection_lost(self, exc):
+        if not self.waiter.done():
+            self.waiter.set_result(False)
+
+
+class ProbeEngine:
+    """In-process latency prober running on its own asyncio event loop.
+
+    ICMP echo is used whenever the process may open an ICMP socket (an
+    unprivileged datagram socket, or a raw socket as root). A single ICMP
+    socket is shared by every probe, so thousands can be in flight at once.
+    Without ICMP, probes fall back to TCP connect time and then to UDP port
+    unreachable round trips. A refused TCP connection still yields an RTT.
+    """
+
+    def __init__(self, timeout=1.0, tcp_ports=(443, 80), max_in_flight=4096, use_icmp=True):
+        self.timeout = timeout
+        self.tcp_ports = tuple(tcp_ports)
+        self.max_in_flight = max_in_flight
+        self.use_icmp = use_icmp
+        self.loop = None
+        self.icmp_mode = None  # 'dgram', 'raw' or None
+        self.icmp_ident = os.getpid() & 0xFFFF
+        self.icmp_waiters = {}
+        self._icmp_sock = None
+        self._seq = itertools.count(1)
+        self._semaphore = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the event loop thread; safe to call more than once."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name="probe-engine", daemon=True)
+            self._thread.start()
+            ready.wait()
+        return self
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        try:
+            if self.use_icmp:
+                self._open_icmp()
+        finally:
+            ready.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    def _open_icmp(self):
+        for mode, sock_type in (('dgram', socket.SOCK_DGRAM), ('raw', socket.SOCK_RAW)):
+            try:
+                sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            except OSError:
+                continue
+            sock.setblocking(False)
+            self.loop.add_reader(sock.fileno(), self._read_icmp)
+            self._icmp_sock = sock
+            self.icmp_mode = mode
+            return
+        print("ICMP sockets not permitted, using TCP/UDP probes")
+
+    def _close_icmp(self):
+        if self._icmp_sock is not None:
+            self.loop.remove_reader(self._icmp_sock.fileno())
+            self._icmp_sock.close()
+            self._icmp_sock = None
+
+    def _read_icmp(self):
+        """Drain the shared ICMP socket and wake the matching probes."""
+        while True:
+            try:
+                data, addr = self._icmp_sock.recvfrom(1024)
+            except OSError:
+                return
+            received = time.perf_counter()
+            if self.icmp_mode == 'raw':
+                # Raw sockets hand us the IP header as well
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # Datagram ICMP sockets get their identifier rewritten by the kernel
+            if self.icmp_mode == 'raw' and ident != self.icmp_ident:
+                continue
+            waiter = self.icmp_waiters.pop((addr[0], seq), None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(received)
+
+    def close(self):
+        """Stop the event loop and release the ICMP socket."""
+        with self._lock:
+            if self.loop is None:
+                return
+            loop, thread = self.loop, self._thread
+            loop.call_soon_threadsafe(self._close_icmp)
+            loop.call_soon_threadsafe(loop.stop)
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout=2)
+            self.loop = None
+            self._thread = None
+            self.icmp_mode = None
+            self.icmp_waiters.clear()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the engine loop from any other thread."""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(timeout)
+
+    async def _resolve(self, host):
+        try:
+            return str(ipaddress.ip_address(host))
+        except ValueError:
+            pass
+        # Hot names are answered from the shared DNS cache without leaving the loop
+        cache = get_dns_cache()
+        addresses = cache.lookup_cached(host)
+        if addresses is None:
+            addresses = await self.loop.run_in_executor(None, cache.resolve, host)
+        if not addresses:
+            raise OSError(f"Could not resolve {host}")
+        return addresses[0]
+
+    async def _icmp_probe(self, ip, timeout):
+        # 16-bit sequence numbers keyed by address are unique while in flight
+        seq = next(self._seq) & 0xFFFF
+        waiter = self.loop.create_future()
+        self.icmp_waiters[(ip, seq)] = waiter
+        ident = 0 if self.icmp_mode == 'dgram' else self.icmp_ident
+        try:
+            sent = time.perf_counter()
+            self._icmp_sock.sendto(_echo_packet(ident, seq), (ip, 0))
+            received = await asyncio.wait_for(waiter, timeout)
+            return (received - sent) * 1000
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.icmp_waiters.pop((ip, seq), None)
+
+    async def _tcp_probe(self, ip, port, timeout):
+        sent = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        except ConnectionRefusedError:
+            # The RST still measures a full round trip
+            return (time.perf_counter() - sent) * 1000
+        rtt = (time.perf_counter() - sent) * 1000
+        writer.close()
+        return rtt
+
+    async def _udp_probe(self, ip, timeout):
+        waiter = self.loop.create_future()
+        transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: _UdpProbeProtocol(waiter), remote_addr=(ip, UDP_PROBE_PORT))
+        try:
+            sent = time.perf_counter()
+            transport.sendto(b'\x00')
+            if await asyncio.wait_for(waiter, timeout):
+                return (time.perf_counter() - sent) * 1000
+            return None
+        except asyncio.TimeoutError:
             return None
+        finally:
+            transport.close()
+
+    async def probe(self, host, timeout=None):
+        """Measure one round trip to host in milliseconds, or None."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.perf_counter() + timeout
+        async with self._semaphore:
+            try:
+                ip = await asyncio.wait_for(self._resolve(host), timeout)
+            except (OSError, asyncio.TimeoutError):
+                return None
+            if self.icmp_mode is not None:
+                try:
+                    return await self._icmp_probe(ip, max(deadline - time.perf_counter(), 0))
+                except OSError:
+                    pass
+            for port in self.tcp_ports:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                try:
+                    return await self._tcp_probe(ip, port, remaining)
+                except asyncio.TimeoutError:
+                    return None
+                except OSError:
+                    continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            try:
+                return await self._udp_probe(ip, remaining)
+            except OSError:
+                return None
+
+    async def probe_many(self, hosts, timeout=None):
+        """Probe every host concurrently and map each host to its latency."""
+        hosts = list(dict.fromkeys(hosts))
+        results = await asyncio.gather(*(self.probe(h, timeout) for h in hosts))
+        return dict(zip(hosts, results))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide probe engine, starting it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = ProbeEngine().start()
+    return _engine
+
+
+def ping_many(hosts, timeout=1.0):
+    """Ping several hosts at once and return {host: latency_ms or None}."""
+    hosts = list(hosts)
+    if not hosts:
+        return {}
+    engine = get_engine()
+    try:
+        # Allow a little slack for loop scheduling on top of the probe timeout
+        return engine.run(engine.probe_many(hosts, timeout), timeout + 1.0)
     except Exception as e:
-        print(f"Error pinging {host}: {str(e)}")  # Debug print
-        return None
+        print(f"Error pinging {hosts}: {str(e)}")
+        return {host: None for host in hosts}
+
+
+def ping_latency(host, timeout=1.0):
+    """Ping a host and return the latency in milliseconds."""
+    return ping_many([host], timeout).get(host)
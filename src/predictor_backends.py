@@ -0,0 +1,250 @@
+import copy
+import os
+import threading
+import time
+import uuid
+import numpy as np
+from src.feature_engine import FEATURE_NAMES, stable_server_id
+from src.retrain_pool import get_retrain_pool
+from src.training_store import TrainingStore
+
+class ForestBackend:
+    """Batch RandomForest refit periodically from the training store."""
+
+    name = 'forest'
+    online = False
+
+    def __init__(self, n_estimators=100, random_state=42):
+        self.n_estimators = n_estimators
+        self.random_state = random_state
+        self.fitted = None  # (scaler, model) pair currently serving predictions
+
+    @property
+    def is_ready(self):
+        return self.fitted is not None
+
+    def predict_one(self, features):
+        # Read the pair once so a concurrent swap cannot mix scaler and model
+        fitted = self.fitted
+        if fitted is None:
+            return None
+        scaler, model = fitted
+        return model.predict(scaler.transform(features.reshape(1, -1)))[0]
+
+    def learn_one(self, features, latency):
+        pass
+
+    def fit(self, features, targets):
+        """Fit a fresh scaler and model, then swap them in."""
+        # Imported on first fit so starting the server does not wait for sklearn
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.preprocessing import StandardScaler
+        scaler = StandardScaler()
+        model = RandomForestRegressor(n_estimators=self.n_estimators, random_state=self.random_state)
+        model.fit(scaler.fit_transform(features), targets)
+        self.fitted = (scaler, model)
+
+    def state(self):
+        # The pair is replaced on refit, never changed in place, so no copy is needed
+        return {'fitted': self.fitted}
+
+    def load_state(self, state):
+        self.fitted = state['fitted']
+
+class RiverBackend:
+    """Online linear model updated one sample at a time, never refit."""
+
+    name = 'river'
+    online = True
+
+    def __init__(self, min_samples=5, feature_names=FEATURE_NAMES, optimizer=None):
+        from river import linear_model, optim, preprocessing
+        # River's default SGD step diverges on real latency series with spikes
+        optimizer = optimizer or optim.Adam(0.05)
+        self.model = preprocessing.StandardScaler() | linear_model.LinearRegression(optimizer=optimizer)
+        self.min_samples = min_samples
+        self.feature_names = feature_names
+        self.n_learned = 0
+
+    @property
+    def is_ready(self):
+        return self.n_learned >= self.min_samples
+
+    def predict_one(self, features):
+        if not self.is_ready:
+            return None
+        return self.model.predict_one(dict(zip(self.feature_names, features.tolist())))
+
+    def learn_one(self, features, latency):
+        self.model.learn_one(dict(zip(self.feature_names, features.tolist())), latency)
+        self.n_learned += 1
+
+    def fit(self, features, targets):
+        pass
+
+    def state(self):
+        # learn_one updates the pipeline in place; copy it so it can be pickled later
+        return {'model': copy.deepcopy(self.model), 'n_learned': self.n_learned}
+
+    def load_state(self, state):
+        self.model = state['model']
+        self.n_learned = state['n_learned']
+
+class SharedModel:
+    """One model trained on samples from every monitored site.
+
+    Rows carry the site as indicator columns, one per stable hash bucket,
+    so a linear inner model learns a level per bucket rather than a slope
+    over arbitrary bucket numbers, and the footprint is fixed however many
+    sites report into it. An online inner model learns each sample
+    under a lock. A forest inner model keeps a pooled reservoir and is
+    refit on the retrain pool every `retrain_interval` samples.
+    """
+
+    def __init__(self, kind='river', site_buckets=32, retrain_interval=500,
+                 capacity=50000, max_train_samples=20000):
+        self.feature_names = FEATURE_NAMES + [f'site_{bucket}' for bucket in range(site_buckets)]
+        if kind == ForestBackend.name:
+            self.inner = ForestBackend()
+            self.store = TrainingStore(len(self.feature_names), policy='reservoir', capacity=capacity)
+        elif kind == RiverBackend.name:
+            self.inner = RiverBackend(feature_names=self.feature_names)
+            self.store = None
+        else:
+            raise ValueError(f"Unknown shared model kind: {kind}")
+        self.kind = kind
+        self.site_buckets = site_buckets
+        self.retrain_interval = retrain_interval
+        self.max_train_samples = max_train_samples
+        self.samples_seen = 0
+        self.last_fit_duration = None
+        # Site biases are only meaningful against the model instance they were learned on
+        self.model_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+
+    def site_indicators(self, site):
+        """One-hot columns for site's hash bucket."""
+        indicators = np.zeros(self.site_buckets)
+        indicators[stable_server_id(site, self.site_buckets)] = 1.0
+        return indicators
+
+    def predict(self, features, site_indicators):
+        row = np.concatenate((features, site_indicators))
+        if self.inner.online:
+            with self._lock:
+                return self.inner.predict_one(row)
+        return self.inner.predict_one(row)
+
+    def learn(self, features, site_indicators, latency):
+        row = np.concatenate((features, site_indicators))
+        if self.inner.online:
+            with self._lock:
+                self.inner.learn_one(row, latency)
+                self.samples_seen += 1
+            return
+        self.store.append(time.time(), latency, row)
+        with self._lock:
+            self.samples_seen += 1
+            samples_seen = self.samples_seen
+        if samples_seen % self.retrain_interval == 0 or (
+                not self.inner.is_ready and samples_seen >= 5):
+            get_retrain_pool().submit(self)
+
+    def retrain(self):
+        """Refit the pooled forest; called from the retrain pool."""
+        started = time.perf_counter()
+        features, targets = self.store.sample(self.max_train_samples)
+        if len(targets) < 2:
+            return
+        self.inner.fit(features, targets)
+        self.last_fit_duration = time.perf_counter() - started
+        print(f"Shared model retrained with {len(targets)} samples in {self.last_fit_duration:.2f}s")
+
+class SharedBackend:
+    """Per-site view of the shared model plus an EWMA residual bias.
+
+    The shared model itself is not snapshotted, so it starts cold after a
+    restart. A snapshot keeps the site's bias together with the id of the
+    model it was learned against, and the bias is only restored while that
+    model is still the live one (e.g. a site added again after a reset).
+    """
+
+    name = 'shared'
+    online = True
+
+    def __init__(self, site, shared=None, bias_alpha=0.05):
+        self.shared = shared if shared is not None else get_shared_model()
+        self.site_indicators = self.shared.site_indicators(site or '')
+        self.bias_alpha = bias_alpha
+        self.bias = 0.0
+        self._last_base = None
+
+    @property
+    def is_ready(self):
+        return self.shared.inner.is_ready
+
+    def predict_one(self, features):
+        base = self.shared.predict(features, self.site_indicators)
+        self._last_base = base
+        if base is None:
+            return None
+        return base + self.bias
+
+    def learn_one(self, features, latency):
+        # Samples are learned right after being predicted, so reuse that base
+        base = self._last_base
+        self._last_base = None
+        if base is None:
+            base = self.shared.predict(features, self.site_indicators)
+        if base is not None:
+            self.bias += self.bias_alpha * ((latency - base) - self.bias)
+        self.shared.learn(features, self.site_indicators, latency)
+
+    def fit(self, features, targets):
+        pass
+
+    def state(self):
+        # The shared model is pooled across sites; only this site's correction is its own
+        return {'bias': self.bias, 'model_id': self.shared.model_id}
+
+    def load_state(self, state):
+        if state.get('model_id') == self.shared.model_id:
+            self.bias = state['bias']
+
+_shared_model = None
+_shared_lock = threading.Lock()
+
+def get_shared_model():
+    """Return the process-wide shared model, creating it on first use."""
+    global _shared_model
+    if _shared_model is None:
+        with _shared_lock:
+            if _shared_model is None:
+                _shared_model = SharedModel(kind=os.environ.get('LATENCY_SHARED_MODEL', RiverBackend.name))
+    return _shared_model
+
+BACKENDS = {
+    ForestBackend.name: lambda site: ForestBackend(),
+    RiverBackend.name: lambda site: RiverBackend(),
+    SharedBackend.name: SharedBackend,
+}
+
+# Global default, overridable per site when a predictor is created
+DEFAULT_BACKEND = os.environ.get('LATENCY_BACKEND', ForestBackend.name)
+
+def set_default_backend(name):
+    """Select the backend used by predictors created without an explicit one."""
+    global DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown predictor backend: {name}")
+    DEFAULT_BACKEND = name
+
+def make_backend(backend=None, site=None):
+    """Build a backend from a name, or pass an existing instance through."""
+    if backend is None:
+        backend = DEFAULT_BACKEND
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown predictor backend: {backend}")
+        return BACKENDS[backend](site)
+    return backend
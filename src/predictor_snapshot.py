@@ -0,0 +1,174 @@
+import atexit
+import glob
+import os
+import pickle
+import struct
+import threading
+import time
+import weakref
+import zlib
+from src.history_store import host_filename, normalize_host
+
+SNAPSHOT_MAGIC = b'LATSNAP\x00'
+SNAPSHOT_VERSION = 1
+# Magic, format version, then the length of the compressed state that follows
+_HEADER = struct.Struct('<8sII')
+
+def encode_snapshot(state):
+    """Serialize a predictor state dict: fixed header + zlib-compressed pickle."""
+    payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 6)
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(payload)) + payload
+
+def decode_snapshot(data):
+    """Inverse of encode_snapshot; raises ValueError for other files or versions."""
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated snapshot")
+    magic, version, length = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Not a predictor snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    payload = data[_HEADER.size:_HEADER.size + length]
+    if len(payload) != length:
+        raise ValueError("Truncated snapshot")
+    return pickle.loads(zlib.decompress(payload))
+
+class SnapshotStore:
+    """On-disk snapshots of each site's predictor, one `<host>.snap` file per site.
+
+    Predictors register themselves when created; a background thread saves
+    every registered predictor that has seen new samples each `interval`
+    seconds, and save_all() runs again at interpreter exit. Files are
+    replaced atomically, so a crash mid-save leaves the previous snapshot.
+    Snapshots older than `max_age` seconds are not restored.
+    """
+
+    def __init__(self, root=os.path.join('model', 'snapshots'), interval=300.0, max_age=7 * 86400):
+        self.root = root
+        self.interval = interval
+        self.max_age = max_age
+        self.saves = 0
+        self.restores = 0
+        self.errors = 0
+        self.bytes_written = 0
+        self.last_save_duration = None
+        self._predictors = weakref.WeakSet()
+        self._saved_at = weakref.WeakKeyDictionary()  # predictor -> samples_seen when last saved
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def path(self, site):
+        return os.path.join(self.root, host_filename(normalize_host(site)) + '.snap')
+
+    def register(self, predictor):
+        """Include predictor in periodic and exit snapshots."""
+        with self._lock:
+            self._predictors.add(predictor)
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="snapshotter", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.save_all()
+
+    def save(self, predictor):
+        """Write one predictor's snapshot; returns the bytes written, or None on error."""
+        try:
+            samples_seen = predictor.samples_seen
+            data = encode_snapshot(predictor.snapshot_state())
+            path = self.path(predictor.site)
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._saved_at[predictor] = samples_seen
+                self.saves += 1
+                self.bytes_written += len(data)
+            return len(data)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error saving predictor snapshot for {predictor.site}: {str(e)}")
+            return None
+
+    def save_all(self, force=False):
+        """Snapshot every registered predictor with new samples; returns how many were saved."""
+        with self._save_lock:
+            started = time.perf_counter()
+            with self._lock:
+                predictors = [p for p in self._predictors
+                              if force or self._saved_at.get(p) != p.samples_seen]
+            saved = sum(1 for predictor in predictors
+                        if predictor.samples_seen and self.save(predictor) is not None)
+            self.last_save_duration = time.perf_counter() - started
+            return saved
+
+    def load(self, site):
+        """The saved state for site, or None if there is none usable."""
+        path = self.path(site)
+        try:
+            if not os.path.exists(path):
+                return None
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                return None
+            with open(path, 'rb') as f:
+                state = decode_snapshot(f.read())
+            self.restores += 1
+            return state
+        except Exception as e:
+            self.errors += 1
+            print(f"Error loading predictor snapshot {path}: {str(e)}")
+            return None
+
+    def clear(self):
+        """Forget every registered predictor and delete the saved snapshots."""
+        with self._save_lock:  # Let a running save_all finish first
+            with self._lock:
+                self._predictors = weakref.WeakSet()
+                self._saved_at = weakref.WeakKeyDictionary()
+            removed = 0
+            for path in glob.glob(os.path.join(self.root, '*.snap')):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    print(f"Error deleting predictor snapshot {path}: {str(e)}")
+            return removed
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            registered = len(self._predictors)
+        return {
+            "registered": registered,
+            "saves": self.saves,
+            "restores": self.restores,
+            "errors": self.errors,
+            "bytes_written": self.bytes_written,
+            "interval": self.interval,
+            "last_save_duration": self.last_save_duration
+        }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_snapshot_store():
+    """Return the process-wide snapshot store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SnapshotStore(os.environ.get('LATENCY_SNAPSHOT_DIR', os.path.join('model', 'snapshots')))
+                atexit.register(_store.save_all)
+    return _store
@@ -0,0 +1,152 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for every thread in the process.
+
+    While running, a background thread snapshots all thread stacks with
+    sys._current_frames() every `interval` seconds. Nothing is hooked into
+    the profiled code, so a profiler that is not running costs nothing.
+    A run stops by itself after `duration` seconds or `max_samples` stack
+    samples, whichever comes first. The result exports as collapsed stacks
+    (flamegraph.pl, speedscope) or a Chrome trace (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self):
+        self.running = False
+        self.started = None
+        self.stopped = None
+        self.interval = None
+        self.samples = []  # (seconds since start, thread name, stack tuple root first)
+        self.dropped = 0
+        self._labels = {}  # code object -> frame label
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, duration=30.0, interval=0.005, threads=None, max_samples=200_000):
+        """Begin a profile; `threads` optionally keeps only names with these prefixes."""
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+            self.started = time.time()
+            self.stopped = None
+            self.interval = interval
+            self.samples = []
+            self.dropped = 0
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration, interval, threads, max_samples),
+                                            name="profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout=5):
+        """End the current profile (if any) and wait for the sampler to exit."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            # ';' separates frames in collapsed stacks
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def _run(self, duration, interval, threads, max_samples):
+        own = threading.get_ident()
+        origin = time.perf_counter()
+        deadline = origin + duration
+        try:
+            while not self._stop.is_set() and time.perf_counter() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                now = time.perf_counter() - origin
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    name = names.get(ident, f"thread-{ident}")
+                    if threads and not name.startswith(tuple(threads)):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    stack.reverse()
+                    self.samples.append((now, name, tuple(stack)))
+                del frame
+                if len(self.samples) >= max_samples:
+                    self.dropped += 1
+                    break
+                self._stop.wait(interval)
+        except Exception as e:
+            print(f"Error in profiler: {str(e)}")
+        finally:
+            with self._lock:
+                self.running = False
+                self.stopped = time.time()
+
+    def collapsed(self):
+        """Brendan Gregg collapsed-stack text: 'thread;outer;inner count' per line."""
+        counts = Counter(';'.join((name,) + stack) for _, name, stack in self.samples)
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+    def chrome_trace(self):
+        """Chrome trace event JSON with one begin/end pair per frame activation.
+
+        Consecutive samples sharing a stack prefix extend the same events,
+        so the timeline reads like an instrumented trace at `interval`
+        resolution.
+        """
+        events = []
+        tids = {}
+        open_stacks = {}  # thread name -> (stack, last sample time)
+        for at, name, stack in self.samples:
+            tid = tids.setdefault(name, len(tids) + 1)
+            previous, _ = open_stacks.get(name, ((), at))
+            common = 0
+            while common < min(len(previous), len(stack)) and previous[common] == stack[common]:
+                common += 1
+            us = at * 1e6
+            for label in reversed(previous[common:]):
+                events.append({"name": label, "ph": "E", "ts": us, "pid": 1, "tid": tid})
+            for label in stack[common:]:
+                events.append({"name": label, "ph": "B", "ts": us, "pid": 1, "tid": tid})
+            open_stacks[name] = (stack, at)
+        for name, (stack, at) in open_stacks.items():
+            us = (at + (self.interval or 0)) * 1e6
+            for label in reversed(stack):
+                events.append({"name": label, "ph": "E", "ts": us, "pid": 1, "tid": tids[name]})
+        for name, tid in tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self.running,
+                "started": self.started,
+                "stopped": self.stopped,
+                "interval": self.interval,
+                "samples": len(self.samples),
+                "threads": len({name for _, name, _ in self.samples}),
+                "truncated": bool(self.dropped)
+            }
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+def get_profiler():
+    """Return the process-wide profiler, creating it on first use."""
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = SamplingProfiler()
+    return _profiler
@@ -0,0 +1,226 @@
+import argparse
+import contextlib
+import glob
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.history_store import read_log_csv, log_file_host, normalize_host, is_log_file, LOG_GLOB
+
+SPIKE_HISTORY_PATH = os.path.join('logs', 'spike_history.json')
+PREDICTOR_PARAMS = ('spike_threshold', 'retrain_interval', 'min_samples', 'max_history',
+                    'max_train_samples', 'retention', 'store_capacity', 'backend')
+
+def load_log_series(logs_dir='logs'):
+    """Per-host (timestamps, latencies) from every latency_log*.csv, aliases merged."""
+    parts = {}
+    for path in sorted(glob.glob(os.path.join(logs_dir, LOG_GLOB))):
+        if not is_log_file(path):
+            continue
+        columns = read_log_csv(path, log_file_host(path))
+        for host in np.unique(columns['host']):
+            rows = columns['host'] == host
+            parts.setdefault(normalize_host(str(host)), []).append(
+                (columns['timestamp'][rows], columns['latency'][rows]))
+    return {host: _merge(host_parts) for host, host_parts in parts.items()}
+
+def load_bootstrap_series(path=os.path.join('data', 'bootstrapped_latency.csv')):
+    """Per-server series from a simulated timestamp,server_id,latency CSV."""
+    frame = pd.read_csv(path, usecols=['timestamp', 'server_id', 'latency'], dtype={'server_id': str})
+    return {f"sim:{server}": _merge([(group['timestamp'].to_numpy(), group['latency'].to_numpy())])
+            for server, group in frame.groupby('server_id')}
+
+def _merge(parts):
+    timestamps = np.concatenate([part[0] for part in parts]).astype(np.float64)
+    latencies = np.concatenate([part[1] for part in parts]).astype(np.float64)
+    order = np.argsort(timestamps, kind='stable')
+    timestamps, latencies = timestamps[order], latencies[order]
+    keep = np.ones(len(timestamps), dtype=bool)
+    keep[1:] = np.diff(timestamps) > 0
+    return timestamps[keep], latencies[keep]
+
+def load_spike_labels(path=SPIKE_HISTORY_PATH):
+    """Labelled spike timestamps per host from spike_history.json."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        entries = json.load(f)
+    labels = {}
+    for entry in entries:
+        labels.setdefault(normalize_host(entry['server']), []).append(float(entry['timestamp']))
+    return {host: np.sort(np.array(stamps)) for host, stamps in labels.items()}
+
+def label_series(timestamps, latencies, spike_times=None, tolerance=2.5, window=60, factor=2.0):
+    """Ground-truth spike flags for a series, plus where they came from.
+
+    Labelled spikes are matched to the nearest sample within `tolerance`
+    seconds. A series with no labelled spike inside its time range uses a
+    reference rule instead: latency above `factor` times the median of the
+    preceding `window` samples.
+    """
+    if spike_times is not None and len(timestamps):
+        inside = spike_times[(spike_times >= timestamps[0] - tolerance) & (spike_times <= timestamps[-1] + tolerance)]
+        if len(inside):
+            index = np.clip(np.searchsorted(timestamps, inside), 1, len(timestamps) - 1)
+            nearest = np.where(np.abs(timestamps[index - 1] - inside) < np.abs(timestamps[index] - inside),
+                               index - 1, index)
+            flags = np.zeros(len(timestamps), dtype=bool)
+            flags[nearest[np.abs(timestamps[nearest] - inside) <= tolerance]] = True
+            return flags, 'spike_history'
+    median = pd.Series(latencies).rolling(window, min_periods=5).median().shift(1).to_numpy()
+    return np.nan_to_num(latencies > factor * median, nan=False).astype(bool), 'rule'
+
+def replay_series(name, timestamps, latencies, labels, params):
+    """Feed one series through a fresh LatencyPredictor as fast as possible."""
+    from src.live_predictor import LatencyPredictor
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor = LatencyPredictor(site=name, warm_start=False, snapshots=False, synchronous_retrain=True,
+                                     **{key: value for key, value in params.items() if key in PREDICTOR_PARAMS})
+        predicted = np.full(len(latencies), np.nan)
+        flagged = np.zeros(len(latencies), dtype=bool)
+        started = time.perf_counter()
+        for i, (timestamp, latency) in enumerate(zip(timestamps.tolist(), latencies.tolist())):
+            # Same order as MonitorSession.process
+            predictor.update(latency, timestamp)
+            served = predictor.predictions
+            value, is_spike, _ = predictor.predict(latency)
+            if predictor.predictions > served:
+                predicted[i] = value
+            flagged[i] = is_spike
+        elapsed = time.perf_counter() - started
+
+    scored = ~np.isnan(predicted)
+    errors = latencies[scored] - predicted[scored]
+    return {
+        "series": name,
+        "params": params,
+        "samples": len(latencies),
+        "predicted_samples": int(scored.sum()),
+        "abs_error_sum": float(np.abs(errors).sum()),
+        "sq_error_sum": float(np.square(errors).sum()),
+        "true_positives": int((flagged & labels).sum()),
+        "false_positives": int((flagged & ~labels).sum()),
+        "false_negatives": int((~flagged & labels).sum()),
+        "seconds": elapsed
+    }
+
+def _replay_job(args):
+    return replay_series(*args)
+
+def summarize(results):
+    """Combine per-series results into micro-averaged metrics."""
+    predicted = sum(r["predicted_samples"] for r in results)
+    tp = sum(r["true_positives"] for r in results)
+    fp = sum(r["false_positives"] for r in results)
+    fn = sum(r["false_negatives"] for r in results)
+    samples = sum(r["samples"] for r in results)
+    seconds = sum(r["seconds"] for r in results)
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / (tp + fn) if tp + fn else None
+    f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+    return {
+        "samples": samples,
+        "mae": sum(r["abs_error_sum"] for r in results) / predicted if predicted else None,
+        "rmse": (sum(r["sq_error_sum"] for r in results) / predicted) ** 0.5 if predicted else None,
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "true_positives": tp,
+        "false_positives": fp,
+        "false_negatives": fn,
+        "samples_per_sec": samples / seconds if seconds else None
+    }
+
+def expand_grid(grid):
+    """{'spike_threshold': [1.5, 2]} -> [{'spike_threshold': 1.5}, {'spike_threshold': 2}]"""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+def run_backtest(series, grid, labels=None, processes=None, max_samples=None):
+    """Replay every series under every parameter combination on a process pool.
+
+    Returns {"runs": [{params, summary, per_series}], "wall_seconds": ...}
+    with runs sorted best F1 first (then lowest MAE).
+    """
+    labels = load_spike_labels() if labels is None else labels
+    truth = {}
+    for name, (timestamps, latencies) in series.items():
+        if max_samples:
+            timestamps, latencies = timestamps[-max_samples:], latencies[-max_samples:]
+            series[name] = (timestamps, latencies)
+        truth[name] = label_series(timestamps, latencies, labels.get(name))
+
+    combos = expand_grid(grid)
+    # Longest series first so the pool is not left waiting on one straggler
+    names = sorted(series, key=lambda n: -len(series[n][1]))
+    jobs = [(name, series[name][0], series[name][1], truth[name][0], params)
+            for params in combos for name in names]
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(_replay_job, jobs))
+    wall = time.perf_counter() - started
+
+    runs = []
+    for params in combos:
+        per_series = [r for r in results if r["params"] == params]
+        for result in per_series:
+            result["label_source"] = truth[result["series"]][1]
+        runs.append({"params": params, "summary": summarize(per_series), "per_series": per_series})
+    runs.sort(key=lambda run: (-(run["summary"]["f1"] or 0), run["summary"]["mae"] or float('inf')))
+    return {
+        "runs": runs,
+        "wall_seconds": wall,
+        "samples_per_sec": sum(len(series[n][1]) for n in names) * len(combos) / wall
+    }
+
+def _parse_grid(items):
+    grid = {}
+    for item in items:
+        key, _, values = item.partition('=')
+        parsed = []
+        for value in values.split(','):
+            try:
+                parsed.append(int(value))
+            except ValueError:
+                try:
+                    parsed.append(float(value))
+                except ValueError:
+                    parsed.append(value)
+        grid[key] = parsed
+    return grid
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded latency series through LatencyPredictor")
+    parser.add_argument("grid", nargs="*", default=["spike_threshold=1.5,2,3", "backend=river"],
+                        help="parameter lists, e.g. spike_threshold=1.5,2,3 retrain_interval=20,100")
+    parser.add_argument("--logs", default="logs")
+    parser.add_argument("--bootstrap", default=os.path.join("data", "bootstrapped_latency.csv"),
+                        help="simulated CSV to include ('' to skip)")
+    parser.add_argument("--hosts", nargs="*", help="only replay these series")
+    parser.add_argument("--max-samples", type=int, help="replay only the newest N samples per series")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", help="write full results JSON here")
+    args = parser.parse_args()
+
+    series = load_log_series(args.logs)
+    if args.bootstrap and os.path.exists(args.bootstrap):
+        series.update(load_bootstrap_series(args.bootstrap))
+    if args.hosts:
+        series = {name: data for name, data in series.items() if name in args.hosts}
+    report = run_backtest(series, _parse_grid(args.grid), processes=args.processes, max_samples=args.max_samples)
+
+    print(f"Replayed {len(series)} series x {len(report['runs'])} settings in {report['wall_seconds']:.1f}s "
+          f"({report['samples_per_sec']:.0f} samples/s)")
+    for run in report["runs"]:
+        summary = run["summary"]
+        def fmt(value):
+            return "-" if value is None else f"{value:.3f}"
+        print(f"{json.dumps(run['params'])}: MAE {fmt(summary['mae'])}ms  RMSE {fmt(summary['rmse'])}ms  "
+              f"precision {fmt(summary['precision'])}  recall {fmt(summary['recall'])}  F1 {fmt(summary['f1'])}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
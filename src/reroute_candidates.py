@@ -0,0 +1,239 @@
+import ipaddress
+import threading
+import time
+from src.dns_cache import get_dns_cache
+from src.ping_utils import ping_many
+
+class _Candidate:
+    __slots__ = ('latency', 'loss', 'updated', 'probed', 'samples')
+
+    def __init__(self):
+        self.latency = None  # EWMA of successful RTTs, ms
+        self.loss = 0.0  # EWMA of the failure rate, 0..1
+        self.updated = None  # When a probe last answered (monotonic)
+        self.probed = 0.0  # When it was last probed at all
+        self.samples = 0
+
+def _is_address(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+class CandidateTable:
+    """Per-domain scoreboard of reroute candidates (the domain's A records).
+
+    Every candidate keeps an EWMA of its RTT and of its probe loss rate.
+    The address the monitoring probes actually hit is fed from the normal
+    sampling stream via observe_primary(); the alternates are refreshed by
+    a low-rate background prober, at most `max_probes` per `tick`, with each
+    candidate re-probed every `probe_interval` seconds. Entries not
+    refreshed for `ttl` seconds are ignored. That makes a spike's reroute
+    suggestion a memory lookup instead of a burst of probes.
+
+    Candidates are ranked by latency * (1 + loss_penalty * loss), so a fast
+    but lossy address loses to a slightly slower reliable one.
+    """
+
+    def __init__(self, alpha=0.3, loss_alpha=0.2, ttl=300.0, probe_interval=30.0, tick=1.0,
+                 max_probes=8, probe_timeout=1.0, loss_penalty=4.0, clock=time.monotonic):
+        self.alpha = alpha
+        self.loss_alpha = loss_alpha
+        self.ttl = ttl
+        self.probe_interval = probe_interval
+        self.tick = tick
+        self.max_probes = max_probes
+        self.probe_timeout = probe_timeout
+        self.loss_penalty = loss_penalty
+        self.clock = clock
+        self.domains = {}  # domain -> {address: _Candidate}
+        self._probe_primary = set()  # Domains whose samples are not round trips (e.g. HTTP TTFB)
+        self.lookups = 0
+        self.background_probes = 0
+        self._urgent = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def track(self, domain, servers=(), probe_primary=False):
+        """Start keeping scores for a domain; `servers` seeds its candidate list.
+
+        With `probe_primary` the background prober also measures the primary
+        address, for domains whose monitoring samples are not round trips.
+        """
+        with self._lock:
+            if probe_primary:
+                self._probe_primary.add(domain)
+            candidates = self.domains.setdefault(domain, {})
+            for server in servers:
+                if _is_address(server):
+                    candidates.setdefault(server, _Candidate())
+        self._ensure_prober()
+
+    def untrack(self, domain):
+        with self._lock:
+            self.domains.pop(domain, None)
+            self._probe_primary.discard(domain)
+
+    def clear(self):
+        with self._lock:
+            self.domains.clear()
+            self._urgent.clear()
+            self._probe_primary.clear()
+
+    def primary(self, domain):
+        """The address monitoring probes of domain go to (the first cached A record)."""
+        if _is_address(domain):
+            return domain
+        addresses = get_dns_cache().lookup_cached(domain)
+        return addresses[0] if addresses else None
+
+    def observe(self, domain, address, latency):
+        """Fold one probe result (None for a failure) into a candidate's scores."""
+        now = self.clock()
+        with self._lock:
+            candidates = self.domains.get(domain)
+            if candidates is None:
+                return
+            candidate = candidates.setdefault(address, _Candidate())
+            candidate.probed = now
+            if latency is None:
+                candidate.loss += self.loss_alpha * (1.0 - candidate.loss)
+                return
+            candidate.loss -= self.loss_alpha * candidate.loss
+            if candidate.latency is None:
+                candidate.latency = float(latency)
+            else:
+                candidate.latency += self.alpha * (latency - candidate.latency)
+            candidate.updated = now
+            candidate.samples += 1
+
+    def observe_primary(self, domain, latency):
+        """Feed a regular monitoring sample to the address it measured."""
+        address = self.primary(domain)
+        if address is not None:
+            self.observe(domain, address, latency)
+
+    def primary_latency(self, domain):
+        """Fresh round trip EWMA of the primary address, or None."""
+        primary = self.primary(domain)
+        now = self.clock()
+        with self._lock:
+            candidate = self.domains.get(domain, {}).get(primary)
+            if candidate is None or candidate.updated is None or now - candidate.updated > self.ttl:
+                return None
+            return candidate.latency
+
+    def score(self, candidate):
+        return candidate.latency * (1.0 + self.loss_penalty * candidate.loss)
+
+    def rank(self, domain, current_latency=None):
+        """Fresh alternates to the primary address, [(address, latency)] best first.
+
+        With `current_latency`, only alternates faster than it are returned.
+        Never probes; a domain with nothing fresh is queued for a background
+        probe and gets an empty list this time.
+        """
+        now = self.clock()
+        primary = self.primary(domain)
+        with self._lock:
+            self.lookups += 1
+            candidates = self.domains.get(domain, {})
+            fresh = [(address, candidate) for address, candidate in candidates.items()
+                     if address != primary and candidate.updated is not None
+                     and now - candidate.updated <= self.ttl]
+            if not fresh:
+                self._urgent.add(domain)
+        if not fresh:
+            self._wakeup.set()
+            return []
+        fresh.sort(key=lambda item: self.score(item[1]))
+        return [(address, round(candidate.latency, 2)) for address, candidate in fresh
+                if current_latency is None or candidate.latency < current_latency]
+
+    def _ensure_prober(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="reroute-prober", daemon=True)
+                    self._thread.start()
+
+    def _due(self):
+        """Pick up to max_probes (domain, address) pairs, urgent domains first."""
+        now = self.clock()
+        with self._lock:
+            domains = list(self.domains)
+            urgent, self._urgent = self._urgent, set()
+        for domain in domains:
+            if not _is_address(domain):
+                # Served from the shared DNS cache; only actual misses hit the resolver
+                for address in get_dns_cache().resolve(domain):
+                    with self._lock:
+                        if domain in self.domains:
+                            self.domains[domain].setdefault(address, _Candidate())
+        due = []
+        with self._lock:
+            for domain in domains:
+                primary = self.primary(domain)
+                for address, candidate in self.domains.get(domain, {}).items():
+                    if address == primary and domain not in self._probe_primary:
+                        continue  # Already measured by the regular samples
+                    if domain in urgent or now - candidate.probed >= self.probe_interval:
+                        due.append((domain not in urgent, candidate.probed, domain, address))
+        # Urgent domains first, then oldest first, so a large table is covered round robin
+        due.sort()
+        return [(domain, address) for _, _, domain, address in due[:self.max_probes]]
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.tick)
+            self._wakeup.clear()
+            try:
+                due = self._due()
+                if not due:
+                    continue
+                results = ping_many([address for _, address in due], self.probe_timeout)
+                self.background_probes += len(due)
+                for domain, address in due:
+                    self.observe(domain, address, results.get(address))
+            except Exception as e:
+                print(f"Error probing reroute candidates: {str(e)}")
+
+    def stats(self):
+        now = self.clock()
+        with self._lock:
+            candidates = [c for table in self.domains.values() for c in table.values()]
+            return {
+                "domains": len(self.domains),
+                "candidates": len(candidates),
+                "fresh": sum(1 for c in candidates if c.updated is not None and now - c.updated <= self.ttl),
+                "lookups": self.lookups,
+                "background_probes": self.background_probes
+            }
+
+    def snapshot(self, domain):
+        """Scores for one domain, for the API."""
+        now = self.clock()
+        primary = self.primary(domain)
+        with self._lock:
+            return [{
+                "address": address,
+                "primary": address == primary,
+                "latency": round(c.latency, 2) if c.latency is not None else None,
+                "loss": round(c.loss, 3),
+                "samples": c.samples,
+                "age": round(now - c.updated, 1) if c.updated is not None else None
+            } for address, c in self.domains.get(domain, {}).items()]
+
+_table = None
+_table_lock = threading.Lock()
+
+def get_candidate_table():
+    """Return the process-wide reroute candidate table, creating it on first use."""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = CandidateTable()
+    return _table
@@ -0,0 +1,79 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class RetrainPool:
+    """Shared background workers that refit predictors off the monitoring threads.
+
+    A predictor is queued at most once. A request that arrives while its
+    refit is running is coalesced into a single follow-up run, so each
+    site has at most one retrain in flight.
+    """
+
+    def __init__(self, max_workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="retrain")
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._running = set()
+        self._rerun = set()
+        self.completed = 0
+        self.coalesced = 0
+
+    def submit(self, predictor):
+        """Queue a retrain; returns False when it was merged into a pending one."""
+        with self._lock:
+            if predictor in self._queued:
+                self.coalesced += 1
+                return False
+            if predictor in self._running:
+                if predictor in self._rerun:
+                    self.coalesced += 1
+                self._rerun.add(predictor)
+                return False
+            self._queued.add(predictor)
+        self.executor.submit(self._run, predictor)
+        return True
+
+    def _run(self, predictor):
+        with self._lock:
+            self._queued.discard(predictor)
+            self._running.add(predictor)
+        try:
+            predictor.retrain()
+        finally:
+            with self._lock:
+                self._running.discard(predictor)
+                self.completed += 1
+                again = predictor in self._rerun
+                self._rerun.discard(predictor)
+            if again:
+                self.submit(predictor)
+
+    def queue_depth(self):
+        """Number of retrains waiting for a worker."""
+        with self._lock:
+            return len(self._queued)
+
+    def is_busy(self, predictor):
+        with self._lock:
+            return predictor in self._queued or predictor in self._running
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": len(self._queued),
+                "running": len(self._running),
+                "completed": self.completed,
+                "coalesced": self.coalesced
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_retrain_pool():
+    """Return the process-wide retrain pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RetrainPool()
+    return _pool
@@ -0,0 +1,184 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.ping_utils import get_engine
+from src.metrics import PROBE_SECONDS, SCHEDULER_LAG
+
+class _Site:
+    __slots__ = ('key', 'host', 'handler', 'interval', 'probe', 'busy', 'generation')
+
+    def __init__(self, key, host, handler, interval, generation, probe=None):
+        self.key = key
+        self.host = host
+        self.handler = handler
+        self.interval = interval
+        self.probe = probe
+        self.busy = False
+        self.generation = generation
+
+class MonitorScheduler:
+    """Single dispatcher that probes every monitored site on its own interval.
+
+    Due times live in a heap driven by one coroutine on the probe engine's
+    event loop. Probes are awaited on that loop. Each site's handler(latency)
+    runs on a fixed worker pool, so the thread count stays the same however
+    many sites are added. Ticks get +/- `jitter` of their interval so sites
+    added together spread out. No more than `max_concurrency` ticks run at
+    once, and a site whose previous tick has not finished skips a beat
+    rather than piling up.
+    """
+
+    def __init__(self, engine=None, max_concurrency=64, workers=8, jitter=0.1, probe_timeout=1.0):
+        self.engine = engine
+        self.max_concurrency = max_concurrency
+        self.jitter = jitter
+        self.probe_timeout = probe_timeout
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="monitor")
+        self.sites = {}
+        self.running = False
+        self.ticks = 0
+        self.skipped = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._generation = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = None
+        self._semaphore = None
+        self._dispatcher = None
+        self._tasks = set()
+
+    def __contains__(self, key):
+        return key in self.sites
+
+    def __len__(self):
+        return len(self.sites)
+
+    def _loop(self):
+        if self.engine is None:
+            self.engine = get_engine()
+        return self.engine.start().loop
+
+    def add(self, key, handler, host=None, interval=1.0, probe=None):
+        """Monitor `host` (default: key) every `interval` seconds, replacing any previous entry.
+
+        `probe()`, if given, is a blocking function returning the latency in
+        ms (or None); it runs on the worker pool instead of the engine probe.
+        """
+        with self._lock:
+            site = _Site(key, host or key, handler, interval, next(self._generation), probe)
+            self.sites[key] = site
+        loop = self._loop()
+        loop.call_soon_threadsafe(self._push_first, site)
+
+    def remove(self, key):
+        with self._lock:
+            self.sites.pop(key, None)
+
+    def submit(self, fn, *args):
+        """Run a setup job on the monitoring worker pool."""
+        return self.pool.submit(fn, *args)
+
+    def _push_first(self, site):
+        # Spread the first tick over one interval to avoid a thundering herd
+        due = self._loop().time() + random.uniform(0, site.interval)
+        heapq.heappush(self._heap, (due, next(self._seq), site.key, site.generation))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        """Start dispatching ticks; safe to call when already running."""
+        if self.running:
+            return
+        self.running = True
+        self._loop()
+        self.engine.run(self._start())
+
+    async def _start(self):
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+    def stop(self):
+        """Stop dispatching and wait for in-flight probes to be cancelled."""
+        if not self.running:
+            return
+        self.running = False
+        self.engine.run(self._stop(), timeout=5)
+
+    async def _stop(self):
+        tasks = list(self._tasks)
+        if self._dispatcher is not None:
+            tasks.append(self._dispatcher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+        self._tasks.clear()
+
+    def reset(self):
+        """Stop and forget every site."""
+        self.stop()
+        with self._lock:
+            self.sites.clear()
+        loop = self._loop()
+        loop.call_soon_threadsafe(self._heap.clear)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, _, key, generation = heapq.heappop(self._heap)
+                site = self.sites.get(key)
+                if site is None or site.generation != generation:
+                    continue  # Removed or replaced since it was queued
+                if site.busy:
+                    self.skipped += 1
+                else:
+                    site.busy = True
+                    task = asyncio.ensure_future(self._tick(site, due))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                # Fixed-rate schedule; fall back to now when a tick was missed
+                spread = site.interval * random.uniform(-self.jitter, self.jitter)
+                next_due = max(due + site.interval + spread, now)
+                heapq.heappush(self._heap, (next_due, next(self._seq), key, generation))
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - loop.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _tick(self, site, due):
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._semaphore:
+                started = loop.time()
+                SCHEDULER_LAG.observe(max(started - due, 0.0))
+                if site.probe is not None:
+                    latency = await loop.run_in_executor(self.pool, site.probe)
+                else:
+                    latency = await self.engine.probe(site.host, self.probe_timeout)
+                PROBE_SECONDS.observe(loop.time() - started)
+                await loop.run_in_executor(self.pool, site.handler, latency)
+                self.ticks += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error in monitoring tick for {site.key}: {str(e)}")
+        finally:
+            site.busy = False
+
+    def stats(self):
+        return {
+            "sites": len(self.sites),
+            "running": self.running,
+            "ticks": self.ticks,
+            "skipped": self.skipped,
+            "in_flight": len(self._tasks)
+        }
@@ -0,0 +1,383 @@
+import itertools
+import math
+import multiprocessing
+import threading
+import time
+import zlib
+from multiprocessing.connection import wait
+
+def _weight(worker, site):
+    return zlib.crc32(f"{worker}:{site}".encode())
+
+def assign_sites(sites, workers, slack=0.25):
+    """Map each site to a worker index with bounded-load rendezvous hashing.
+
+    Every site prefers workers in order of hash(worker, site); a worker
+    that already holds ceil(average * (1 + slack)) sites is skipped. Adding
+    a site only moves the few sites whose preferred worker filled up, and
+    no worker ends up with much more than its share.
+    """
+    sites = sorted(sites)
+    capacity = max(1, math.ceil(len(sites) / workers * (1 + slack)))
+    loads = [0] * workers
+    assignment = {}
+    for site in sites:
+        for worker in sorted(range(workers), key=lambda w: _weight(w, site), reverse=True):
+            if loads[worker] < capacity:
+                assignment[site] = worker
+                loads[worker] += 1
+                break
+    return assignment
+
+def merge_stats(replies):
+    """Sum stats dicts whose values are all counts; the parts are kept under 'per_process'."""
+    merged = {}
+    for stats in replies:
+        for key, value in stats.items():
+            merged[key] = merged.get(key, 0) + value
+    merged["per_process"] = replies
+    return merged
+
+def _worker_main(index, conn, batch_interval):
+    """Monitoring worker: owns its sites' schedulers, predictors and probes.
+
+    Status updates are queued as compact tuples and sent to the API process
+    in one message every `batch_interval` seconds.
+    """
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is handled by the API process
+    from src.dns_cache import get_dns_cache
+    from src.http_pool import get_session_manager
+    from src.live_predictor import LatencyPredictor, schedule_monitoring
+    from src.log_writer import get_log_writer
+    from src.metrics import REGISTRY
+    from src.predictor_snapshot import get_snapshot_store
+    from src.reroute_candidates import get_candidate_table
+    from src.scheduler import MonitorScheduler
+
+    scheduler = MonitorScheduler()
+    predictors = {}
+    outbox = []
+    outbox_lock = threading.Lock()
+    send_lock = threading.Lock()
+    stopped = threading.Event()
+    save = True  # Snapshot predictors on the way out, unless told not to
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    def callback(server, latency, predicted, is_spike, severity, suggested_server=None, improvement=None):
+        with outbox_lock:
+            outbox.append(("status", server, float(latency), float(predicted), bool(is_spike),
+                           float(severity or 0), suggested_server,
+                           float(improvement) if improvement is not None else None))
+
+    def on_fields(website, fields):
+        with outbox_lock:
+            outbox.append(("fields", website, fields))
+
+    def sender():
+        while not stopped.wait(batch_interval):
+            with outbox_lock:
+                batch = outbox[:]
+                outbox.clear()
+            if batch:
+                try:
+                    send(batch)
+                except (OSError, EOFError):
+                    return
+
+    threading.Thread(target=sender, name="shard-sender", daemon=True).start()
+    print(f"Monitoring worker {index} started")
+    try:
+        while True:
+            message = conn.recv()
+            command = message[0]
+            if command == "add":
+                _, website, options = message
+                try:
+                    if website not in predictors:
+                        predictors[website] = LatencyPredictor(backend=options.get("backend"), site=website)
+                    scheduler.start()
+                    schedule_monitoring(scheduler, website, callback, predictors[website],
+                                        interval=options.get("interval", 1.0),
+                                        probe=options.get("probe") or "icmp", on_fields=on_fields)
+                except Exception as e:
+                    print(f"Error in monitoring worker {index} adding {website}: {str(e)}")
+            elif command == "call":
+                _, call_id, name, website = message
+                result = None
+                try:
+                    if name == "remove":
+                        scheduler.remove(website)
+                        predictor = predictors.pop(website, None)
+                        # Hand the site's log, history and model over with nothing left in flight;
+                        # the new owner restores the snapshot on its first sample
+                        get_log_writer().flush()
+                        if predictor is not None and predictor.samples_seen:
+                            get_snapshot_store().save(predictor)
+                        result = True
+                    elif name == "metrics":
+                        result = REGISTRY.export()
+                    elif name == "dns_stats":
+                        result = get_dns_cache().stats()
+                    elif name == "http_stats":
+                        result = get_session_manager().stats()
+                    elif website not in predictors:
+                        result = None
+                    elif name == "stats":
+                        result = predictors[website].stats()
+                    elif name == "retrain":
+                        result = predictors[website].request_retrain()
+                    elif name == "candidates":
+                        table = get_candidate_table()
+                        result = {**table.stats(), "candidates": table.snapshot(website)}
+                except Exception as e:
+                    print(f"Error in monitoring worker {index} handling {name}: {str(e)}")
+                send(("reply", call_id, result))
+            elif command == "stop":
+                save = message[1]
+                break
+    except (OSError, EOFError):
+        pass  # The API process went away
+    finally:
+        stopped.set()
+        scheduler.reset()
+        get_log_writer().flush()
+        # Worker processes exit without running atexit hooks
+        if save:
+            get_snapshot_store().save_all()
+        try:
+            send(("stopped", index))
+        except (OSError, EOFError):
+            pass
+        print(f"Monitoring worker {index} stopped")
+
+class _Worker:
+    __slots__ = ('index', 'process', 'conn', 'sites')
+
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.sites = {}  # site -> options it was added with
+
+class ShardedEngine:
+    """Spreads monitored sites over a pool of worker processes.
+
+    Sites are placed with assign_sites(), so each worker owns a stable
+    share of them along with their predictors, probes and log files; the
+    CPU-bound feature and model work then runs on every core instead of
+    behind one GIL. Workers send status batches back over their pipe, and
+    a reader thread in this process hands each update to callback(...)
+    (the MonitorSession callback signature) or on_fields(site, fields).
+    When an added site changes the placement, moved sites are removed from
+    their old worker (which flushes their logs and snapshots their
+    predictors) before the new one starts them. A worker that dies is
+    restarted with its sites. Worker-wide state (metrics, DNS and HTTP
+    counters) is collected from every worker with call_all().
+    """
+
+    def __init__(self, workers=2, callback=None, on_fields=None, batch_interval=0.05, slack=0.25,
+                 call_timeout=5.0, context="spawn"):
+        self.workers = workers
+        self.callback = callback
+        self.on_fields = on_fields
+        self.batch_interval = batch_interval
+        self.slack = slack
+        self.call_timeout = call_timeout
+        # Spawned, not forked: the API process already runs threads
+        self.context = multiprocessing.get_context(context)
+        self.running = False
+        self.assignment = {}  # site -> worker index
+        self.options = {}  # site -> options
+        self.updates = 0
+        self.batches = 0
+        self.moves = 0
+        self.restarts = 0
+        self._workers = []
+        self._calls = {}  # call id -> [Event, result]
+        self._call_ids = itertools.count()
+        self._lock = threading.RLock()
+        self._placement_lock = threading.Lock()  # One add() rebalancing at a time
+        self._reader = None
+
+    def _spawn(self, index):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(target=_worker_main, args=(index, child_conn, self.batch_interval),
+                                       name=f"monitor-worker-{index}", daemon=True)
+        process.start()
+        child_conn.close()
+        return _Worker(index, process, parent_conn)
+
+    def start(self):
+        """Start the worker processes; safe to call when already running."""
+        with self._lock:
+            if self.running:
+                return
+            self.running = True
+            self._workers = [self._spawn(index) for index in range(self.workers)]
+            self._reader = threading.Thread(target=self._read, name="shard-reader", daemon=True)
+            self._reader.start()
+
+    def _send(self, worker, message):
+        try:
+            worker.conn.send(message)
+        except (OSError, EOFError) as e:
+            print(f"Error sending to monitoring worker {worker.index}: {str(e)}")
+
+    def add(self, site, options=None):
+        """Start monitoring site on its worker, rebalancing other sites if needed.
+
+        self._lock is released while a moved site's old owner lets go of it,
+        so stats, calls and worker restarts are not held up by the wait.
+        """
+        with self._placement_lock:
+            with self._lock:
+                if not self.running:
+                    return
+                self.options[site] = dict(options or {})
+                assignment = assign_sites(self.options, self.workers, self.slack)
+                changes = [(name, self.assignment.get(name), index) for name, index in assignment.items()
+                           if self.assignment.get(name) != index or name == site]
+            for name, previous, index in changes:
+                if previous is not None and previous != index:
+                    with self._lock:
+                        if not self.running:
+                            return
+                        old_worker = self._workers[previous]
+                        old_worker.sites.pop(name, None)  # A restarted old owner must not pick it up again
+                        self.moves += 1
+                    # Waits for the old owner, so two processes never write the site's files
+                    self._call(old_worker, "remove", name)
+                with self._lock:
+                    if not self.running:
+                        return
+                    worker = self._workers[index]
+                    worker.sites[name] = self.options[name]
+                    self.assignment[name] = index
+                    self._send(worker, ("add", name, self.options[name]))
+
+    def worker_for(self, site):
+        index = self.assignment.get(site)
+        return self._workers[index] if index is not None and index < len(self._workers) else None
+
+    def _start_call(self, worker, name, site):
+        call_id = next(self._call_ids)
+        pending = self._calls[call_id] = [threading.Event(), None]
+        self._send(worker, ("call", call_id, name, site))
+        return call_id, pending
+
+    def _finish_call(self, call_id, pending, deadline):
+        answered = pending[0].wait(max(0.0, deadline - time.monotonic()))
+        self._calls.pop(call_id, None)
+        return answered, pending[1]
+
+    def _call(self, worker, name, site):
+        call_id, pending = self._start_call(worker, name, site)
+        return self._finish_call(call_id, pending, time.monotonic() + self.call_timeout)[1]
+
+    def call(self, site, name):
+        """Run 'stats', 'retrain' or 'candidates' for site in its worker; None if unknown."""
+        worker = self.worker_for(site)
+        if worker is None:
+            return None
+        return self._call(worker, name, site)
+
+    def call_all(self, name):
+        """Run 'metrics', 'dns_stats' or 'http_stats' in every worker at once.
+
+        Returns the replies of the workers that answered within call_timeout.
+        """
+        with self._lock:
+            workers = list(self._workers)
+        calls = [self._start_call(worker, name, None) for worker in workers]
+        deadline = time.monotonic() + self.call_timeout
+        replies = [self._finish_call(call_id, pending, deadline) for call_id, pending in calls]
+        return [result for answered, result in replies if answered and result is not None]
+
+    def _read(self):
+        while self.running:
+            connections = {worker.conn: worker for worker in self._workers}
+            try:
+                ready = wait(list(connections), timeout=0.5)
+            except OSError:
+                continue
+            for conn in ready:
+                worker = connections[conn]
+                try:
+                    message = conn.recv()
+                except (OSError, EOFError):
+                    self._worker_died(worker)
+                    continue
+                if isinstance(message, list):
+                    self._apply(message)
+                elif message[0] == "reply":
+                    pending = self._calls.get(message[1])
+                    if pending is not None:
+                        pending[1] = message[2]
+                        pending[0].set()
+
+    def _apply(self, batch):
+        self.batches += 1
+        for update in batch:
+            try:
+                if update[0] == "status":
+                    self.updates += 1
+                    if self.callback is not None:
+                        self.callback(*update[1:])
+                elif self.on_fields is not None:
+                    self.on_fields(update[1], update[2])
+            except Exception as e:
+                print(f"Error applying monitoring update for {update[1]}: {str(e)}")
+
+    def _worker_died(self, worker):
+        with self._lock:
+            if not self.running or self._workers[worker.index] is not worker:
+                return
+            print(f"Monitoring worker {worker.index} exited, restarting")
+            worker.conn.close()
+            replacement = self._spawn(worker.index)
+            replacement.sites = worker.sites
+            self._workers[worker.index] = replacement
+            self.restarts += 1
+            for site, options in replacement.sites.items():
+                self._send(replacement, ("add", site, options))
+
+    def stop(self, timeout=10, save=True):
+        """Stop every worker; each flushes its logs, and with save snapshots its predictors."""
+        with self._lock:
+            if not self.running:
+                return
+            self.running = False
+            workers, self._workers = self._workers, []
+            self.assignment = {}
+            self.options = {}
+        for worker in workers:
+            self._send(worker, ("stop", save))
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                print(f"Monitoring worker {worker.index} did not stop, terminating")
+                worker.process.terminate()
+                worker.process.join(1)
+            worker.conn.close()
+        if self._reader is not None and self._reader is not threading.current_thread():
+            self._reader.join(timeout)
+        self._reader = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "sites": len(self.assignment),
+                "sites_per_worker": [len(worker.sites) for worker in self._workers],
+                "alive": sum(1 for worker in self._workers if worker.process.is_alive()),
+                "updates": self.updates,
+                "batches": self.batches,
+                "moves": self.moves,
+                "restarts": self.restarts
+            }
@@ -1,14 +1,33 @@
+import argparse
 import random
 import time
 import csv
 import os
 import datetime
 import math
+import numpy as np
+from src.feature_engine import local_calendar
+
+DEFAULT_SERVERS = [
+    "8.8.8.8",      # Google DNS
+    "1.1.1.1",      # Cloudflare DNS
+    "9.9.9.9",      # Quad9 DNS
+    "208.67.222.222", # OpenDNS
+    "64.6.64.6"     # Verisign DNS
+]
+
+# Spike sizes (ms) and their relative weights
+SPIKE_VALUES = [0, 20, 50, 100]
+SPIKE_WEIGHTS = [85, 10, 4, 1]
+
+# CSV timestamps and latencies are written to the millisecond / microsecond
+CSV_FLOAT_FORMAT = "%.3f"
+CSV_FORMAT_ROWS = 65536  # Rows rendered per % call when writing CSV
 
 def simulate_latency(timestamp):
     dt = datetime.datetime.fromtimestamp(timestamp)
     hour = dt.hour
-    
+
     # Base latency varies by time of day
     if 9 <= hour <= 17:  # Business hours
         base = random.randint(60, 90)
@@ -16,35 +35,159 @@ def simulate_latency(timestamp):
         base = random.randint(70, 100)
     else:  # Off hours
         base = random.randint(40, 70)
-    
+
     # Random spikes with different probabilities
-    spike = random.choices([0, 20, 50, 100], weights=[85, 10, 4, 1])[0]
-    
+    spike = random.choices(SPIKE_VALUES, weights=SPIKE_WEIGHTS)[0]
+
     # Add some periodic variation
     periodic = 10 * abs(math.sin(timestamp / 3600))  # Hourly cycle
-    
+
     return base + spike + periodic
 
-def run_simulation(path="data/bootstrapped_latency.csv", duration_hours=24):
-    os.makedirs("data", exist_ok=True)
-    
-    servers = [
-        "8.8.8.8",      # Google DNS
-        "1.1.1.1",      # Cloudflare DNS
-        "9.9.9.9",      # Quad9 DNS
-        "208.67.222.222", # OpenDNS
-        "64.6.64.6"     # Verisign DNS
-    ]
-    
-    start_time = time.time() - (duration_hours * 3600)  # Start from duration_hours ago
-    
+def _base_ranges(diurnal):
+    """Per-hour [low, high] base latency, matching simulate_latency()."""
+    low = np.full(24, 40)
+    high = np.full(24, 70)
+    if diurnal:
+        low[9:18], high[9:18] = 60, 90  # Business hours
+        low[18:23], high[18:23] = 70, 100  # Evening peak
+    return low, high
+
+def make_servers(count):
+    """Default server list, extended with 10.x.y.z names for large runs."""
+    if count <= len(DEFAULT_SERVERS):
+        return DEFAULT_SERVERS[:count]
+    extra = np.arange(count - len(DEFAULT_SERVERS))
+    return DEFAULT_SERVERS + [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in extra]
+
+class LatencyGenerator:
+    """Vectorized version of simulate_latency() for many servers at once.
+
+    Each call to block() returns a (timestamps x servers) matrix. The model
+    matches simulate_latency(): a diurnal uniform base, weighted random
+    spikes and an hourly sine term. On top of that it adds an optional
+    per-server offset (`server_spread`, ms standard deviation) and
+    congestion bursts. A burst starts with probability `burst_rate` per
+    sample, lasts a geometric number of samples with mean `burst_length`
+    and adds `burst_ms`. Burst state carries across blocks, so bursts run
+    on across chunk boundaries. A given seed and chunk size reproduce the
+    same data.
+    """
+
+    def __init__(self, n_servers, seed=None, diurnal=True, spike_values=SPIKE_VALUES,
+                 spike_weights=SPIKE_WEIGHTS, server_spread=0.0, burst_rate=0.0,
+                 burst_length=10, burst_ms=80.0):
+        self.n_servers = n_servers
+        self.rng = np.random.default_rng(seed)
+        self.low, self.high = _base_ranges(diurnal)
+        self.spike_values = np.asarray(spike_values, dtype=np.float64)
+        weights = np.asarray(spike_weights, dtype=np.float64)
+        self.spike_cdf = np.cumsum(weights) / weights.sum()
+        self.offsets = self.rng.normal(0, server_spread, n_servers) if server_spread else np.zeros(n_servers)
+        self.burst_rate = burst_rate
+        self.burst_length = burst_length
+        self.burst_ms = burst_ms
+        self.burst_until = np.full(n_servers, -1, dtype=np.int64)  # Sample index each burst ends at
+        self.position = 0  # Samples generated so far per server
+
+    def block(self, timestamps):
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        shape = (len(timestamps), self.n_servers)
+        hour = local_calendar(timestamps)[0]
+        low, high = self.low[hour][:, None], self.high[hour][:, None]
+        # Integer base in [low, high], like random.randint
+        latency = np.floor(low + self.rng.random(shape) * (high - low + 1))
+        latency += self.spike_values[np.searchsorted(self.spike_cdf, self.rng.random(shape), side='right')]
+        latency += (10 * np.abs(np.sin(timestamps / 3600)))[:, None]
+        latency += self.offsets
+
+        if self.burst_rate > 0:
+            steps = self.position + np.arange(len(timestamps), dtype=np.int64)[:, None]
+            starts = self.rng.random(shape) < self.burst_rate
+            lengths = self.rng.geometric(1.0 / self.burst_length, shape)
+            ends = np.where(starts, steps + lengths, -1)
+            ends = np.maximum.accumulate(np.vstack([self.burst_until, ends]), axis=0)[1:]
+            latency += np.where(ends > steps, self.burst_ms, 0.0)
+            self.burst_until = ends[-1]
+
+        self.position += len(timestamps)
+        return np.maximum(latency, 0.0)
+
+def run_simulation(path="data/bootstrapped_latency.csv", duration_hours=24, servers=None, n_servers=None,
+                   interval=60, seed=None, output="csv", chunk_rows=2_000_000, end_time=None, **model):
+    """Generate duration_hours of samples for every server and write them out.
+
+    `output` is 'csv' (timestamp,server_id,latency rows, time-major like the
+    original) or 'history' (path is a HistoryStore root, one host per
+    server). Rows are produced and written `chunk_rows` at a time, so memory
+    stays flat for any horizon. Extra keyword arguments configure
+    LatencyGenerator (diurnal, server_spread, burst_rate, ...).
+    Returns the number of rows written.
+    """
+    if servers is None:
+        servers = make_servers(n_servers or len(DEFAULT_SERVERS))
+    end_time = time.time() if end_time is None else end_time
+    start_time = end_time - (duration_hours * 3600)  # Start from duration_hours ago
+    steps = int(math.ceil((end_time - start_time) / interval))
+    generator = LatencyGenerator(len(servers), seed=seed, **model)
+    block_steps = max(1, chunk_rows // len(servers))
+
+    if output == "history":
+        from src.history_store import HistoryStore
+        # Generated data is easy to regenerate, so skip per-append msync
+        store = HistoryStore(path, sync=False)
+        written = 0
+        for timestamps, latency in _blocks(generator, start_time, interval, steps, block_steps):
+            for column, server in enumerate(servers):
+                store.append(server, timestamps, latency[:, column])
+            written += latency.size
+        return written
+
+    if output != "csv":
+        raise ValueError(f"Unknown output format: {output}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    written = 0
     with open(path, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["timestamp", "server_id", "latency"])
-        
-        current_time = start_time
-        while current_time < time.time():
-            for server in servers:
-                latency = simulate_latency(current_time)
-                writer.writerow([current_time, server, latency])
-            current_time += 60  # One reading per minute per server
+        csv.writer(f).writerow(["timestamp", "server_id", "latency"])
+        row = "".join(f"{CSV_FLOAT_FORMAT},{server.replace('%', '%%')},{CSV_FLOAT_FORMAT}\r\n" for server in servers)
+        step = max(1, CSV_FORMAT_ROWS // len(servers))
+        for timestamps, latency in _blocks(generator, start_time, interval, steps, block_steps):
+            for first in range(0, len(timestamps), step):
+                f.write(_format_rows(row, timestamps[first:first + step], latency[first:first + step]))
+            written += latency.size
+    return written
+
+def _format_rows(row, timestamps, latency):
+    """Render a (timestamps x servers) block with one %-format over the repeated row template."""
+    values = np.empty(latency.shape + (2,))
+    values[:, :, 0] = timestamps[:, None]
+    values[:, :, 1] = latency
+    return (row * len(timestamps)) % tuple(values.ravel().tolist())
+
+def _blocks(generator, start_time, interval, steps, block_steps):
+    for first in range(0, steps, block_steps):
+        timestamps = start_time + interval * np.arange(first, min(first + block_steps, steps))
+        yield timestamps, generator.block(timestamps)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic latency data")
+    parser.add_argument("--out", default="data/bootstrapped_latency.csv", help="CSV file or history store root")
+    parser.add_argument("--format", default="csv", choices=["csv", "history"])
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--servers", type=int, default=len(DEFAULT_SERVERS))
+    parser.add_argument("--interval", type=float, default=60, help="seconds between samples")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--server-spread", type=float, default=0.0)
+    parser.add_argument("--burst-rate", type=float, default=0.0)
+    parser.add_argument("--burst-length", type=float, default=10)
+    parser.add_argument("--burst-ms", type=float, default=80.0)
+    parser.add_argument("--no-diurnal", action="store_true")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    rows = run_simulation(args.out, args.hours, n_servers=args.servers, interval=args.interval,
+                          seed=args.seed, output=args.format, diurnal=not args.no_diurnal,
+                          server_spread=args.server_spread, burst_rate=args.burst_rate,
+                          burst_length=args.burst_length, burst_ms=args.burst_ms)
+    print(f"Wrote {rows} rows to {args.out} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,130 @@
+import json
+import threading
+
+class _Entry:
+    """One site's status at the board version it last changed in."""
+    __slots__ = ('version', 'status', '_json')
+
+    def __init__(self, version, status):
+        self.version = version
+        self.status = status
+        self._json = None
+
+    def json(self):
+        # Entries are never mutated, so the fragment is valid for their lifetime
+        if self._json is None:
+            self._json = json.dumps(self.status)
+        return self._json
+
+class Snapshot:
+    """Immutable view of the board at one version."""
+    __slots__ = ('version', 'entries', 'removed', '_body', '_lock')
+
+    def __init__(self, version, entries, removed):
+        self.version = version
+        self.entries = entries  # site -> _Entry
+        self.removed = removed  # site -> version it was removed in
+        self._body = None
+        self._lock = threading.Lock()
+
+    def status(self):
+        return {site: entry.status for site, entry in self.entries.items()}
+
+    def body(self):
+        """Full board as JSON, serialized once however many readers ask."""
+        if self._body is None:
+            with self._lock:
+                if self._body is None:
+                    self._body = _join((site, entry.json()) for site, entry in self.entries.items())
+        return self._body
+
+    def render(self, since=None, sites=None):
+        """JSON for the sites changed after `since`, optionally limited to `sites`.
+
+        Sites removed after `since` are included as null, so a client can
+        apply the result to its copy of an older version.
+        """
+        if since is None and sites is None:
+            return self.body()
+        names = self.entries.keys() if sites is None else [site for site in sites if site in self.entries]
+        items = [(site, self.entries[site].json()) for site in names
+                 if since is None or self.entries[site].version > since]
+        if since is not None:
+            items += [(site, 'null') for site, version in self.removed.items()
+                      if version > since and (sites is None or site in sites)]
+        return _join(items)
+
+def _join(items):
+    return '{' + ', '.join(f'{json.dumps(site)}: {fragment}' for site, fragment in items) + '}'
+
+class StatusBoard:
+    """Versioned, copy-on-write store for the per-site monitoring status.
+
+    Writers serialize on a lock, build a new Snapshot sharing every
+    unchanged entry and swap it in; readers just take the current
+    reference, so they never lock and never see a half-applied update.
+    Every change bumps `version`, which only ever increases (also across
+    clear()), making it usable as an ETag and as a `since` cursor.
+    """
+
+    def __init__(self):
+        self._snapshot = Snapshot(0, {}, {})
+        self._write_lock = threading.Lock()
+
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def __contains__(self, site):
+        return site in self._snapshot.entries
+
+    def __iter__(self):
+        return iter(list(self._snapshot.entries))
+
+    def get(self, site):
+        entry = self._snapshot.entries.get(site)
+        return entry.status if entry is not None else None
+
+    def _commit(self, changes, removals=()):
+        current = self._snapshot
+        version = current.version + 1
+        entries = dict(current.entries)
+        removed = dict(current.removed)
+        for site, status in changes.items():
+            entries[site] = _Entry(version, status)
+            removed.pop(site, None)
+        for site in removals:
+            if entries.pop(site, None) is not None:
+                removed[site] = version
+        self._snapshot = Snapshot(version, entries, removed)
+
+    def add(self, site, status):
+        """Add a site unless it is already on the board; returns True if added."""
+        with self._write_lock:
+            if site in self._snapshot.entries:
+                return False
+            self._commit({site: dict(status)})
+            return True
+
+    def update(self, site, fields):
+        """Merge fields into a site's status; returns the new status, or None for unknown sites."""
+        with self._write_lock:
+            entry = self._snapshot.entries.get(site)
+            if entry is None:
+                return None
+            status = {**entry.status, **fields}
+            self._commit({site: status})
+            return status
+
+    def update_all(self, fields):
+        """Merge the same fields into every site in one version."""
+        with self._write_lock:
+            entries = self._snapshot.entries
+            self._commit({site: {**entry.status, **fields} for site, entry in entries.items()})
+
+    def clear(self):
+        with self._write_lock:
+            self._commit({}, removals=list(self._snapshot.entries))
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+
+class _Subscriber:
+    __slots__ = ('pending', 'snapshot', 'ready', 'last_sent', 'closed')
+
+    def __init__(self, snapshot):
+        self.pending = {}  # site -> changed fields, merged until the next send
+        self.snapshot = snapshot  # Full board to send first; pending only holds later changes
+        self.ready = threading.Event()
+        self.last_sent = 0.0
+        self.closed = False
+
+class StatusBroadcaster:
+    """Fan out per-site status deltas to Server-Sent Events clients.
+
+    publish() diffs a site's status against the last published copy and
+    merges only the changed fields into every subscriber's pending dict.
+    Each client is sent at most one event per `coalesce_window` seconds,
+    so a burst of updates becomes a single message. A slow client simply
+    accumulates more merged fields: its backlog is bounded by sites x
+    fields, and publishers never block on it.
+    """
+
+    def __init__(self, coalesce_window=0.25, heartbeat=15.0, max_subscribers=100):
+        self.coalesce_window = coalesce_window
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.state = {}
+        self.subscribers = set()
+        self.published = 0
+        self.events_sent = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+    def publish(self, site, status):
+        """Record a site's new status and queue whatever fields changed."""
+        with self._lock:
+            previous = self.state.get(site, {})
+            delta = {key: value for key, value in status.items() if previous.get(key, ...) != value}
+            if not delta:
+                return
+            self.state[site] = dict(status)
+            self.published += 1
+            for subscriber in self.subscribers:
+                fields = subscriber.pending.get(site)
+                if fields is None:
+                    subscriber.pending[site] = dict(delta)
+                else:
+                    self.coalesced += 1
+                    fields.update(delta)
+                subscriber.ready.set()
+
+    def reset(self, statuses):
+        """Replace the whole board (sites added or removed); clients get a fresh snapshot."""
+        with self._lock:
+            self.state = {site: dict(status) for site, status in statuses.items()}
+            for subscriber in self.subscribers:
+                subscriber.snapshot = dict(self.state)
+                subscriber.pending = {}
+                subscriber.ready.set()
+
+    def subscribe(self):
+        """Register a client, or return None when at max_subscribers."""
+        with self._lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            subscriber = _Subscriber(dict(self.state))
+            subscriber.ready.set()
+            self.subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscriber.closed = True
+            self.subscribers.discard(subscriber)
+            subscriber.ready.set()
+
+    def _take(self, subscriber):
+        with self._lock:
+            snapshot, subscriber.snapshot = subscriber.snapshot, None
+            pending, subscriber.pending = subscriber.pending, {}
+            subscriber.ready.clear()
+        return snapshot, pending
+
+    def events(self, subscriber):
+        """Yield SSE-formatted messages for one client until it disconnects."""
+        try:
+            while not subscriber.closed:
+                if not subscriber.ready.wait(self.heartbeat):
+                    yield ": keepalive\n\n"  # Lets the server notice dead connections
+                    continue
+                # Hold back so updates arriving within the window share one event
+                delay = subscriber.last_sent + self.coalesce_window - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                snapshot, pending = self._take(subscriber)
+                subscriber.last_sent = time.monotonic()
+                if snapshot is not None:
+                    yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+                if pending:
+                    self.events_sent += 1
+                    yield f"event: status\ndata: {json.dumps(pending)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self.subscribers),
+                "published": self.published,
+                "events_sent": self.events_sent,
+                "coalesced": self.coalesced,
+                "coalesce_window": self.coalesce_window
+            }
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+def get_status_broadcaster():
+    """Return the process-wide status broadcaster, creating it on first use."""
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                _broadcaster = StatusBroadcaster()
+    return _broadcaster
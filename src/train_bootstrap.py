@@ -1,11 +1,14 @@
-from river import linear_model, preprocessing, metrics
-import csv
+from river import linear_model, optim, preprocessing
 import datetime
 import pickle
 import os
 import numpy as np
-import random
-import sklearn.metrics
+import pandas as pd
+from src.feature_engine import stable_server_id, local_calendar
+
+BOOTSTRAP_FEATURES = ["hour", "minute", "day_of_week", "is_weekend", "is_business_hours", "server_id"]
+LATENCY_CLASSES = ['low', 'medium', 'high']
+CLASS_THRESHOLDS = [50, 150]
 
 def extract_features(timestamp, server_id):
     dt = datetime.datetime.fromtimestamp(float(timestamp))
@@ -15,9 +18,24 @@ def extract_features(timestamp, server_id):
         "day_of_week": dt.weekday(),
         "is_weekend": int(dt.weekday() >= 5),
         "is_business_hours": int(9 <= dt.hour <= 17),
-        "server_id": hash(server_id) % 10
+        "server_id": stable_server_id(server_id)
     }
 
+def extract_feature_frame(timestamps, server_ids):
+    """Vectorized extract_features for whole columns; returns a DataFrame."""
+    hour, minute, _, dow = local_calendar(timestamps)
+    # Only a handful of distinct servers, so hash each name once
+    names, codes = np.unique(np.asarray(server_ids, dtype=str), return_inverse=True)
+    buckets = np.array([stable_server_id(name) for name in names], dtype=np.int64)
+    return pd.DataFrame({
+        "hour": hour,
+        "minute": minute,
+        "day_of_week": dow,
+        "is_weekend": (dow >= 5).astype(int),
+        "is_business_hours": ((hour >= 9) & (hour <= 17)).astype(int),
+        "server_id": buckets[codes]
+    })
+
 def classify_latency(latency):
     low_threshold = 50
     high_threshold = 150
@@ -28,70 +46,100 @@ def classify_latency(latency):
     else:
         return 'high'
 
-def train_model(path="data/bootstrapped_latency.csv"):
+def classify_latencies(latencies):
+    """Vectorized classify_latency returning indexes into LATENCY_CLASSES."""
+    return np.digitize(latencies, CLASS_THRESHOLDS)
+
+class RegressionMetrics:
+    """Running MAE/RMSE and a low/medium/high confusion matrix over batches."""
+
+    def __init__(self):
+        self.count = 0
+        self.abs_error = 0.0
+        self.sq_error = 0.0
+        self.confusion = np.zeros((len(LATENCY_CLASSES), len(LATENCY_CLASSES)), dtype=np.int64)
+
+    def update(self, y_true, y_pred):
+        errors = y_true - y_pred
+        self.count += len(errors)
+        self.abs_error += np.abs(errors).sum()
+        self.sq_error += np.square(errors).sum()
+        n = len(LATENCY_CLASSES)
+        cells = classify_latencies(y_true) * n + classify_latencies(y_pred)
+        self.confusion += np.bincount(cells, minlength=n * n).reshape(n, n)
+
+    @property
+    def mae(self):
+        return self.abs_error / self.count if self.count else 0.0
+
+    @property
+    def rmse(self):
+        return (self.sq_error / self.count) ** 0.5 if self.count else 0.0
+
+def _iter_chunks(path, chunksize, test_fraction, seed):
+    """Yield (features, targets, is_test) per CSV chunk.
+
+    The train/test split is drawn per chunk from a generator seeded with the
+    chunk number, so a second pass over the file sees the same split.
+    """
+    reader = pd.read_csv(path, chunksize=chunksize, usecols=["timestamp", "server_id", "latency"],
+                         dtype={"server_id": str})
+    for number, chunk in enumerate(reader):
+        rng = np.random.default_rng([seed, number])
+        is_test = rng.random(len(chunk)) < test_fraction
+        order = rng.permutation(len(chunk))  # Shuffle within the chunk
+        chunk = chunk.iloc[order].reset_index(drop=True)
+        features = extract_feature_frame(chunk["timestamp"].to_numpy(), chunk["server_id"].to_numpy())
+        yield features, chunk["latency"].astype(float), is_test
+
+def train_model(path="data/bootstrapped_latency.csv", chunksize=200_000, batch_size=64,
+                test_fraction=0.2, seed=42, model_path="model/model_state.pkl"):
+    """Stream a CSV in chunks and mini-batch train the bootstrap model.
+
+    Memory stays bounded by `chunksize` however large the file is. Training
+    metrics are progressive (each batch is scored before it is learned);
+    test metrics come from a second pass over the held-out rows.
+    """
     # Initialize model with standard preprocessing
     model = (
         preprocessing.StandardScaler() |
-        linear_model.LinearRegression()
+        linear_model.LinearRegression(optimizer=optim.Adam(0.05))
     )
-    
-    # Initialize metrics
-    mae = metrics.MAE()
-    rmse = metrics.RMSE()
-    
-    # Load and process data
-    data = []
-    with open(path) as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            data.append(row)
-    
-    # Shuffle data
-    random.shuffle(data)
-    
-    # Split into train/test (80/20)
-    split_idx = int(len(data) * 0.8)
-    train_data = data[:split_idx]
-    test_data = data[split_idx:]
-    
+
     # Train model
     print("Training model...")
-    for row in train_data:
-        x = extract_features(row["timestamp"], row["server_id"])
-        y = float(row["latency"])
-        pred = model.predict_one(x) or 0
-        model.learn_one(x, y)
-        mae.update(y, pred)
-        rmse.update(y, pred)
-    
-    print(f"Training metrics - MAE: {mae.get():.2f}ms, RMSE: {rmse.get():.2f}ms")
-    
+    train_metrics = RegressionMetrics()
+    for features, targets, is_test in _iter_chunks(path, chunksize, test_fraction, seed):
+        features, targets = features[~is_test], targets[~is_test]
+        predictions = np.empty(len(targets))
+        for start in range(0, len(targets), batch_size):
+            x = features.iloc[start:start + batch_size]
+            y = targets.iloc[start:start + batch_size]
+            predictions[start:start + len(y)] = model.predict_many(x).fillna(0).to_numpy()
+            model.learn_many(x, y)
+        train_metrics.update(targets.to_numpy(), predictions)
+
+    print(f"Training metrics - MAE: {train_metrics.mae:.2f}ms, RMSE: {train_metrics.rmse:.2f}ms")
+
     # Evaluate on test set
-    mae = metrics.MAE()
-    rmse = metrics.RMSE()
-    y_true, y_pred_class = [], []
-    for row in test_data:
-        x = extract_features(row["timestamp"], row["server_id"])
-        y = float(row["latency"])
-        pred = model.predict_one(x) or 0
-        mae.update(y, pred)
-        rmse.update(y, pred)
-        
-        # Add to classification lists
-        y_true.append(classify_latency(y))
-        y_pred_class.append(classify_latency(pred))
-
-    print(f"Test metrics - MAE: {mae.get():.2f}ms, RMSE: {rmse.get():.2f}ms")
-    
-    # Calculate confusion matrix
-    conf_matrix = sklearn.metrics.confusion_matrix(y_true, y_pred_class, labels=['low', 'medium', 'high'])
-    print(f"Confusion Matrix:\n{conf_matrix}")
-    
+    test_metrics = RegressionMetrics()
+    for features, targets, is_test in _iter_chunks(path, chunksize, test_fraction, seed):
+        if is_test.any():
+            pred = model.predict_many(features[is_test]).fillna(0)
+            test_metrics.update(targets[is_test].to_numpy(), pred.to_numpy())
+
+    print(f"Test metrics - MAE: {test_metrics.mae:.2f}ms, RMSE: {test_metrics.rmse:.2f}ms")
+
+    # Rows are actual class, columns predicted, in LATENCY_CLASSES order
+    print(f"Confusion Matrix:\n{test_metrics.confusion}")
+
     # Save model
-    os.makedirs("model", exist_ok=True)
-    with open("model/model_state.pkl", "wb") as f:
+    directory = os.path.dirname(model_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(model_path, "wb") as f:
         pickle.dump(model, f)
-    
+
     return model
 
 if __name__ == "__main__":
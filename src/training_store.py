@@ -0,0 +1,180 @@
+import datetime
+import math
+import threading
+import numpy as np
+
+RETENTION_POLICIES = ('window', 'reservoir', 'decay')
+
+def to_epoch(timestamp):
+    """Convert a datetime, pandas Timestamp or number to epoch seconds."""
+    if isinstance(timestamp, datetime.datetime):
+        return timestamp.timestamp()
+    return float(timestamp)
+
+class TrainingStore:
+    """Fixed-capacity columnar store of training samples for one predictor.
+
+    Timestamps and latencies are float64 columns and each row keeps the
+    feature vector computed when the sample arrived. Rolling features stay
+    correct even when the retention policy keeps non-adjacent samples.
+    Memory is allocated once up front, so it stays flat however long the
+    site is monitored.
+
+    Retention policies:
+      - 'window': the newest samples no older than `window_seconds`
+      - 'reservoir': a uniform sample of everything seen (Algorithm R)
+      - 'decay': a weighted reservoir favouring recent samples, with weights
+        halving every `half_life` seconds
+    """
+
+    def __init__(self, n_features, policy='window', capacity=5000, window_seconds=6 * 3600,
+                 half_life=3600, seed=None):
+        if policy not in RETENTION_POLICIES:
+            raise ValueError(f"Unknown retention policy: {policy}")
+        self.policy = policy
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.half_life = half_life
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.latencies = np.zeros(capacity, dtype=np.float64)
+        # Trees train on float32 internally, so nothing is lost here
+        self.features = np.zeros((capacity, n_features), dtype=np.float32)
+        self.keys = np.zeros(capacity, dtype=np.float64) if policy == 'decay' else None
+        self.head = 0  # Oldest slot for the 'window' ring buffer
+        self.count = 0
+        self.seen = 0
+        self._key_origin = None
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        total = self.timestamps.nbytes + self.latencies.nbytes + self.features.nbytes
+        if self.keys is not None:
+            total += self.keys.nbytes
+        return total
+
+    def _write(self, slot, timestamp, latency, features):
+        self.timestamps[slot] = timestamp
+        self.latencies[slot] = latency
+        self.features[slot] = features
+
+    def append(self, timestamp, latency, features):
+        """Add one sample, evicting according to the retention policy."""
+        timestamp = to_epoch(timestamp)
+        with self._lock:
+            self.seen += 1
+            if self.policy == 'window':
+                self._append_window(timestamp, latency, features)
+            elif self.policy == 'reservoir':
+                self._append_reservoir(timestamp, latency, features)
+            else:
+                self._append_decay(timestamp, latency, features)
+
+    def _append_window(self, timestamp, latency, features):
+        if self.count == self.capacity:
+            # Overwrite the oldest sample
+            self._write(self.head, timestamp, latency, features)
+            self.head = (self.head + 1) % self.capacity
+        else:
+            self._write((self.head + self.count) % self.capacity, timestamp, latency, features)
+            self.count += 1
+        cutoff = timestamp - self.window_seconds
+        while self.count > 1 and self.timestamps[self.head] < cutoff:
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+
+    def _append_reservoir(self, timestamp, latency, features):
+        if self.count < self.capacity:
+            self._write(self.count, timestamp, latency, features)
+            self.count += 1
+            return
+        slot = self._rng.integers(0, self.seen)
+        if slot < self.capacity:
+            self._write(slot, timestamp, latency, features)
+
+    def _append_decay(self, timestamp, latency, features):
+        # Efraimidis-Spirakis keys u ** (1 / w) kept in log form relative to an origin
+        if self._key_origin is None:
+            self._key_origin = timestamp
+        age = (timestamp - self._key_origin) / self.half_life
+        if age > 64:
+            # Move the origin forward before the weights overflow
+            self.keys[:self.count] *= 2.0 ** age
+            self._key_origin = timestamp
+            age = 0.0
+        key = math.log(self._rng.random() or 1e-300) * 2.0 ** -age
+        if self.count < self.capacity:
+            self.keys[self.count] = key
+            self._write(self.count, timestamp, latency, features)
+            self.count += 1
+            return
+        slot = int(np.argmin(self.keys))
+        if key > self.keys[slot]:
+            self.keys[slot] = key
+            self._write(slot, timestamp, latency, features)
+
+    def _ordered_slots(self):
+        if self.policy == 'window':
+            return (self.head + np.arange(self.count)) % self.capacity
+        slots = np.arange(self.count)
+        return slots[np.argsort(self.timestamps[:self.count], kind='stable')]
+
+    def sample(self, max_samples=None):
+        """Return (features, latencies) copies in time order, at most max_samples rows.
+
+        The 'window' policy returns the most recent rows; the sampling
+        policies return a uniform subset of what they retain.
+        """
+        with self._lock:
+            slots = self._ordered_slots()
+            if max_samples is not None and len(slots) > max_samples:
+                if self.policy == 'window':
+                    slots = slots[-max_samples:]
+                else:
+                    keep = self._rng.choice(len(slots), size=max_samples, replace=False)
+                    slots = slots[np.sort(keep)]
+            return self.features[slots], self.latencies[slots]
+
+    def state(self):
+        """Retained rows in time order plus sampling state, for snapshots."""
+        with self._lock:
+            slots = self._ordered_slots()
+            return {
+                'policy': self.policy,
+                'timestamps': self.timestamps[slots],
+                'latencies': self.latencies[slots],
+                'features': self.features[slots],
+                'keys': self.keys[slots] if self.keys is not None else None,
+                'seen': self.seen,
+                'key_origin': self._key_origin
+            }
+
+    def load_state(self, state):
+        """Replace the contents with a state() from a store of the same policy.
+
+        When the snapshot holds more rows than fit, the newest are kept.
+        """
+        if state['policy'] != self.policy:
+            raise ValueError(f"Snapshot retention {state['policy']} does not match {self.policy}")
+        n = min(len(state['timestamps']), self.capacity)
+        with self._lock:
+            if n:
+                self.timestamps[:n] = state['timestamps'][-n:]
+                self.latencies[:n] = state['latencies'][-n:]
+                self.features[:n] = state['features'][-n:]
+                if self.keys is not None and state['keys'] is not None:
+                    self.keys[:n] = state['keys'][-n:]
+            self.head = 0
+            self.count = n
+            self.seen = max(state['seen'], n)
+            self._key_origin = state['key_origin']
+
+    def series(self):
+        """Return (timestamps, latencies) copies in time order."""
+        with self._lock:
+            slots = self._ordered_slots()
+            return self.timestamps[slots], self.latencies[slots]
@@ -0,0 +1,114 @@
+import glob
+import os
+import pickle
+import threading
+import numpy as np
+from src.history_store import get_history_store, read_log_csv, log_file_host, normalize_host, LOG_GLOB
+
+BASE_MODEL_PATH = os.path.join('model', 'model_state.pkl')
+# Generous upper bound on one log line, for sizing tail reads
+MAX_LOG_ROW_BYTES = 160
+
+def site_aliases(site):
+    """Names a site may have been logged under (add_website strips 'www.')."""
+    site = normalize_host(site)
+    aliases = [site]
+    if site.startswith('www.'):
+        aliases.append(site[4:])
+    else:
+        aliases.append('www.' + site)
+    return aliases
+
+def recent_history(site, limit=2000, store=None, logs_dir='logs'):
+    """Return the newest `limit` (timestamps, latencies) recorded for site.
+
+    The history store is read first. When it holds fewer than `limit` rows,
+    the tails of the site's logs/latency_log_<site>.csv files, in either
+    naming scheme, top it up; rows at timestamps the store already has are
+    dropped. A large log costs no more to read than `limit` rows.
+    """
+    store = store or get_history_store()
+    timestamps, latencies = [], []
+    stored = 0
+    for alias in site_aliases(site):
+        # Walk back from the newest segment only as far as the limit needs
+        needed = limit
+        for segment in reversed(store.segments(alias)):
+            count = segment.count
+            take = min(count, needed)
+            timestamps.append(segment.timestamp_column[count - take:count])
+            latencies.append(segment.latency_column[count - take:count])
+            needed -= take
+            stored += take
+            if needed <= 0:
+                break
+
+    if stored < limit:
+        aliases = set(site_aliases(site))
+        for path in glob.glob(os.path.join(logs_dir, LOG_GLOB)):
+            host = log_file_host(path)
+            if host is not None and normalize_host(host) in aliases:
+                columns = read_log_csv(path, host, tail_bytes=limit * MAX_LOG_ROW_BYTES)
+                timestamps.append(columns['timestamp'])
+                latencies.append(columns['latency'])
+    if not timestamps:
+        return np.zeros(0), np.zeros(0)
+
+    timestamps = np.concatenate(timestamps)
+    latencies = np.concatenate(latencies)
+    # Stable, so store rows (added first) win over log rows at the same timestamp
+    order = np.argsort(timestamps, kind='stable')
+    timestamps, latencies = timestamps[order], latencies[order]
+    keep = np.isfinite(latencies)
+    keep[1:] &= timestamps[1:] != timestamps[:-1]
+    return timestamps[keep][-limit:], latencies[keep][-limit:]
+
+_base_model = None
+_base_model_loaded = False
+_base_model_lock = threading.Lock()
+
+def get_base_model(path=BASE_MODEL_PATH):
+    """Load the pretrained model from train_bootstrap on first use, or None.
+
+    It only knows calendar features and a server bucket, so predictors use
+    it until their own backend has learned the site.
+    """
+    global _base_model, _base_model_loaded
+    if not _base_model_loaded:
+        with _base_model_lock:
+            if not _base_model_loaded:
+                try:
+                    if os.path.exists(path):
+                        with open(path, 'rb') as f:
+                            _base_model = pickle.load(f)
+                except Exception as e:
+                    print(f"Error loading base model {path}: {str(e)}")
+                _base_model_loaded = True
+    return _base_model
+
+_preloaded = threading.Event()
+_preload_thread = None
+_preload_lock = threading.Lock()
+
+def preload():
+    """Import the libraries warm starts parse and predict with, and load the base model."""
+    try:
+        import pandas  # read_log_csv and feature_matrix
+        import dateutil.tz
+        get_base_model()  # Unpickling it imports river
+    except Exception as e:
+        print(f"Error preloading warm start: {str(e)}")
+    finally:
+        _preloaded.set()
+
+def preload_in_background():
+    """Start preload() on its own thread, once; monitoring ticks never pay for it."""
+    global _preload_thread
+    if _preload_thread is None:
+        with _preload_lock:
+            if _preload_thread is None:
+                _preload_thread = threading.Thread(target=preload, name="warm-start-preload", daemon=True)
+                _preload_thread.start()
+
+def is_preloaded():
+    return _preloaded.is_set()
@@ -0,0 +1,23 @@
+import os
+import sys
+import pytest
+
+# src/ is imported as a namespace package from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(autouse=True, scope='session')
+def scratch_data_dirs(tmp_path_factory):
+    """Run from a scratch directory, so logs, history and snapshots never land in the tree."""
+    root = tmp_path_factory.mktemp('latency')
+    saved = {name: os.environ.get(name) for name in ('LATENCY_HISTORY_DIR', 'LATENCY_SNAPSHOT_DIR')}
+    os.environ['LATENCY_HISTORY_DIR'] = str(root / 'history')
+    os.environ['LATENCY_SNAPSHOT_DIR'] = str(root / 'snapshots')
+    cwd = os.getcwd()
+    os.chdir(root)
+    yield root
+    os.chdir(cwd)
+    for name, value in saved.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
@@ -0,0 +1,109 @@
+import threading
+import time
+from src.dns_cache import DNSCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class StubResolver:
+    """Answers from a table and counts the lookups it was asked for."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+        self.release = None  # Event a lookup waits for, to hold it in flight
+
+    def __call__(self, name):
+        self.calls.append(name)
+        if self.release is not None:
+            self.release.wait(5)
+        answer = self.answers.get(name)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer if answer is not None else ([], 0)
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return predicate()
+
+def test_hits_are_served_until_the_ttl_expires():
+    resolver = StubResolver({'example.com': (['10.0.0.1', '10.0.0.2'], 60)})
+    clock = FakeClock()
+    cache = DNSCache(resolver=resolver, clock=clock, refresh_ahead=1.0)
+    assert cache.resolve('example.com') == ['10.0.0.1', '10.0.0.2']
+    clock.now += 59
+    assert cache.resolve('example.com') == ['10.0.0.1', '10.0.0.2']
+    assert resolver.calls == ['example.com']
+    clock.now += 2
+    cache.resolve('example.com')
+    assert resolver.calls == ['example.com', 'example.com']
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+
+def test_ttl_is_clamped_to_floor_and_ceiling():
+    resolver = StubResolver({'short': (['10.0.0.1'], 1), 'long': (['10.0.0.2'], 86400)})
+    clock = FakeClock()
+    cache = DNSCache(resolver=resolver, clock=clock, min_ttl=5, max_ttl=300, refresh_ahead=1.0)
+    cache.resolve('short')
+    cache.resolve('long')
+    clock.now += 4
+    assert cache.lookup_cached('short') == ['10.0.0.1']  # Kept for min_ttl, not 1s
+    clock.now += 297
+    assert cache.lookup_cached('long') is None  # Dropped after max_ttl, not a day
+
+def test_failures_are_cached_as_negative_results():
+    resolver = StubResolver({'broken.example': OSError('SERVFAIL')})
+    clock = FakeClock()
+    cache = DNSCache(resolver=resolver, clock=clock, negative_ttl=30)
+    assert cache.resolve('broken.example') == []
+    assert cache.resolve('broken.example') == []
+    assert resolver.calls == ['broken.example']
+    assert cache.stats()['negative_hits'] == 1
+    clock.now += 31
+    cache.resolve('broken.example')
+    assert len(resolver.calls) == 2
+
+def test_concurrent_misses_share_one_lookup():
+    resolver = StubResolver({'example.com': (['10.0.0.1'], 60)})
+    resolver.release = threading.Event()
+    cache = DNSCache(resolver=resolver)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.resolve('example.com'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    assert _wait_for(lambda: cache.stats()['coalesced'] == 7)
+    resolver.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [['10.0.0.1']] * 8
+    assert resolver.calls == ['example.com']
+
+def test_hot_entries_are_refreshed_before_they_expire():
+    resolver = StubResolver({'example.com': (['10.0.0.1'], 100)})
+    clock = FakeClock()
+    cache = DNSCache(resolver=resolver, clock=clock, refresh_ahead=0.8)
+    cache.resolve('example.com')
+    resolver.answers['example.com'] = (['10.0.0.9'], 100)
+    clock.now += 81
+    # Still served from the cache while the refresh runs in the background
+    assert cache.resolve('example.com') == ['10.0.0.1']
+    assert _wait_for(lambda: cache.stats()['refreshes'] == 1)
+    assert cache.lookup_cached('example.com') == ['10.0.0.9']
+    assert len(resolver.calls) == 2
+
+def test_failed_refresh_keeps_the_old_records():
+    resolver = StubResolver({'example.com': (['10.0.0.1'], 100)})
+    clock = FakeClock()
+    cache = DNSCache(resolver=resolver, clock=clock, refresh_ahead=0.8)
+    cache.resolve('example.com')
+    resolver.answers['example.com'] = OSError('timeout')
+    clock.now += 81
+    cache.resolve('example.com')
+    assert _wait_for(lambda: cache.stats()['refreshes'] == 1)
+    assert cache.lookup_cached('example.com') == ['10.0.0.1']
@@ -0,0 +1,70 @@
+import datetime
+import numpy as np
+import pytest
+from src.feature_engine import FEATURE_NAMES, IncrementalFeatures, feature_matrix
+from src.live_predictor import LatencyPredictor
+
+ROLLING_STD = FEATURE_NAMES.index('rolling_std')
+VOLATILITY = FEATURE_NAMES.index('volatility')
+
+def _expected(row):
+    """prepare_features' row, with pandas' rolling std residue over a constant window zeroed.
+
+    pandas leaves ~1e-7 instead of 0 when a constant run follows varied
+    values; the ring buffers report exactly 0, which prepare_features
+    means to turn into 1 for rolling_std.
+    """
+    row = row.copy()
+    if abs(row[ROLLING_STD]) < 1e-6:
+        row[ROLLING_STD] = 1.0
+    if abs(row[VOLATILITY]) < 1e-6:
+        row[VOLATILITY] = 0.0
+    return row
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2024, 3, 8, 23, 59, 30).timestamp()  # Crosses midnight into a weekend
+    timestamps = start + np.cumsum(rng.uniform(0.5, 2.0, n))
+    latencies = rng.gamma(4.0, 10.0, n)
+    latencies[20:30] = 42.0  # A constant run, where pandas reports a std of exactly 0
+    latencies[50] = 900.0  # A spike
+    return timestamps, latencies
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_incremental_matches_prepare_features(seed):
+    timestamps, latencies = _series(120, seed)
+    predictor = LatencyPredictor(warm_start=False, snapshots=False)
+    features = IncrementalFeatures()
+    history = []
+    for i, (ts, latency) in enumerate(zip(timestamps, latencies)):
+        timestamp = datetime.datetime.fromtimestamp(ts)
+        history.append({'timestamp': timestamp, 'latency': float(latency)})
+        features.update(latency, timestamp)
+        batch = predictor.prepare_features(history)
+        vector = features.vector()
+        if i == 0:
+            assert vector is None
+            continue
+        assert vector.shape == (len(FEATURE_NAMES),)
+        np.testing.assert_allclose(vector, _expected(batch[-1]), rtol=1e-9, atol=1e-9, err_msg=f"sample {i}")
+
+def test_feature_matrix_matches_incremental():
+    timestamps, latencies = _series(200)
+    matrix = feature_matrix(timestamps, latencies)
+    features = IncrementalFeatures()
+    rows = []
+    for ts, latency in zip(timestamps, latencies):
+        features.update(latency, float(ts))
+        if features.vector() is not None:
+            rows.append(features.vector())
+    np.testing.assert_allclose(matrix, np.array(rows), rtol=1e-9, atol=1e-9)
+
+def test_long_run_does_not_drift():
+    # Running sums are resynced from the ring, so a long series stays exact
+    timestamps, latencies = _series(5000, seed=3)
+    features = IncrementalFeatures()
+    for ts, latency in zip(timestamps, latencies):
+        features.update(latency, float(ts))
+    window = latencies[-10:]
+    assert features.long.mean() == pytest.approx(window.mean(), rel=1e-12)
+    assert features.long.std(1) == pytest.approx(window.std(ddof=1), rel=1e-9)
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from src.history_query import HistoryQuery, aggregate
+from src.history_store import HistoryStore
+
+BASE = 1699999200.0  # A whole hour, so buckets line up with BASE
+
+def _raw(store, host, resolution):
+    data = store.read(host)
+    return aggregate(data['timestamp'], data['latency'], data['is_spike'], resolution)
+
+def _assert_same(columns, expected):
+    for field, values in expected.items():
+        assert np.allclose(columns[field], values), field
+
+def test_aggregate_buckets_match_numpy():
+    timestamps = BASE + np.array([0, 10, 20, 30, 60, 61, 200], dtype=float)
+    latencies = np.array([5.0, 1.0, 3.0, np.nan, 7.0, 9.0, 4.0])
+    spikes = np.array([False, True, False, True, True, False, False])
+    columns = aggregate(timestamps, latencies, spikes, 60)
+
+    # The NaN row is dropped and the empty bucket at +120 is left out
+    assert list(columns['t']) == [BASE, BASE + 60, BASE + 180]
+    assert list(columns['count']) == [3, 2, 1]
+    assert list(columns['min']) == [1.0, 7.0, 4.0]
+    assert list(columns['max']) == [5.0, 9.0, 4.0]
+    assert np.allclose(columns['avg'], [3.0, 8.0, 4.0])
+    assert np.allclose(columns['p95'], [np.percentile([5, 1, 3], 95), np.percentile([7, 9], 95), 4.0])
+    assert list(columns['spikes']) == [1, 1, 0]
+
+def test_aggregate_of_nothing_is_empty():
+    columns = aggregate([], [], [], 60)
+    assert all(len(values) == 0 for values in columns.values())
+
+def test_rollup_answers_match_raw_rows(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_rows=500, sync=False)
+    rng = np.random.default_rng(0)
+    timestamps = BASE + np.cumsum(rng.uniform(0.5, 3.0, 3000))
+    store.append('site.test', timestamps, rng.gamma(2.0, 10.0, 3000), spikes=rng.random(3000) < 0.05)
+    query = HistoryQuery(store)
+
+    for resolution in (60, 300):
+        columns, source = query.query('site.test', BASE, timestamps[-1], resolution)
+        assert source == 'rollup'
+        _assert_same(columns, _raw(store, 'site.test', resolution))
+    # Resolutions without a rollup are aggregated from the raw rows
+    columns, source = query.query('site.test', BASE, timestamps[-1], 90)
+    assert source == 'raw'
+    _assert_same(columns, _raw(store, 'site.test', 90))
+
+def test_rollups_fold_rows_as_they_are_appended(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_rows=200, sync=False)
+    query = HistoryQuery(store)
+    store.append('site.test', [BASE], [1.0])
+    query.query('site.test', BASE, BASE + 60, 60)
+    rollup = query._rollups[('site.test', 60)]
+
+    for i in range(20):
+        store.append('site.test', BASE + 1 + np.arange(i * 50, (i + 1) * 50), np.full(50, float(i)))
+        # Completed buckets are folded in on write, before any query
+        assert rollup.seen == store.count('site.test')
+    assert len(rollup.columns['t']) == 16
+
+    columns, source = query.query('site.test', BASE, BASE + 1001, 60)
+    assert source == 'rollup'
+    _assert_same(columns, _raw(store, 'site.test', 60))
+
+def test_rows_from_another_writer_are_caught_up_on_query(tmp_path):
+    store = HistoryStore(str(tmp_path), sync=False)
+    query = HistoryQuery(store)
+    store.append('site.test', BASE + np.arange(100), np.ones(100))
+    query.query('site.test', BASE, BASE + 100, 60)
+
+    # A worker process appends through its own store; no listener fires here
+    HistoryStore(str(tmp_path), sync=False).append('site.test', BASE + 100 + np.arange(200), np.full(200, 2.0))
+    columns, source = query.query('site.test', BASE, BASE + 300, 60)
+    assert source == 'rollup'
+    assert columns['count'].sum() == 300
+    _assert_same(columns, _raw(store, 'site.test', 60))
+
+def test_ranges_older_than_the_rollup_use_raw_rows(tmp_path):
+    store = HistoryStore(str(tmp_path), sync=False)
+    store.append('site.test', BASE + np.arange(0, 6000, 10), np.ones(600))
+    query = HistoryQuery(store, max_rollup_buckets=10)
+    _, source = query.query('site.test', BASE + 5400, BASE + 6000, 60)
+    assert source == 'rollup'
+    columns, source = query.query('site.test', BASE, BASE + 6000, 60)
+    assert source == 'raw'
+    assert columns['count'].sum() == 600
+
+def test_resolve_rejects_bad_ranges():
+    query = HistoryQuery(HistoryStore('unused'))
+    with pytest.raises(ValueError):
+        query.resolve(BASE + 10, BASE)
+    with pytest.raises(ValueError):
+        query.resolve(BASE, BASE + 10, 0)
+    with pytest.raises(ValueError):
+        query.resolve(BASE, BASE + 10 ** 6, 1)
+    assert query.resolve(BASE, BASE + 3600)[2] == 60
+    assert query.resolve(BASE, BASE + 7 * 86400)[2] == 3600
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from src.history_store import HistoryStore
+
+@pytest.mark.parametrize("seed", range(20))
+def test_locate_matches_searchsorted_with_repeated_timestamps(tmp_path, seed):
+    # A stride of 4 puts runs of equal timestamps across many block boundaries
+    rng = np.random.default_rng(seed)
+    timestamps = np.sort(rng.integers(0, 12, size=60)).astype(float)
+    store = HistoryStore(str(tmp_path), segment_rows=64, index_stride=4, sync=False)
+    store.append('x', timestamps, timestamps)
+    segment = store.segments('x')[0]
+    for value in np.arange(-1, 13.5, 0.5):
+        i0, i1 = segment.locate(value, value)
+        assert i0 == np.searchsorted(timestamps, value, side='left')
+        assert i1 == np.searchsorted(timestamps, value, side='right')
+
+def test_read_spans_segments(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_rows=8, index_stride=2, sync=False)
+    timestamps = np.repeat(np.arange(10.0), 3)
+    store.append('x', timestamps, np.arange(len(timestamps), dtype=float))
+    columns = store.read('x', 3, 5)
+    assert list(columns['timestamp']) == [3.0] * 3 + [4.0] * 3 + [5.0] * 3
+    assert list(columns['latency']) == list(range(9, 18))
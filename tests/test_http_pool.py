@@ -0,0 +1,111 @@
+import shutil
+import ssl
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src import http_pool
+from src.http_pool import SessionManager, get_session_manager, timing_fields
+
+class StandIn(BaseHTTPRequestHandler):
+    """Local stand-in site: sets a session cookie and records what each request carried."""
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so connections can be reused
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.headers.get('Host'), self.headers.get('Cookie')))
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Set-Cookie', 'sid=abc123; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+@pytest.fixture
+def stand_in():
+    StandIn.requests_seen = []
+    server = _serve(ThreadingHTTPServer(('127.0.0.1', 0), StandIn))
+    yield server.server_port
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def tls_stand_in(tmp_path):
+    if shutil.which('openssl') is None:
+        pytest.skip("openssl is needed to make a test certificate")
+    cert, key = str(tmp_path / 'cert.pem'), str(tmp_path / 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=localhost', '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', key, '-out', cert],
+                   check=True, capture_output=True)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    _serve(server)
+    yield server.server_port, cert
+    server.shutdown()
+    server.server_close()
+
+def test_probe_times_a_new_connection_then_reuses_it(stand_in):
+    manager = SessionManager(scheme='http')
+    domain = f'127.0.0.1:{stand_in}'
+    first = manager.probe(domain)
+    assert first['status'] == 200 and not first['reused']
+    assert first['connect_ms'] is not None and first['tls_ms'] is None
+    assert first['ttfb_ms'] >= 0 and first['total_ms'] >= first['ttfb_ms']
+    second = manager.probe(domain)
+    assert second['reused'] and second['connect_ms'] is None
+    assert manager.stats()['new_connections'] == 1
+    assert timing_fields(second) == {'ttfb_ms': round(second['ttfb_ms'], 2)}
+    manager.close()
+
+def test_probe_measures_the_tls_handshake(tls_stand_in):
+    port, cert = tls_stand_in
+    manager = SessionManager(scheme='https', verify=cert)
+    result = manager.probe(f'127.0.0.1:{port}')
+    assert result['status'] == 200
+    assert result['tls_ms'] is not None and result['tls_ms'] > 0
+    assert set(timing_fields(result)) == {'connect_ms', 'tls_ms', 'ttfb_ms'}
+    manager.close()
+
+def test_probe_failure_returns_none():
+    manager = SessionManager(scheme='http', timeout=0.5)
+    assert manager.probe('127.0.0.1:9') is None
+
+def test_switch_carries_the_domains_cookies(stand_in):
+    manager = SessionManager(scheme='http')
+    domain = f'localhost:{stand_in}'
+    manager.probe(domain)
+    assert manager.cookies(domain) == {'sid': 'abc123'}
+    assert manager.switch(domain, f'127.0.0.1:{stand_in}')
+    host, cookie = StandIn.requests_seen[-1]
+    assert host == f'127.0.0.1:{stand_in}'
+    assert cookie == 'sid=abc123'
+    manager.close()
+
+def test_sessions_are_evicted_least_recently_used(stand_in):
+    manager = SessionManager(scheme='http', max_sessions=2)
+    for domain in ('a', 'b', 'a', 'c'):
+        manager.session(domain)
+    assert manager.stats()['evicted'] == 1
+    assert manager.cookies('b') == {}  # 'b' was the least recently used
+    assert list(manager._sessions) == ['a', 'c']
+    manager.close()
+
+def test_get_session_manager_applies_settings(monkeypatch):
+    # A fresh process-wide manager; monkeypatch puts the original back afterwards
+    monkeypatch.setattr(http_pool, '_manager', None)
+    manager = get_session_manager(switch_scheme='https', verify=False)
+    assert get_session_manager() is manager
+    assert (manager.switch_scheme, manager.verify) == ('https', False)
+    with pytest.raises(TypeError):
+        get_session_manager(max_sessions=1)
+    manager.close()
@@ -0,0 +1,78 @@
+import datetime
+import os
+from src.history_store import HistoryStore, is_log_file, read_log_csv
+from src.log_writer import LOG_HEADER, LogWriter
+
+def _record(i, host='site.test'):
+    return (1.7e9 + i, host, 10.0 + i, 11.0, False, 0, None, None)
+
+def _logs(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.csv'))
+
+def test_new_file_starts_with_the_header(tmp_path):
+    path = str(tmp_path / 'latency_log_site.test.csv')
+    writer = LogWriter(flush_interval=0.01)
+    for i in range(3):
+        writer.write(path, _record(i))
+    writer.close()
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == LOG_HEADER
+    assert lines[1] == "1700000000.0,site.test,10.0,11.0,False,0,,"
+    assert len(lines) == 4
+
+def test_rotates_by_size_keeping_the_csv_suffix(tmp_path):
+    path = str(tmp_path / 'latency_log_site.test.csv')
+    writer = LogWriter(flush_records=1, flush_interval=0.01, max_bytes=400)
+    for i in range(40):
+        writer.write(path, _record(i))
+        writer.flush()
+    writer.close()
+    names = _logs(tmp_path)
+    assert len(names) > 1 and writer.stats()['rotations'] == len(names) - 1
+    for name in names:
+        assert is_log_file(name)
+        full = os.path.join(tmp_path, name)
+        assert os.path.getsize(full) <= 400
+        with open(full) as f:
+            assert f.readline().rstrip('\n') == LOG_HEADER
+    # Nothing lost across the rotated files
+    rows = sum(len(read_log_csv(os.path.join(tmp_path, name))['timestamp']) for name in names)
+    assert rows == 40
+
+def test_rotates_when_the_day_changes(tmp_path):
+    path = str(tmp_path / 'latency_log_site.test.csv')
+    writer = LogWriter(flush_interval=0.01)
+    writer.write(path, _record(0))
+    writer.flush()
+    writer._files[path].day = datetime.date.today() - datetime.timedelta(days=1)
+    writer.write(path, _record(1))
+    writer.close()
+    names = _logs(tmp_path)
+    assert len(names) == 2 and writer.stats()['rotations'] == 1
+    assert names[1] == 'latency_log_site.test.csv'
+    assert list(read_log_csv(path)['latency']) == [11.0]
+
+def test_headerless_legacy_log_is_archived_not_mixed(tmp_path):
+    path = str(tmp_path / 'latency_log_site.test.csv')
+    with open(path, 'w') as f:
+        f.write("2025-05-29 00:27:14.717993,99.0,99.0,False,0\n")
+    writer = LogWriter(flush_interval=0.01)
+    writer.write(path, _record(0))
+    writer.close()
+    names = _logs(tmp_path)
+    assert len(names) == 2
+    archived = os.path.join(tmp_path, names[0])
+    assert is_log_file(archived)
+    assert list(read_log_csv(archived, 'site.test')['latency']) == [99.0]
+    with open(path) as f:
+        assert f.readline().rstrip('\n') == LOG_HEADER
+
+def test_flushed_batches_reach_the_history_store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history'), sync=False)
+    writer = LogWriter(flush_interval=0.01, history=store, sync_interval=0)
+    for i in range(5):
+        writer.write(str(tmp_path / 'latency_log_site.test.csv'), _record(i))
+    writer.close()
+    assert store.count('site.test') == 5
+    assert writer.stats()['history_syncs'] >= 1
@@ -0,0 +1,55 @@
+import socket
+import pytest
+from src.ping_utils import ProbeEngine, ping_latency, ping_many
+
+@pytest.fixture
+def engine():
+    # TCP/UDP only, so the tests do not depend on ICMP permissions
+    engine = ProbeEngine(timeout=1.0, use_icmp=False).start()
+    yield engine
+    engine.close()
+
+@pytest.fixture
+def listener():
+    """A loopback TCP stand-in server that accepts connections."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(64)
+    yield sock.getsockname()[1]
+    sock.close()
+
+def _closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def test_tcp_connect_to_loopback_server(engine, listener):
+    engine.tcp_ports = (listener,)
+    latency = engine.run(engine.probe('127.0.0.1'), 5)
+    assert latency is not None and 0 <= latency < 1000
+
+def test_refused_connection_still_measures_rtt(engine):
+    engine.tcp_ports = (_closed_port(),)
+    latency = engine.run(engine.probe('127.0.0.1'), 5)
+    assert latency is not None and 0 <= latency < 1000
+
+def test_localhost_name_is_resolved(engine, listener):
+    engine.tcp_ports = (listener,)
+    assert engine.run(engine.probe('localhost'), 5) is not None
+
+def test_probe_many_runs_concurrently(engine, listener):
+    engine.tcp_ports = (listener,)
+    hosts = ['127.0.0.1', 'localhost', '127.0.0.1']
+    results = engine.run(engine.probe_many(hosts), 5)
+    assert set(results) == {'127.0.0.1', 'localhost'}
+    assert all(latency is not None for latency in results.values())
+
+def test_unresolvable_host_returns_none(engine):
+    assert engine.run(engine.probe('name.invalid', timeout=0.5), 5) is None
+
+def test_ping_wrappers_against_localhost():
+    assert ping_latency('127.0.0.1') is not None
+    assert ping_many([]) == {}
+    assert set(ping_many(['127.0.0.1', 'localhost'])) == {'127.0.0.1', 'localhost'}
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import pytest
+from src import predictor_snapshot
+from src.live_predictor import LatencyPredictor
+from src.predictor_backends import SharedBackend, SharedModel
+from src.predictor_snapshot import SnapshotStore, _HEADER, decode_snapshot, encode_snapshot
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path), interval=3600)
+    monkeypatch.setattr(predictor_snapshot, '_store', store)
+    yield store
+    store.stop()
+
+def _predictor(backend, site='site.test', **kwargs):
+    return LatencyPredictor(backend=backend, site=site, warm_start=False, synchronous_retrain=True,
+                            retrain_interval=10 ** 9, **kwargs)
+
+def _feed(predictor, count, start=1.7e9):
+    for i in range(count):
+        predictor.update(20.0 + i % 7, start + i)
+
+def test_encode_decode_round_trip():
+    state = {'history': np.arange(6, dtype=np.float64).reshape(3, 2), 'site': 'site.test', 'bias': 1.5}
+    decoded = decode_snapshot(encode_snapshot(state))
+    assert np.array_equal(decoded['history'], state['history'])
+    assert decoded['site'] == 'site.test' and decoded['bias'] == 1.5
+
+def test_decode_rejects_foreign_and_damaged_data():
+    data = encode_snapshot({'a': 1})
+    with pytest.raises(ValueError):
+        decode_snapshot(b'NOTASNAP' + data[8:])
+    with pytest.raises(ValueError):
+        decode_snapshot(data[:8] + _HEADER.pack(b'', 99, 0)[8:12] + data[12:])
+    with pytest.raises(ValueError):
+        decode_snapshot(data[:-1])
+    with pytest.raises(ValueError):
+        decode_snapshot(data[:4])
+
+def test_forest_predictor_resumes_from_its_snapshot(store):
+    original = _predictor('forest')
+    _feed(original, 60)
+    original.retrain()
+    state = original.snapshot_state()
+    # The fitted pair is shared, not copied; refits replace it rather than change it
+    assert state['model']['fitted'] is original.backend.fitted
+    assert store.save(original) > 0
+
+    restored = _predictor('forest')
+    restored.update(22.0, 1.7e9 + 60)
+    assert store.stats()['restores'] == 1
+    assert restored.samples_seen == original.samples_seen + 1
+    assert len(restored.training_data) == len(original.training_data) + 1
+    features = original.features.vector()
+    assert restored.backend.predict_one(features) == original.backend.predict_one(features)
+
+def test_river_state_is_a_copy_and_restores(store):
+    original = _predictor('river')
+    _feed(original, 30)
+    state = original.backend.state()
+    assert state['model'] is not original.backend.model
+    store.save(original)
+
+    restored = _predictor('river')
+    restored.update(22.0, 1.7e9 + 30)
+    assert restored.backend.n_learned == original.backend.n_learned
+    features = original.features.vector()
+    assert restored.backend.predict_one(features) == pytest.approx(original.backend.predict_one(features))
+
+def test_mismatched_or_expired_snapshots_are_ignored(store):
+    original = _predictor('forest')
+    _feed(original, 10)
+    store.save(original)
+    other = _predictor('river')
+    other.update(22.0, 1.7e9 + 10)
+    assert other.samples_seen == 1
+
+    os.utime(store.path('site.test'), (0, 0))
+    assert store.load('site.test') is None
+
+def test_save_all_skips_unchanged_predictors(store):
+    predictor = _predictor('forest')
+    _feed(predictor, 10)
+    assert store.save_all() == 1
+    assert store.save_all() == 0
+    predictor.update(22.0, 1.7e9 + 10)
+    assert store.save_all() == 1
+
+def test_shared_bias_only_restores_against_the_same_model():
+    shared = SharedModel(kind='river')
+    backend = SharedBackend('site.test', shared=shared)
+    backend.bias = 7.5
+    state = decode_snapshot(encode_snapshot(backend.state()))
+
+    again = SharedBackend('site.test', shared=shared)
+    again.load_state(state)
+    assert again.bias == 7.5
+    # After a restart the shared model is new and cold, so the bias is dropped
+    cold = SharedBackend('site.test', shared=SharedModel(kind='river'))
+    cold.load_state(state)
+    assert cold.bias == 0.0
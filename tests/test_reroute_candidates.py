@@ -0,0 +1,66 @@
+import pytest
+from src.reroute_candidates import CandidateTable
+
+DOMAIN = '192.0.2.1'  # An address is its own primary, so no DNS is involved
+ALTERNATES = ['192.0.2.2', '192.0.2.3', '192.0.2.4']
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def table(clock, monkeypatch):
+    table = CandidateTable(alpha=0.5, loss_alpha=0.5, ttl=60, probe_interval=30, clock=clock)
+    # No background prober; the tests feed every probe result themselves
+    monkeypatch.setattr(table, '_ensure_prober', lambda: None)
+    table.track(DOMAIN, [DOMAIN] + ALTERNATES)
+    return table
+
+def test_latency_and_loss_are_ewmas(table):
+    address = ALTERNATES[0]
+    table.observe(DOMAIN, address, 10.0)
+    table.observe(DOMAIN, address, 30.0)
+    table.observe(DOMAIN, address, None)
+    entry = next(e for e in table.snapshot(DOMAIN) if e['address'] == address)
+    assert entry['latency'] == 20.0
+    assert entry['loss'] == 0.5
+    assert entry['samples'] == 2
+
+def test_rank_orders_by_loss_weighted_latency(table):
+    fast_lossy, steady, slow = ALTERNATES
+    table.observe(DOMAIN, fast_lossy, 10.0)
+    table.observe(DOMAIN, fast_lossy, None)  # Score 10 * (1 + 4 * 0.5) = 30
+    table.observe(DOMAIN, steady, 20.0)
+    table.observe(DOMAIN, slow, 50.0)
+    table.observe(DOMAIN, DOMAIN, 1.0)  # The primary is never suggested
+    assert table.rank(DOMAIN) == [(steady, 20.0), (fast_lossy, 10.0), (slow, 50.0)]
+    assert table.rank(DOMAIN, current_latency=25.0) == [(steady, 20.0), (fast_lossy, 10.0)]
+    assert table.primary_latency(DOMAIN) == 1.0
+
+def test_stale_candidates_are_ignored_and_queued(table, clock):
+    table.observe(DOMAIN, ALTERNATES[0], 20.0)
+    table.observe(DOMAIN, DOMAIN, 5.0)
+    clock.now += 61
+    assert table.rank(DOMAIN) == []
+    assert table.primary_latency(DOMAIN) is None
+    assert table.stats()['fresh'] == 0
+    # The empty lookup makes the domain urgent, so all alternates are due at once
+    assert sorted(address for _, address in table._due()) == ALTERNATES
+
+def test_background_probes_skip_the_primary_and_recent_ones(table, clock):
+    clock.now += 31
+    table.observe(DOMAIN, ALTERNATES[0], 20.0)
+    assert table._due() == [(DOMAIN, ALTERNATES[1]), (DOMAIN, ALTERNATES[2])]
+
+def test_untracked_domains_are_not_scored(table):
+    table.untrack(DOMAIN)
+    table.observe(DOMAIN, ALTERNATES[0], 20.0)
+    assert table.snapshot(DOMAIN) == []
+    assert table.stats()['domains'] == 0
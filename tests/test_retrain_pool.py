@@ -0,0 +1,95 @@
+import threading
+import time
+import numpy as np
+from src.feature_engine import FEATURE_NAMES
+from src.live_predictor import LatencyPredictor
+from src.predictor_backends import ForestBackend
+from src.retrain_pool import RetrainPool
+
+class BlockingPredictor:
+    """Counts retrains; each one waits for `release` so runs can be held in flight."""
+
+    def __init__(self):
+        self.runs = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def retrain(self):
+        self.runs += 1
+        self.started.set()
+        self.release.wait(5)
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+def test_requests_during_a_run_coalesce_into_one_rerun():
+    pool = RetrainPool(max_workers=2)
+    predictor = BlockingPredictor()
+    assert pool.submit(predictor)
+    assert predictor.started.wait(5)
+    # Five requests while the first fit runs become a single follow-up
+    assert not any(pool.submit(predictor) for _ in range(5))
+    assert pool.stats()['coalesced'] == 4
+    predictor.release.set()
+    _wait_for(lambda: pool.stats()['completed'] == 2)
+    assert predictor.runs == 2
+    assert not pool.is_busy(predictor)
+
+def test_queued_requests_coalesce():
+    pool = RetrainPool(max_workers=1)
+    blocker, queued = BlockingPredictor(), BlockingPredictor()
+    pool.submit(blocker)
+    assert blocker.started.wait(5)
+    assert pool.submit(queued)
+    assert not pool.submit(queued)
+    assert pool.queue_depth() == 1
+    blocker.release.set()
+    queued.release.set()
+    _wait_for(lambda: pool.stats()['completed'] == 2)
+    assert queued.runs == 1
+
+def test_predictions_keep_serving_while_a_refit_swaps_in():
+    predictor = LatencyPredictor(backend='forest', warm_start=False, snapshots=False,
+                                 retrain_interval=10 ** 9)
+    now = time.time()
+    for i in range(60):
+        predictor.update(20.0 + i % 7, now + i)
+    predictor.retrain()
+    assert predictor.is_trained
+
+    errors, predictions = [], []
+    stop = threading.Event()
+
+    def predict_loop():
+        while not stop.is_set():
+            try:
+                value, _, _ = predictor.predict(25.0)
+                predictions.append(value)
+            except Exception as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=predict_loop)
+    thread.start()
+    try:
+        for _ in range(3):
+            predictor.retrain()
+    finally:
+        stop.set()
+        thread.join()
+    assert not errors
+    assert predictions and all(np.isfinite(predictions))
+
+def test_forest_swaps_scaler_and_model_together():
+    backend = ForestBackend(n_estimators=5)
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(50, len(FEATURE_NAMES)))
+    backend.fit(features, rng.normal(size=50))
+    first = backend.fitted
+    backend.fit(features * 100, rng.normal(size=50))
+    # A reader holding the old pair still has a matching scaler and model
+    assert backend.fitted is not first
+    assert first[0].n_features_in_ == first[1].n_features_in_
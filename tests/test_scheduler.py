@@ -0,0 +1,92 @@
+import threading
+import time
+from src.scheduler import MonitorScheduler
+
+class Counter:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self, latency):
+        assert latency == 1.5
+        if self.delay:
+            time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+
+def _probe():
+    return 1.5
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+def test_sites_tick_on_their_interval_until_removed():
+    scheduler = MonitorScheduler(workers=2)
+    fast, slow = Counter(), Counter()
+    scheduler.add('fast', fast, interval=0.02, probe=_probe)
+    scheduler.add('slow', slow, interval=0.2, probe=_probe)
+    scheduler.start()
+    try:
+        _wait_for(lambda: fast.calls >= 20)
+        assert slow.calls < fast.calls / 2
+        scheduler.remove('fast')
+        time.sleep(0.1)  # Let a tick already in flight finish
+        calls = fast.calls
+        time.sleep(0.2)
+        assert fast.calls == calls
+        assert 'fast' not in scheduler and 'slow' in scheduler
+    finally:
+        scheduler.reset()
+
+def test_busy_site_skips_instead_of_piling_up():
+    scheduler = MonitorScheduler(workers=4)
+    handler = Counter(delay=0.2)
+    scheduler.add('busy', handler, interval=0.02, probe=_probe)
+    scheduler.start()
+    try:
+        _wait_for(lambda: scheduler.stats()['skipped'] >= 5)
+        assert scheduler.stats()['in_flight'] <= 1
+    finally:
+        scheduler.reset()
+
+def test_stop_and_reset():
+    scheduler = MonitorScheduler(workers=2)
+    handler = Counter()
+    scheduler.add('site', handler, interval=0.02, probe=_probe)
+    scheduler.start()
+    _wait_for(lambda: handler.calls >= 3)
+    scheduler.stop()
+    assert not scheduler.running
+    calls = handler.calls
+    time.sleep(0.1)
+    assert handler.calls == calls
+    scheduler.reset()
+    assert len(scheduler) == 0
+    # Sites added after a reset are picked up when started again
+    scheduler.add('site', handler, interval=0.02, probe=_probe)
+    scheduler.start()
+    try:
+        _wait_for(lambda: handler.calls >= calls + 3)
+    finally:
+        scheduler.reset()
+
+def test_thread_count_does_not_grow_with_sites():
+    scheduler = MonitorScheduler(workers=4)
+    handlers = [Counter() for _ in range(200)]
+    scheduler.add('site0', handlers[0], interval=0.05, probe=_probe)
+    scheduler.start()
+    try:
+        _wait_for(lambda: handlers[0].calls >= 5)
+        baseline = threading.active_count()
+        for i, handler in enumerate(handlers[1:], 1):
+            scheduler.add(f'site{i}', handler, interval=0.05, probe=_probe)
+        _wait_for(lambda: all(handler.calls >= 2 for handler in handlers))
+        # Only the fixed worker pool may have finished spinning up
+        assert threading.active_count() <= baseline + 4
+    finally:
+        scheduler.reset()
@@ -0,0 +1,37 @@
+import math
+import random
+from collections import Counter
+from src.sharded_engine import assign_sites, merge_stats
+
+SITES = [f"site{i}.test" for i in range(400)]
+
+def test_assignment_is_deterministic_and_order_independent():
+    shuffled = list(SITES)
+    random.Random(1).shuffle(shuffled)
+    assert assign_sites(SITES, 4) == assign_sites(shuffled, 4)
+
+def test_loads_stay_within_the_slack():
+    for workers in (2, 3, 4, 7):
+        loads = Counter(assign_sites(SITES, workers).values())
+        assert set(loads) == set(range(workers))
+        assert max(loads.values()) <= math.ceil(len(SITES) / workers * 1.25)
+
+def test_adding_or_removing_a_site_moves_nothing_else():
+    before = assign_sites(SITES, 4)
+    added = assign_sites(SITES + ['new.test'], 4)
+    removed = assign_sites(SITES[1:], 4)
+    assert all(added[site] == before[site] for site in SITES)
+    assert all(removed[site] == before[site] for site in SITES[1:])
+
+def test_adding_a_worker_only_moves_sites_onto_it():
+    before = assign_sites(SITES, 4)
+    after = assign_sites(SITES, 5)
+    moved = [site for site in SITES if after[site] != before[site]]
+    assert moved and all(after[site] == 4 for site in moved)
+    # Roughly its share, not a reshuffle of everything
+    assert len(moved) <= len(SITES) / 5 * 1.25
+
+def test_merge_stats_sums_counters():
+    merged = merge_stats([{'hits': 1, 'misses': 2}, {'hits': 3, 'misses': 0}])
+    assert merged['hits'] == 4 and merged['misses'] == 2
+    assert len(merged['per_process']) == 2
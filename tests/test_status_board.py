@@ -0,0 +1,49 @@
+import json
+import pytest
+import server
+from src.status_board import StatusBoard
+
+@pytest.fixture
+def board(monkeypatch):
+    board = StatusBoard()
+    board.add('a.test', {'latency': 1.0})
+    board.add('b.test', {'latency': 2.0})
+    monkeypatch.setattr(server, 'status_board', board)
+    return board
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+def test_since_returns_only_changed_and_removed_sites(board):
+    version = board.version
+    board.clear()
+    board.add('b.test', {'latency': 3.0})
+    delta = json.loads(board.snapshot().render(since=version))
+    assert delta == {'b.test': {'latency': 3.0}, 'a.test': None}
+    assert json.loads(board.snapshot().render(since=board.version)) == {}
+
+def test_sites_filter_limits_the_response(board):
+    assert json.loads(board.snapshot().render(sites=['b.test', 'missing.test'])) == {'b.test': {'latency': 2.0}}
+
+def test_status_endpoint_since_and_version_header(board, client):
+    response = client.get('/api/status')
+    version = response.headers['X-Status-Version']
+    assert json.loads(response.data) == {'a.test': {'latency': 1.0}, 'b.test': {'latency': 2.0}}
+
+    board.update('a.test', {'latency': 5.0})
+    response = client.get(f'/api/status?since={version}')
+    assert json.loads(response.data) == {'a.test': {'latency': 5.0}}
+    assert int(response.headers['X-Status-Version']) > int(version)
+
+def test_status_endpoint_answers_304_until_the_board_changes(board, client):
+    first = client.get('/api/status')
+    etag = first.headers['ETag']
+    unchanged = client.get('/api/status', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304 and unchanged.data == b''
+    assert unchanged.headers['ETag'] == etag
+
+    board.update('b.test', {'latency': 9.0})
+    changed = client.get('/api/status', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert json.loads(changed.data)['b.test'] == {'latency': 9.0}
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from src.live_predictor import LatencyPredictor
+from src.training_store import TrainingStore
+
+def _fill(store, count, start=0.0, step=1.0):
+    for i in range(count):
+        store.append(start + i * step, float(i), np.full(3, i, dtype=np.float32))
+
+def test_window_keeps_the_newest_rows_within_the_window():
+    store = TrainingStore(3, policy='window', capacity=100, window_seconds=10)
+    _fill(store, 50)
+    timestamps, latencies = store.series()
+    assert list(timestamps) == [float(t) for t in range(39, 50)]
+    features, targets = store.sample(4)
+    assert list(targets) == [46.0, 47.0, 48.0, 49.0]
+    assert features[:, 0].tolist() == [46.0, 47.0, 48.0, 49.0]
+
+def test_window_capacity_overwrites_the_oldest():
+    store = TrainingStore(3, policy='window', capacity=8, window_seconds=10 ** 9)
+    _fill(store, 20)
+    assert len(store) == 8
+    assert list(store.series()[1]) == [float(i) for i in range(12, 20)]
+
+def test_reservoir_is_bounded_and_roughly_uniform():
+    store = TrainingStore(3, policy='reservoir', capacity=500, seed=1)
+    _fill(store, 20000)
+    assert len(store) == 500 and store.seen == 20000
+    timestamps, _ = store.series()
+    assert np.all(np.diff(timestamps) > 0)
+    # A uniform sample of 0..19999 has its mean near the middle
+    assert abs(timestamps.mean() - 10000) < 1500
+
+def test_decay_favours_recent_samples():
+    store = TrainingStore(3, policy='decay', capacity=500, half_life=1000, seed=1)
+    _fill(store, 20000)
+    timestamps, _ = store.series()
+    assert len(store) == 500
+    # Weights halve every 1000s, so nearly everything kept is from the last few half-lives
+    assert np.mean(timestamps > 15000) > 0.9
+
+@pytest.mark.parametrize("policy", ['window', 'reservoir', 'decay'])
+def test_footprint_is_fixed_and_reported(policy):
+    predictor = LatencyPredictor(backend='forest', retention=policy, store_capacity=1000,
+                                 warm_start=False, snapshots=False, retrain_interval=10 ** 9)
+    before = predictor.stats()['training_store_bytes']
+    for i in range(3000):
+        predictor.update(20.0 + i % 5, 1.7e9 + i)
+    stats = predictor.stats()
+    assert stats['training_store_bytes'] == before == predictor.training_data.nbytes
+    assert stats['training_samples'] <= 1000
+    assert stats['retention'] == policy
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        TrainingStore(3, policy='fifo')
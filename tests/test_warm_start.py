@@ -0,0 +1,45 @@
+import numpy as np
+from src.history_store import HistoryStore, log_file_path
+from src.log_writer import LOG_HEADER
+from src.warm_start import recent_history
+
+def _write_log(path, rows):
+    with open(path, 'w') as f:
+        f.write(LOG_HEADER + "\n")
+        for ts, latency in rows:
+            f.write(f"{ts},site.test,{latency},,False,0,,\n")
+
+def test_store_rows_are_topped_up_from_logs(tmp_path):
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    base = 1.7e9
+    # The logs go back further than the store, which only has the newest rows
+    _write_log(log_file_path('site.test', str(logs)), [(base + i, 10.0 + i) for i in range(10)])
+    store = HistoryStore(str(tmp_path / 'history'))
+    store.append('site.test', [base + 7, base + 8, base + 9, base + 10], [99.0, 99.0, 99.0, 20.0])
+
+    timestamps, latencies = recent_history('site.test', 2000, store=store, logs_dir=str(logs))
+    assert list(timestamps) == [base + i for i in range(11)]
+    # Overlapping timestamps come from the store, once
+    assert list(latencies) == [10.0 + i for i in range(7)] + [99.0, 99.0, 99.0, 20.0]
+
+def test_limit_keeps_the_newest_rows(tmp_path):
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    _write_log(log_file_path('site.test', str(logs)), [(1.7e9 + i, float(i)) for i in range(50)])
+    store = HistoryStore(str(tmp_path / 'history'))
+    store.append('site.test', [1.7e9 + 50], [50.0])
+
+    timestamps, latencies = recent_history('site.test', 5, store=store, logs_dir=str(logs))
+    assert list(latencies) == [46.0, 47.0, 48.0, 49.0, 50.0]
+    assert np.all(np.diff(timestamps) > 0)
+
+def test_full_store_skips_the_logs(tmp_path):
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    _write_log(log_file_path('site.test', str(logs)), [(1.8e9, 1.0)])
+    store = HistoryStore(str(tmp_path / 'history'))
+    store.append('site.test', [1.7e9 + i for i in range(5)], [5.0] * 5)
+
+    timestamps, latencies = recent_history('site.test', 5, store=store, logs_dir=str(logs))
+    assert list(latencies) == [5.0] * 5